@@ -13,6 +13,7 @@ function App() {
   const [error, setError] = useState(null);
   const [isAuthenticated, setIsAuthenticated] = useState(false);
   const [viewMode, setViewMode] = useState(null); // 'token-view', 'profile', or 'login'
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     const urlParams = new URLSearchParams(window.location.search);
@@ -48,6 +49,26 @@ function App() {
     }
   };
 
+  // Append the next (older) page of the feed
+  const loadMorePosts = async () => {
+    const token = new URLSearchParams(window.location.search).get('token');
+    if (!data?.next_cursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const page = await postsAPI.fetchWithToken(token, null, data.next_cursor);
+      setData(current => ({
+        ...page,
+        posts: [...current.posts, ...(page.posts || [])],
+        latest_cursor: current.latest_cursor,
+      }));
+    } catch (err) {
+      // Keep what is shown; the button stays to try again
+      console.error('Failed to load more posts:', err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleLoginSuccess = () => {
     setIsAuthenticated(true);
     setViewMode('profile');
@@ -85,7 +106,12 @@ function App() {
         {data?.post_id ? (
           <PostView post={data} />
         ) : data?.posts ? (
-          <PostsList posts={data.posts} />
+          <PostsList
+            posts={data.posts}
+            hasMore={Boolean(data.next_cursor)}
+            loadingMore={loadingMore}
+            onLoadMore={loadMorePosts}
+          />
         ) : (
           <div className="error">No content available</div>
         )}
@@ -1,10 +1,75 @@
 import { apiClient } from './client';
 
+// Hex SHA-256 of a file, or null where Web Crypto is unavailable (non-secure origins)
+async function sha256Hex(file) {
+  if (!globalThis.crypto?.subtle) return null;
+  const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+  return Array.from(new Uint8Array(digest), (byte) => byte.toString(16).padStart(2, '0')).join('');
+}
+
+// Files above the single-request upload limit are sent in resumable parts
+export const SINGLE_UPLOAD_MAX_BYTES = 10 * 1024 * 1024;
+const PART_ATTEMPTS = 5;
+
+async function errorDetail(response, fallback) {
+  const error = await response.json().catch(() => ({}));
+  return new Error(error.detail || fallback);
+}
+
+// Send a large file through an upload session: each part is retried with backoff,
+// and after a failure only the parts the server has not received are sent again
+async function uploadInParts(postId, file, order) {
+  let response = await apiClient.post('/media-items/upload-sessions', {
+    post_id: postId,
+    order,
+    file_name: file.name,
+    content_type: file.type,
+    size_bytes: file.size,
+  });
+  if (!response.ok) throw await errorDetail(response, 'Failed to start upload');
+  const upload = await response.json();
+  const url = `/media-items/upload-sessions/${upload.id}`;
+
+  for (let attempt = 1; ; attempt++) {
+    try {
+      const received = new Set((await (await apiClient.get(url)).json()).received_parts);
+      for (let part = 1; part <= upload.part_count; part++) {
+        if (received.has(part)) continue;
+        const start = (part - 1) * upload.part_size;
+        response = await apiClient.request(`${url}/parts/${part}`, {
+          method: 'PUT',
+          headers: { 'Content-Type': 'application/octet-stream' },
+          body: file.slice(start, start + upload.part_size),
+        });
+        if (!response.ok) throw await errorDetail(response, `Failed to upload part ${part}`);
+      }
+      break;
+    } catch (error) {
+      if (attempt >= PART_ATTEMPTS) {
+        await apiClient.delete(url);
+        throw error;
+      }
+      await new Promise((resolve) => setTimeout(resolve, 1000 * 2 ** attempt));
+    }
+  }
+
+  response = await apiClient.post(`${url}/complete`, {});
+  if (!response.ok) throw await errorDetail(response, 'Failed to upload media item');
+  return await response.json();
+}
+
 export const mediaItemsAPI = {
   async uploadMediaItem(postId, file, order = 0) {
+    if (file.size > SINGLE_UPLOAD_MAX_BYTES) {
+      return uploadInParts(postId, file, order);
+    }
+
     const formData = new FormData();
     formData.append('post_id', postId.toString());
     formData.append('order', order.toString());
+    // Lets the server skip storing content it already has; must precede the file
+    const checksum = await sha256Hex(file);
+    if (checksum) formData.append('sha256', checksum);
     formData.append('file', file);
 
     // Use fetch directly for file upload instead of apiClient.post
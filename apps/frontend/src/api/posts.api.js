@@ -1,4 +1,8 @@
 import { apiClient } from './client';
+import { mediaItemsAPI, SINGLE_UPLOAD_MAX_BYTES } from './mediaItems.api';
+
+// Most files a post can be created with in one request
+const MAX_POST_FILES = 20;
 
 export const postsAPI = {
   async fetchPosts() {
@@ -35,6 +39,38 @@ export const postsAPI = {
     return await response.json();
   },
 
+  // Create a post with its files in one request, so it never shows up half uploaded.
+  // Posts with files too large for a single request fall back to one upload per file.
+  async createPostWithMedia(description, audienceIds = [], files = []) {
+    if (files.length > MAX_POST_FILES || files.some((file) => file.size > SINGLE_UPLOAD_MAX_BYTES)) {
+      const post = await this.createPost(description, audienceIds);
+      await Promise.all(files.map((file, index) => mediaItemsAPI.uploadMediaItem(post.id, file, index)));
+      return post;
+    }
+
+    // Fields must precede the files
+    const formData = new FormData();
+    formData.append('description', description);
+    audienceIds.forEach((audienceId) => formData.append('audience_ids', audienceId.toString()));
+    files.forEach((file) => formData.append('files', file));
+
+    const token = localStorage.getItem('auth_token');
+    const response = await fetch(`${apiClient.baseURL}/posts/with-media`, {
+      method: 'POST',
+      headers: {
+        'Authorization': `Bearer ${token}`,
+      },
+      body: formData,
+    });
+
+    if (!response.ok) {
+      const error = await response.json().catch(() => ({}));
+      throw new Error(error.detail || 'Failed to create post');
+    }
+
+    return await response.json();
+  },
+
   async updatePost(postId, description, audienceIds = []) {
     const response = await apiClient.put(`/posts/${postId}`, {
       description,
@@ -58,11 +94,16 @@ export const postsAPI = {
     }
   },
 
-  async fetchWithToken(token, postId = null) {
-    let url = `/frontend/view?token=${token}`;
+  async fetchWithToken(token, postId = null, cursor = null) {
+    // Photos are shown at screen size, not as uploaded originals
+    let url = `/frontend/view?token=${token}&size=large`;
     if (postId) {
       url += `&post_id=${postId}`;
     }
+    // The feed comes a page at a time; `cursor` is the previous page's next_cursor
+    if (cursor) {
+      url += `&cursor=${encodeURIComponent(cursor)}`;
+    }
 
     const response = await fetch(`${apiClient.baseURL}${url}`, {
       method: 'GET',
@@ -77,20 +118,20 @@ export const postsAPI = {
 
     const data = await response.json();
     
-    // Add direct URLs to media items with token appended for authentication
+    // Media items come with signed stream URLs relative to the API
     if (data.post_id) {
-      // Single post - add URLs to media items
+      // Single post - resolve media URLs against the API base URL
       data.media_items = data.media_items?.map(item => ({
         ...item,
-        url: `${apiClient.baseURL}/media-items/${item.id}/stream?token=${token}`
+        url: `${apiClient.baseURL}${item.url}`
       })) || [];
     } else if (data.posts) {
-      // Multiple posts - add URLs to media items for each post
+      // Multiple posts - resolve media URLs for each post
       data.posts = data.posts.map(post => ({
         ...post,
         media_items: post.media_items?.map(item => ({
           ...item,
-          url: `${apiClient.baseURL}/media-items/${item.id}/stream?token=${token}`
+          url: `${apiClient.baseURL}${item.url}`
         })) || []
       }));
     }
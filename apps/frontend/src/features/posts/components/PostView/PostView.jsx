@@ -1,5 +1,6 @@
 import React from 'react';
 import './PostView.css';
+import { placeholderStyle } from '../../placeholder';
 
 function PostView({ post }) {
   const handleViewAllPosts = () => {
@@ -32,7 +33,7 @@ function PostView({ post }) {
               {post.media_items.map((media) => {
                 console.log('Rendering media item:', media); // Debug
                 return (
-                  <div key={media.id} className="media-item">
+                  <div key={media.id} className="media-item" style={placeholderStyle(media)}>
                     {media.url ? (
                       media.type === 'photo' || media.type === 'image' ? (
                         <img 
@@ -1,7 +1,8 @@
 import React from 'react';
 import './PostsList.css';
+import { placeholderStyle } from '../../placeholder';
 
-function PostsList({ posts }) {
+function PostsList({ posts, hasMore = false, loadingMore = false, onLoadMore }) {
   const handlePostClick = (postId) => {
     // Add post_id to current URL to view specific post
     const urlParams = new URLSearchParams(window.location.search);
@@ -20,7 +21,7 @@ function PostsList({ posts }) {
 
   return (
     <div className="posts-list">
-      <p className="posts-summary">{posts.length} posts shared from {posts[0]?.creator_name}</p>
+      <p className="posts-summary">{posts.length}{hasMore ? '+' : ''} posts shared from {posts[0]?.creator_name}</p>
       
       <div className="posts-grid">
         {posts.map((post) => (
@@ -34,7 +35,7 @@ function PostsList({ posts }) {
               <div className="post-card-media">
                 <div className="media-preview">
                   {post.media_items.slice(0, 1).map((media) => (
-                    <div key={media.id} className="media-thumbnail">
+                    <div key={media.id} className="media-thumbnail" style={placeholderStyle(media)}>
                       {media.url ? (
                         media.type === 'image' || media.type === 'photo' ? (
                           <img 
@@ -83,6 +84,12 @@ function PostsList({ posts }) {
           </div>
         ))}
       </div>
+
+      {hasMore && (
+        <button className="load-more" onClick={onLoadMore} disabled={loadingMore}>
+          {loadingMore ? 'Loading...' : 'Load more'}
+        </button>
+      )}
     </div>
   );
 }
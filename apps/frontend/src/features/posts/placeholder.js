@@ -0,0 +1,93 @@
+const BASE83 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~';
+// Pixels a placeholder is decoded to; the browser scales it up smoothly
+const DECODE_SIZE = 32;
+
+const decoded = new Map();
+
+function decode83(text) {
+  let value = 0;
+  for (const character of text) {
+    value = value * 83 + BASE83.indexOf(character);
+  }
+  return value;
+}
+
+function srgbToLinear(value) {
+  const v = value / 255;
+  return v <= 0.04045 ? v / 12.92 : Math.pow((v + 0.055) / 1.055, 2.4);
+}
+
+function linearToSrgb(value) {
+  const v = Math.max(0, Math.min(1, value));
+  return Math.round((v <= 0.0031308 ? v * 12.92 : 1.055 * Math.pow(v, 1 / 2.4) - 0.055) * 255);
+}
+
+function signPow(value, exponent) {
+  return Math.sign(value) * Math.pow(Math.abs(value), exponent);
+}
+
+// Render a BlurHash into a small PNG data URL, or null if it cannot be decoded here
+function blurhashToDataURL(blurhash) {
+  if (decoded.has(blurhash)) return decoded.get(blurhash);
+  let url = null;
+  try {
+    const sizeFlag = decode83(blurhash[0]);
+    const componentsX = (sizeFlag % 9) + 1;
+    const componentsY = Math.floor(sizeFlag / 9) + 1;
+    const maxValue = (decode83(blurhash[1]) + 1) / 166;
+    const dc = decode83(blurhash.substring(2, 6));
+    const colors = [[srgbToLinear(dc >> 16), srgbToLinear((dc >> 8) & 255), srgbToLinear(dc & 255)]];
+    for (let i = 1; i < componentsX * componentsY; i++) {
+      const value = decode83(blurhash.substring(4 + i * 2, 6 + i * 2));
+      colors.push([
+        signPow((Math.floor(value / (19 * 19)) - 9) / 9, 2) * maxValue,
+        signPow(((Math.floor(value / 19) % 19) - 9) / 9, 2) * maxValue,
+        signPow(((value % 19) - 9) / 9, 2) * maxValue,
+      ]);
+    }
+
+    const canvas = document.createElement('canvas');
+    canvas.width = DECODE_SIZE;
+    canvas.height = DECODE_SIZE;
+    const context = canvas.getContext('2d');
+    const image = context.createImageData(DECODE_SIZE, DECODE_SIZE);
+    for (let y = 0; y < DECODE_SIZE; y++) {
+      for (let x = 0; x < DECODE_SIZE; x++) {
+        let r = 0, g = 0, b = 0;
+        for (let j = 0; j < componentsY; j++) {
+          for (let i = 0; i < componentsX; i++) {
+            const basis = Math.cos((Math.PI * x * i) / DECODE_SIZE) * Math.cos((Math.PI * y * j) / DECODE_SIZE);
+            const color = colors[i + j * componentsX];
+            r += color[0] * basis;
+            g += color[1] * basis;
+            b += color[2] * basis;
+          }
+        }
+        const offset = 4 * (x + y * DECODE_SIZE);
+        image.data[offset] = linearToSrgb(r);
+        image.data[offset + 1] = linearToSrgb(g);
+        image.data[offset + 2] = linearToSrgb(b);
+        image.data[offset + 3] = 255;
+      }
+    }
+    context.putImageData(image, 0, 0);
+    url = canvas.toDataURL();
+  } catch (error) {
+    url = null;
+  }
+  decoded.set(blurhash, url);
+  return url;
+}
+
+// Background painted behind a photo until it loads: its blurred preview over its dominant colour.
+// Both come inline with the feed, so nothing is fetched for them.
+export function placeholderStyle(media) {
+  const style = {};
+  if (media.dominant_color) style.backgroundColor = media.dominant_color;
+  const preview = media.blurhash && blurhashToDataURL(media.blurhash);
+  if (preview) {
+    style.backgroundImage = `url(${preview})`;
+    style.backgroundSize = 'cover';
+  }
+  return style;
+}
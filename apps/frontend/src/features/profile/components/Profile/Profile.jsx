@@ -187,17 +187,7 @@ function Profile({ onLogout }) {
     try {
       setActionError('');
       
-      // Step 1: Create the post
-      const newPost = await postsAPI.createPost(formData.description, formData.audienceIds);
-      
-      // Step 2: Upload all images for the post
-      if (formData.images && formData.images.length > 0) {
-        await Promise.all(
-          formData.images.map((image, index) =>
-            mediaItemsAPI.uploadMediaItem(newPost.id, image, index)
-          )
-        );
-      }
+      await postsAPI.createPostWithMedia(formData.description, formData.audienceIds, formData.images || []);
       
       await fetchData();
       setShowPostForm(false);
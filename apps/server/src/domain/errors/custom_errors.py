@@ -13,7 +13,53 @@ class PostNotFoundError(Exception):
         self.post_id = post_id
         super().__init__(f"Post with id {post_id} not found")
 
+class PostNotOwnedError(Exception):
+    def __init__(self, post_id: int):
+        self.post_id = post_id
+        super().__init__(f"Not authorized to add media to post {post_id}")
+
 class MediaItemNotFoundError(Exception):
     def __init__(self, media_item_id: int):
         self.media_item_id = media_item_id
         super().__init__(f"Media item with id {media_item_id} not found")
+
+class InvalidCursorError(Exception):
+    def __init__(self, cursor: str):
+        self.cursor = cursor
+        super().__init__("Invalid pagination cursor")
+
+class FileTooLargeError(Exception):
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        super().__init__(f"File size must be less than {max_bytes // (1024 * 1024)}MB")
+
+class RangeNotSatisfiableError(Exception):
+    def __init__(self, range_header: str, size: int):
+        self.range_header = range_header
+        self.size = size
+        super().__init__(f"Range {range_header} not satisfiable for {size} bytes")
+
+class UploadSessionNotFoundError(Exception):
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        super().__init__(f"Upload session {session_id} not found")
+
+class UploadIncompleteError(Exception):
+    def __init__(self, missing_parts: list[int]):
+        self.missing_parts = missing_parts
+        if missing_parts:
+            shown = ", ".join(str(part) for part in missing_parts[:10])
+            super().__init__(f"Upload is missing {len(missing_parts)} parts: {shown}")
+        else:
+            super().__init__("The file has not been uploaded")
+
+class ChecksumMismatchError(Exception):
+    def __init__(self, expected: str, actual: str):
+        self.expected = expected
+        self.actual = actual
+        super().__init__("File does not match its sha256")
+
+class BlobPathNotAllowedError(Exception):
+    def __init__(self, path: str):
+        self.path = path
+        super().__init__("Media stored by content can only be attached through an upload")
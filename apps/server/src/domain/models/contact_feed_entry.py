@@ -0,0 +1,14 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, DateTime, Index
+from datetime import datetime
+
+class ContactFeedEntry(SQLModel, table=True):
+    """Read model: one row per post visible to a contact, maintained on write"""
+    __table_args__ = (
+        Index("ix_contactfeedentry_contact_created", "contact_id", "created_at", "post_id"),
+    )
+
+    contact_id: int = Field(foreign_key="contact.id", primary_key=True)
+    post_id: int = Field(foreign_key="post.id", primary_key=True, index=True)
+    # Copy of Post.created_at so the feed is a range scan on this table alone
+    created_at: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
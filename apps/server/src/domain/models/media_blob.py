@@ -0,0 +1,22 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, DateTime
+from typing import Optional
+from datetime import datetime, timezone
+
+class MediaBlob(SQLModel, table=True):
+    """
+    A stored original, addressed by its content. Media items with the same content
+    share one blob; it is deleted from storage when its last reference goes.
+    """
+    # SHA-256 hex digest of the content
+    checksum: str = Field(primary_key=True)
+    path: str = Field(unique=True)
+    size_bytes: int
+    content_type: str
+    etag: Optional[str] = None
+    # Number of media items referencing the blob
+    ref_count: int = 0
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True))
+    )
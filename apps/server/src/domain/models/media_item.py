@@ -1,14 +1,38 @@
 from sqlmodel import SQLModel, Field, Enum
-from typing import Optional
+from sqlalchemy import Column, JSON
+from typing import Optional, Dict
 from enum import Enum as PyEnum
 
 class MediaType(PyEnum):
     photo = "photo"
     video = "video"
 
-class MediaItem(SQLModel, table=True):
+class MediaSize(PyEnum):
+    """Resized renditions produced for photos, by longest edge"""
+    thumb = "thumb"
+    medium = "medium"
+    large = "large"
+
+class MediaMetadata(SQLModel):
+    """Facts about the stored original, captured at ingest so serving needs no storage lookup"""
+    size_bytes: Optional[int] = None
+    content_type: Optional[str] = None
+    # ETag reported by object storage and SHA-256 hex digest of the content
+    etag: Optional[str] = None
+    checksum: Optional[str] = None
+    # Display dimensions (EXIF / track rotation applied)
+    width: Optional[int] = None
+    height: Optional[int] = None
+    duration_seconds: Optional[float] = None
+
+class MediaItem(MediaMetadata, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     post_id: int = Field(foreign_key="post.id")
     path: str
     type: MediaType
     order: int
+    # Storage paths of the generated renditions, keyed by MediaSize value
+    derivatives: Optional[Dict[str, str]] = Field(default=None, sa_column=Column(JSON))
+    # Painted while a photo loads: its BlurHash and dominant colour ("#rrggbb")
+    blurhash: Optional[str] = None
+    dominant_color: Optional[str] = None
@@ -0,0 +1,57 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, DateTime, Index
+from typing import Optional
+from datetime import datetime, timezone
+from enum import Enum as PyEnum
+
+class NotificationStatus(PyEnum):
+    pending = "pending"
+    sent = "sent"
+    # Given up on after NOTIFICATION_MAX_ATTEMPTS; kept for inspection
+    dead = "dead"
+
+class NotificationJob(SQLModel, table=True):
+    """
+    Outbox row: one message to send to a contact about a new post. Rows are written in
+    the transaction that creates the post and sent afterwards by the dispatcher, so a
+    notification is never lost to a crash and never sent for a post that was rolled back.
+    """
+    __table_args__ = (
+        Index("ix_notificationjob_status_next_attempt", "status", "next_attempt_at"),
+        # A contact in several of a post's audiences is notified once. An index rather
+        # than a constraint, so startup also adds it to tables created without it.
+        Index("ux_notificationjob_post_contact", "post_id", "contact_id", unique=True),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    # Not foreign keys: jobs of a deleted post or contact are dropped by the dispatcher
+    post_id: int = Field(index=True)
+    contact_id: int
+    status: str = NotificationStatus.pending.value
+    attempts: int = 0
+    # When the job is due; while a dispatcher holds it, the end of its lease
+    next_attempt_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True), nullable=False)
+    )
+    last_error: Optional[str] = None
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True))
+    )
+    sent_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True)))
+    # What sending cost: the messages billed (a long text is split) and their total
+    # price in the SMS account's currency
+    message_count: Optional[int] = None
+    cost: Optional[float] = None
+
+class NotificationReport(SQLModel):
+    """How notifying a post's audiences went"""
+    post_id: int
+    # Distinct contacts notified of the post
+    recipients: int
+    sent: int
+    pending: int
+    dead: int
+    messages: int
+    cost: float
@@ -0,0 +1,44 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, DateTime
+from typing import Optional
+from datetime import datetime, timezone
+
+class UploadSession(SQLModel, table=True):
+    """
+    An upload of one file that happens outside a single request. A resumable upload is
+    sent in numbered parts of `part_size` bytes (the last one shorter) into a multipart
+    upload in storage; parts may arrive in any order and be sent again. A direct upload
+    is PUT by the client straight to storage with a presigned URL. Either way the media
+    item is created when the client completes the session.
+    """
+    id: str = Field(primary_key=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    # Not a foreign key: deleting the post makes completion fail instead of the deletion
+    post_id: int
+    order: int = 0
+    file_name: str
+    content_type: str
+    size_bytes: int
+    part_size: int
+    # Hex SHA-256 the client declared for the whole file, verified on completion
+    sha256: Optional[str] = None
+    # Staging object the file is uploaded to, and the storage multipart upload assembling
+    # it (None for a direct upload)
+    object_name: str
+    upload_id: Optional[str] = None
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True))
+    )
+    # Last time a part was received; sessions idle for too long are aborted
+    updated_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column=Column(DateTime(timezone=True), index=True)
+    )
+
+class UploadSessionPart(SQLModel, table=True):
+    """A part of an upload session stored in its multipart upload"""
+    session_id: str = Field(foreign_key="uploadsession.id", primary_key=True)
+    part_number: int = Field(primary_key=True)
+    etag: str
+    size_bytes: int
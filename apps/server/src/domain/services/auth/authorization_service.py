@@ -2,6 +2,8 @@ from src.infrastructure.auth.jwt_provider import JwtProvider
 from src.domain.services.post_service import PostService
 from src.infrastructure.repositories.audience_repository import AudienceRepository
 from src.infrastructure.repositories.contact_repository import ContactRepository
+from src.infrastructure.cache.access_index import access_index
+from src.domain.errors.custom_errors import PostNotFoundError
 from src.utils.env import get_env_var
 
 class AuthorizationService:
@@ -20,17 +22,11 @@ class AuthorizationService:
         if not contact:
             raise ValueError(f"Contact with id {contact_id} not found")
         
-        post, _, audiences, _ = await self.post_service.get_post_with_user_and_audiences(post_id, session)
+        post = await self.post_service.get_post_by_id(post_id, session)
+        if not post:
+            raise PostNotFoundError(post_id)
         
-        contact_in_audience = False
-        for audience in audiences:
-            if audience.id is not None:
-                contacts = await self.audience_repository.get_contacts_in_audience(audience.id, session)
-                if any(c.id == contact_id for c in contacts):
-                    contact_in_audience = True
-                    break
-        
-        if not contact_in_audience:
+        if not await self.can_contact_access_post(contact_id, post_id, session):
             raise PermissionError("Contact is not authorized to view this post")
         
         # Generate a contact-specific token
@@ -48,17 +44,19 @@ class AuthorizationService:
     async def can_contact_access_post(self, contact_id: int, post_id: int, session) -> bool:
         """Check if a contact can access a specific post through audience membership"""
         try:
-            contact = await self.contact_repository.get_contact_by_id(contact_id, session)
-            if not contact:
-                return False
-            
-            post, _, audiences, _ = await self.post_service.get_post_with_user_and_audiences(post_id, session)
-            
-            for audience in audiences:
-                if audience.id is not None:
-                    contacts = await self.audience_repository.get_contacts_in_audience(audience.id, session)
-                    if any(c.id == contact_id for c in contacts):
-                        return True
-            return False
+            # Answer from the in-memory index when it is loaded, else with one EXISTS query
+            allowed = access_index.can_access(contact_id, post_id)
+            if allowed is None:
+                allowed = await self.audience_repository.contact_shares_audience_with_post(contact_id, post_id, session)
+            return allowed
         except Exception:
-            return False
\ No newline at end of file
+            return False
+    
+    async def load_access_index(self, session) -> None:
+        """Load every audience membership and post audience into the access index"""
+        contact_links = await self.audience_repository.get_all_contact_links(session)
+        post_links = await self.post_service.repository.get_all_audience_links(session)
+        access_index.load(
+            ((link.contact_id, link.audience_id) for link in contact_links),
+            ((link.post_id, link.audience_id) for link in post_links)
+        )
@@ -2,10 +2,15 @@ from src.domain.services.post_service import PostService
 from src.domain.services.auth.authorization_service import AuthorizationService
 from src.infrastructure.repositories.audience_repository import AudienceRepository
 from src.infrastructure.repositories.contact_repository import ContactRepository
-from src.domain.models.links.audience_contact_link import AudienceContactLink
-from src.domain.models.links.post_audience_link import PostAudienceLink
-from sqlmodel import select
-from typing import List
+from src.infrastructure.repositories.feed_repository import FeedRepository
+from src.domain.models.post import Post
+from src.domain.models.media_item import MediaItem, MediaSize, MediaType
+from src.infrastructure.cache.feed_cache import feed_cache
+from src.infrastructure.auth.media_url_signer import MediaUrlSigner
+from src.utils.cursor import FeedCursor
+from typing import List, Sequence
+
+DEFAULT_FEED_PAGE_SIZE = 20
 
 class ViewService:
     """Domain service for handling view operations and contact access"""
@@ -15,9 +20,20 @@ class ViewService:
         self.authorization_service = AuthorizationService()
         self.audience_repository = AudienceRepository()
         self.contact_repository = ContactRepository()
+        self.feed_repository = FeedRepository()
+        self.media_url_signer = MediaUrlSigner()
     
-    async def get_view_data_for_token(self, token: str, post_id: int | None, session) -> dict:
-        """Get view data based on a JWT token and optional post_id from URL"""
+    async def get_view_data_for_token(self, token: str, post_id: int | None, session,
+                                      cursor: str | None = None,
+                                      since: str | None = None,
+                                      limit: int = DEFAULT_FEED_PAGE_SIZE,
+                                      size: MediaSize | None = None) -> dict:
+        """
+        Get view data based on a JWT token and optional post_id from URL.
+        Feeds are paginated newest first: `cursor` continues after the last page,
+        `since` restricts the feed to posts newer than a previously seen one.
+        `size` makes photo URLs point at that rendition.
+        """
         payload = self.authorization_service.verify_token(token)
         if not payload:
             raise ValueError("Invalid or expired token")
@@ -29,33 +45,69 @@ class ViewService:
         
         contact_id = int(contact_id)
         
+        # Serve repeated opens of the same link from the feed cache
+        return await feed_cache.get_or_compute(
+            contact_id,
+            (post_id, cursor, since, limit, size),
+            lambda: self._get_view_data_for_contact(contact_id, post_id, session, cursor, since, limit, size)
+        )
+    
+    async def _get_view_data_for_contact(self, contact_id: int, post_id: int | None, session,
+                                         cursor: str | None, since: str | None, limit: int,
+                                         size: MediaSize | None = None) -> dict:
         if post_id:
             # User wants to view a specific post - check if this contact can access it
             if not await self.authorization_service.can_contact_access_post(contact_id, post_id, session):
                 raise PermissionError("Contact is not authorized to view this post")
-            return await self._get_single_post_view(post_id, session)
+            return await self._get_single_post_view(post_id, session, self._contact_viewer(contact_id), size)
         else:
             # User wants to see all posts accessible to this specific contact
-            return await self._get_contact_accessible_posts_view(contact_id, session)
+            return await self._get_contact_accessible_posts_view(contact_id, session, cursor, since, limit, size)
     
-    async def _get_single_post_view(self, post_id: int, session) -> dict:
+    async def _get_single_post_view(self, post_id: int, session, viewer: str, size: MediaSize | None = None) -> dict:
         """Get a single post view"""
         post, user, _, media_items = await self.post_service.get_post_with_user_and_audiences(post_id, session)
-        
+        return self._serialize_post(post, user.name, media_items, viewer, size)
+    
+    def _contact_viewer(self, contact_id: int) -> str:
+        return f"contact:{contact_id}"
+    
+    def _serialize_post(self, post: Post, creator_name: str, media_items: Sequence[MediaItem], viewer: str,
+                        size: MediaSize | None = None) -> dict:
+        """Build the view payload for a post, with media URLs signed for the viewer"""
         return {
             "post_id": post.id or 0,
             "description": post.description,
-            "creator_name": user.name,
+            "creator_name": creator_name,
             "media_items": [
                 {
                     "id": m.id or 0,
                     "type": m.type.value,
-                    "url": f"/media-items/{m.id}/url"
+                    "url": self._media_url(m, viewer, size),
+                    "width": m.width,
+                    "height": m.height,
+                    "duration_seconds": m.duration_seconds,
+                    "blurhash": m.blurhash,
+                    "dominant_color": m.dominant_color
                 } for m in media_items
             ],
             "created_at": str(post.created_at)
         }
     
+    def _media_url(self, media_item: MediaItem, viewer: str, size: MediaSize | None) -> str:
+        """
+        Signed stream URL of a media item. For a photo rendition that already exists the
+        URL points straight at it; otherwise `size` is passed on so the stream endpoint
+        generates it on first request.
+        """
+        media_item_id = media_item.id or 0
+        if size is None or media_item.type != MediaType.photo:
+            return self.media_url_signer.signed_stream_url(media_item_id, media_item.path, viewer)
+        derivative = (media_item.derivatives or {}).get(size.value)
+        if derivative:
+            return self.media_url_signer.signed_stream_url(media_item_id, derivative, viewer)
+        return f"{self.media_url_signer.signed_stream_url(media_item_id, media_item.path, viewer)}&size={size.value}"
+    
     async def _get_user_posts_view(self, user_id: int, session) -> dict:
         """Get all posts accessible to a user"""
         accessible_posts = await self._get_user_accessible_posts(user_id, session)
@@ -63,120 +115,60 @@ class ViewService:
     
     async def _get_user_accessible_posts(self, user_id: int, session) -> List[dict]:
         """Get all posts that a user's contacts can access through audience memberships"""
-        # Get all contacts belonging to this user
         contacts = await self.contact_repository.get_contacts_by_user(user_id, session)
-        if not contacts:
-            return []
-        
         contact_ids = [c.id for c in contacts if c.id is not None]
-        if not contact_ids:
-            return []
-        
-        # Get all audiences these contacts are part of
-        all_audience_ids = set()
-        for contact_id in contact_ids:
-            contact_audience_links = await session.exec(
-                select(AudienceContactLink).where(AudienceContactLink.contact_id == contact_id)
-            )
-            all_audience_ids.update(link.audience_id for link in contact_audience_links.all())
-        
-        if not all_audience_ids:
-            return []
-        
-        # Get all posts that are shared with these audiences
-        all_post_links = []
-        for audience_id in all_audience_ids:
-            post_audience_links = await session.exec(
-                select(PostAudienceLink)
-                .where(PostAudienceLink.audience_id == audience_id)
-            )
-            all_post_links.extend(post_audience_links.all())
-        
-        post_ids = list(set([link.post_id for link in all_post_links]))  # Remove duplicates
-        
-        if not post_ids:
-            return []
-        
-        # Get the actual posts with their details
-        accessible_posts = []
-        for post_id in post_ids:
-            try:
-                post, user, _, media_items = await self.post_service.get_post_with_user_and_audiences(post_id, session)
-                accessible_posts.append({
-                    "post_id": post.id or 0,
-                    "description": post.description,
-                    "creator_name": user.name,
-                    "media_items": [
-                        {
-                            "id": m.id or 0,
-                            "type": m.type.value,
-                            "url": f"/media-items/{m.id}/url"
-                        } for m in media_items
-                    ],
-                    "created_at": str(post.created_at)
-                })
-            except Exception:
-                # Skip posts that can't be loaded
-                continue
-        
-        # Sort posts by created_at in descending order (most recent first)
-        accessible_posts.sort(key=lambda post: post["created_at"], reverse=True)
+        rows = await self.feed_repository.get_posts_for_contacts(contact_ids, session)
+        return await self._serialize_feed_rows(rows, session, f"user:{user_id}")
+    
+    async def _get_contact_accessible_posts_view(self, contact_id: int, session,
+                                                 cursor: str | None = None,
+                                                 since: str | None = None,
+                                                 limit: int = DEFAULT_FEED_PAGE_SIZE,
+                                                 size: MediaSize | None = None) -> dict:
+        """Get one page of the posts accessible to a specific contact through their audience memberships"""
+        before = FeedCursor.decode(cursor) if cursor else None
+        after = FeedCursor.decode(since) if since else None
+        
+        # Fetch one extra row to know whether another page exists
+        rows = await self.feed_repository.get_contact_feed(
+            contact_id, session, before=before, after=after, limit=limit + 1
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        next_cursor = self._cursor_for(rows[-1][0]) if has_more else None
+        # The newest post seen so far, for clients to pass back as `since`.
+        # Only the first page (no `cursor`) contains the newest post.
+        if rows and not cursor:
+            latest_cursor = self._cursor_for(rows[0][0])
+        else:
+            latest_cursor = since
         
-        return accessible_posts
+        return {
+            "posts": await self._serialize_feed_rows(rows, session, self._contact_viewer(contact_id), size),
+            "next_cursor": next_cursor,
+            "latest_cursor": latest_cursor
+        }
     
-    async def _get_contact_accessible_posts_view(self, contact_id: int, session) -> dict:
-        """Get all posts accessible to a specific contact through their audience memberships"""
-        accessible_posts = await self._get_contact_accessible_posts(contact_id, session)
-        return {"posts": accessible_posts}
+    def _cursor_for(self, post: Post) -> str:
+        return FeedCursor(created_at=post.created_at, post_id=post.id or 0).encode()
     
     async def _get_contact_accessible_posts(self, contact_id: int, session) -> List[dict]:
         """Get all posts that a specific contact can access through their audience memberships"""
-        # Get all audiences this contact is part of
-        contact_audience_links = await session.exec(
-            select(AudienceContactLink).where(AudienceContactLink.contact_id == contact_id)
-        )
-        audience_ids = [link.audience_id for link in contact_audience_links.all()]
-        
-        if not audience_ids:
-            return []
-        
-        # Get all posts that are shared with these audiences
-        all_post_links = []
-        for audience_id in audience_ids:
-            post_audience_links = await session.exec(
-                select(PostAudienceLink)
-                .where(PostAudienceLink.audience_id == audience_id)
-            )
-            all_post_links.extend(post_audience_links.all())
-        
-        post_ids = list(set([link.post_id for link in all_post_links]))  # Remove duplicates
-        
-        if not post_ids:
+        rows = await self.feed_repository.get_contact_feed(contact_id, session)
+        return await self._serialize_feed_rows(rows, session, self._contact_viewer(contact_id))
+    
+    async def _serialize_feed_rows(self, rows: Sequence[tuple[Post, str]], session, viewer: str,
+                                   size: MediaSize | None = None) -> List[dict]:
+        """Attach media items to feed rows with one batched query and build their payloads"""
+        if not rows:
             return []
         
-        # Get the actual posts with their details
-        accessible_posts = []
-        for post_id in post_ids:
-            try:
-                post, user, _, media_items = await self.post_service.get_post_with_user_and_audiences(post_id, session)
-                accessible_posts.append({
-                    "post_id": post.id or 0,
-                    "description": post.description,
-                    "creator_name": user.name,
-                    "media_items": [
-                        {
-                            "id": m.id or 0,
-                            "type": m.type.value,
-                            "url": f"/media-items/{m.id}/url"
-                        } for m in media_items
-                    ],
-                    "created_at": str(post.created_at)
-                })
-            except Exception:
-                # Skip posts that can't be loaded
-                continue
-        
-        # Sort posts by created_at in descending order (most recent first)
-        accessible_posts.sort(key=lambda post: post["created_at"], reverse=True)
+        post_ids = [post.id for post, _ in rows if post.id is not None]
+        media_by_post = await self.feed_repository.get_media_items_for_posts(post_ids, session)
         
-        return accessible_posts
\ No newline at end of file
+        # Rows are already sorted newest first by the database
+        return [
+            self._serialize_post(post, creator_name, media_by_post.get(post.id or 0, []), viewer, size)
+            for post, creator_name in rows
+        ]
\ No newline at end of file
@@ -0,0 +1,110 @@
+import logging
+from typing import Iterable
+from sqlalchemy.exc import IntegrityError
+from sqlmodel.ext.asyncio.session import AsyncSession
+from src.domain.models.media_blob import MediaBlob
+from src.infrastructure.repositories.media_blob_repository import MediaBlobRepository
+from src.infrastructure.storage.media_storage_service import MediaStorageService
+from src.infrastructure.storage.deletion_jobs import DeletionProgress
+
+logger = logging.getLogger(__name__)
+
+class MediaBlobService:
+    """
+    Content-addressed storage of media originals with reference counting.
+
+    A reference is taken before a media item row is created and dropped in the
+    transaction that deletes it, so the count never falls below the number of rows
+    and never stays above it. A blob left without references keeps its row until
+    `collect` removes the objects while holding the row lock, so an upload of the same
+    content either revives the blob or waits and stores it again.
+    """
+
+    def __init__(self,
+                 media_blob_repository: MediaBlobRepository | None = None,
+                 media_storage_service: MediaStorageService | None = None):
+        self.media_blob_repository = media_blob_repository or MediaBlobRepository()
+        self.media_storage_service = media_storage_service or MediaStorageService()
+
+    async def reserve(self, checksum: str, session: AsyncSession) -> MediaBlob | None:
+        """
+        Take a reference on stored content before the upload body is read, when the
+        client declared its checksum. Returns None if the content is not stored yet.
+        The caller verifies the received checksum and releases the reference on mismatch.
+        """
+        blob = await self.media_blob_repository.get_blob_for_update(checksum, session)
+        if blob is None:
+            await session.commit()
+            return None
+        blob.ref_count += 1
+        await self.media_blob_repository.save_blob(blob, session)
+        await session.commit()
+        return blob
+
+    async def store_staged(self, staging_path: str, checksum: str, file_name: str, size_bytes: int,
+                           content_type: str, session: AsyncSession,
+                           staged_etag: str | None = None) -> tuple[MediaBlob, bool]:
+        """
+        Take a reference on the content of an upload streamed to `staging_path`, moving it
+        to its content address unless that content is already stored. The staged object is
+        always deleted. With `staged_etag` (the version whose checksum was taken), a staged
+        object replaced since is not stored. Returns (blob, whether the content was already stored).
+        """
+        try:
+            for _ in range(2):
+                blob = await self.media_blob_repository.get_blob_for_update(checksum, session)
+                if blob is not None:
+                    blob.ref_count += 1
+                    await self.media_blob_repository.save_blob(blob, session)
+                    await session.commit()
+                    return blob, True
+                path = self.media_storage_service.blob_path(checksum, file_name)
+                etag = await self.media_storage_service.copy_file(staging_path, path, staged_etag)
+                try:
+                    blob = await self.media_blob_repository.save_blob(MediaBlob(
+                        checksum=checksum, path=path, size_bytes=size_bytes,
+                        content_type=content_type, etag=etag, ref_count=1
+                    ), session)
+                    await session.commit()
+                    return blob, False
+                except IntegrityError:
+                    # A concurrent upload of the same content stored it first
+                    await session.rollback()
+            raise RuntimeError(f"Could not store blob {checksum}")
+        finally:
+            await self.media_storage_service.delete_file(staging_path)
+
+    async def release(self, path: str, derivative_paths: Iterable[str], session: AsyncSession,
+                      progress: DeletionProgress | None = None) -> bool:
+        """
+        Drop a reference taken for a media item that was never created, deleting the
+        blob and the given renditions of it when no reference is left. Returns False
+        when `path` is not a blob (an object the caller deletes).
+        """
+        blob = await self.media_blob_repository.get_blob_by_path_for_update(path, session)
+        if blob is None:
+            await session.commit()
+            return False
+        blob.ref_count -= 1
+        await self.media_blob_repository.save_blob(blob, session)
+        return await self.collect(path, derivative_paths, session, progress)
+
+    async def collect(self, path: str, derivative_paths: Iterable[str], session: AsyncSession,
+                      progress: DeletionProgress | None = None) -> bool:
+        """
+        Delete the blob at `path` and the given renditions of it if no reference is
+        left, once the rows holding them are deleted. Returns False when `path` is not
+        a blob (an object owned by one media item, which the caller deletes).
+        """
+        blob = await self.media_blob_repository.get_blob_by_path_for_update(path, session)
+        if blob is None:
+            await session.commit()
+            return False
+        if blob.ref_count > 0:
+            await session.commit()
+            return True
+        await self.media_storage_service.delete_files([path, *derivative_paths], progress)
+        await self.media_blob_repository.delete_blob(blob, session)
+        await session.commit()
+        logger.info(f"Deleted unreferenced blob {path}")
+        return True
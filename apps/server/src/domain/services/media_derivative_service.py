@@ -0,0 +1,185 @@
+import asyncio
+import logging
+from typing import Dict, Set, Tuple
+from sqlmodel.ext.asyncio.session import AsyncSession
+from src.domain.models.media_item import MediaItem, MediaSize, MediaType
+from src.infrastructure.repositories.media_item_repository import MediaItemRepository
+from src.infrastructure.storage.media_storage_service import MediaStorageService
+from src.infrastructure.imaging.derivatives import (
+    DERIVATIVE_SIZES, DERIVATIVE_FORMATS, FALLBACK_FORMAT,
+    derivative_path, derivative_key, variant_path, is_renderable, image_processor
+)
+from src.infrastructure.imaging.placeholder import ImagePlaceholder
+
+logger = logging.getLogger(__name__)
+
+class MediaDerivativeService:
+    """
+    Produces the resized renditions of photos, in every supported format, and their
+    placeholders, and resolves which object to serve for a requested size and `Accept`
+    header. Concurrent generations of the same original share one job.
+    """
+
+    def __init__(self,
+                 media_item_repository: MediaItemRepository | None = None,
+                 media_storage_service: MediaStorageService | None = None):
+        self.media_item_repository = media_item_repository or MediaItemRepository()
+        self.media_storage_service = media_storage_service or MediaStorageService()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    async def generate_for_media_item(self, media_item_id: int, session: AsyncSession) -> Dict[str, str]:
+        """Render and record every missing rendition of a photo and its placeholder (run after upload)"""
+        media_item = await self.media_item_repository.get_media_item_by_id(media_item_id, session)
+        if not media_item or media_item.type != MediaType.photo:
+            return {}
+        if not is_renderable(media_item.content_type, media_item.size_bytes):
+            logger.info(f"Not rendering media item {media_item_id}: original too large or not an image")
+            return {}
+        existing = media_item.derivatives or {}
+        if self._complete(existing):
+            if media_item.blurhash is None:
+                await self.record_placeholder(media_item, session)
+            return existing
+        # Renditions of a shared original may already have been made for another media item
+        shared = await self.media_item_repository.get_derivatives_by_path(media_item.path, session)
+        if shared and self._complete(shared):
+            placeholder = await self.media_item_repository.get_placeholder_by_path(media_item.path, session)
+            await self._record(media_item, shared, ImagePlaceholder(*placeholder) if placeholder else None, session)
+            if media_item.blurhash is None:
+                await self.record_placeholder(media_item, session)
+            return shared
+        paths, placeholder = await self._generate(media_item.path)
+        await self._record(media_item, paths, placeholder, session)
+        return paths
+
+    async def record_placeholder(self, media_item: MediaItem, session: AsyncSession) -> ImagePlaceholder:
+        """Compute and record the placeholder of a photo from its smallest rendition, or the original without one"""
+        source = (media_item.derivatives or {}).get(MediaSize.thumb.value) or media_item.path
+        placeholder = await image_processor.placeholder(lambda: self.media_storage_service.get_file_bytes(source))
+        media_item.blurhash = placeholder.blurhash
+        media_item.dominant_color = placeholder.dominant_color
+        await self.media_item_repository.update_media_item(media_item, session)
+        return placeholder
+
+    async def backfill_placeholders(self, session: AsyncSession, batch_size: int = 100) -> int:
+        """
+        Record the placeholders of photos uploaded before they were computed. Returns the
+        number of photos updated; images that cannot be read are logged and skipped.
+        """
+        updated = 0
+        after_id = 0
+        while True:
+            batch = await self.media_item_repository.get_photos_without_placeholder(after_id, batch_size, session)
+            if not batch:
+                return updated
+            for media_item in batch:
+                after_id = media_item.id or after_id
+                try:
+                    await self.record_placeholder(media_item, session)
+                except Exception as e:
+                    logger.warning(f"Could not compute the placeholder of media item {media_item.id}: {e}")
+                    continue
+                updated += 1
+
+    def _complete(self, derivatives: Dict[str, str]) -> bool:
+        return all(derivative_key(size, image_format) in derivatives
+                   for size in DERIVATIVE_SIZES for image_format in DERIVATIVE_FORMATS)
+
+    async def resolve_path(self, path: str, size: MediaSize, media_item_id: int, session: AsyncSession,
+                           media_item: MediaItem | None = None) -> str:
+        """
+        Get the storage path to serve for `size` of the original at `path`.
+        A rendition that does not exist yet is generated on this first request;
+        if the original cannot be rendered (not an image, or larger than
+        DERIVATIVE_SOURCE_MAX_BYTES) the original is served. Without `media_item`
+        (signed URLs) the original's stored type and size are checked first.
+        """
+        if media_item is not None:
+            if media_item.type != MediaType.photo:
+                return path
+            known = (media_item.derivatives or {}).get(size.value)
+            if known:
+                return known
+            if not is_renderable(media_item.content_type, media_item.size_bytes):
+                return path
+
+        target = derivative_path(path, size.value)
+        if await self.media_storage_service.file_exists(target):
+            return target
+        try:
+            if media_item is None:
+                info = await self.media_storage_service.get_file_info(path)
+                if not is_renderable(info.content_type, info.size):
+                    return path
+            paths, placeholder = await self._generate(path)
+        except Exception as e:
+            logger.warning(f"Could not render {size.value} rendition of {path}: {e}")
+            return path
+
+        media_item = media_item or await self.media_item_repository.get_media_item_by_id(media_item_id, session)
+        if media_item and media_item.path == path:
+            await self._record(media_item, paths, placeholder, session)
+        return paths[size.value]
+
+    def select_variant(self, path: str, accepted: Set[str], media_item: MediaItem | None = None) -> tuple[str, bool]:
+        """
+        Pick the smallest encoding of a rendition that the client accepts.
+        Returns (path to serve, whether the choice depended on `Accept`). Without a
+        media item the variants are assumed to exist next to the rendition; the
+        caller falls back to `path` if one is missing.
+        """
+        if variant_path(path, FALLBACK_FORMAT) is None:
+            return path, False
+        known = set((media_item.derivatives or {}).values()) if media_item is not None else None
+        for image_format in DERIVATIVE_FORMATS:
+            if image_format is FALLBACK_FORMAT:
+                break
+            candidate = variant_path(path, image_format)
+            if image_format.content_type in accepted and candidate and (known is None or candidate in known):
+                return candidate, True
+        return path, True
+
+    async def _generate(self, path: str) -> Tuple[Dict[str, str], ImagePlaceholder]:
+        """
+        Render all sizes of an original and store them next to it, coalescing concurrent
+        calls. Returns the rendition paths and the placeholder computed along the way.
+        """
+        in_flight = self._in_flight.get(path)
+        if in_flight is not None:
+            return await asyncio.shield(in_flight)
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._in_flight[path] = future
+        try:
+            rendered = await image_processor.render(
+                lambda: self.media_storage_service.get_file_bytes(path),
+                list(DERIVATIVE_SIZES),
+                [image_format.name for image_format in DERIVATIVE_FORMATS]
+            )
+            paths: Dict[str, str] = {}
+            for size, encodings in rendered.renditions.items():
+                for image_format in DERIVATIVE_FORMATS:
+                    paths[derivative_key(size, image_format)] = await self.media_storage_service.put_file_bytes(
+                        derivative_path(path, size, image_format), encodings[image_format.name], image_format.content_type
+                    )
+            future.set_result((paths, rendered.placeholder))
+            logger.info(f"Generated {len(paths)} renditions of {path}")
+            return paths, rendered.placeholder
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            self._in_flight.pop(path, None)
+
+    async def _record(self, media_item: MediaItem, paths: Dict[str, str], placeholder: ImagePlaceholder | None,
+                      session: AsyncSession) -> None:
+        media_item.derivatives = {**(media_item.derivatives or {}), **paths}
+        if placeholder is not None:
+            media_item.blurhash = placeholder.blurhash
+            media_item.dominant_color = placeholder.dominant_color
+        await self.media_item_repository.update_media_item(media_item, session)
@@ -1,19 +1,26 @@
-from typing import Sequence, Any
+import logging
+from typing import List, Sequence, Any
 from sqlmodel.ext.asyncio.session import AsyncSession
-from src.domain.models.media_item import MediaItem, MediaType
+from src.domain.models.media_item import MediaItem, MediaMetadata, MediaType
 from src.infrastructure.repositories.media_item_repository import MediaItemRepository
 from src.infrastructure.repositories.post_repository import PostRepository
-from src.infrastructure.storage.media_storage_service import MediaStorageService
-from src.domain.errors.custom_errors import MediaItemNotFoundError, PostNotFoundError
+from src.infrastructure.storage.media_storage_service import MediaStorageService, FileInfo, BLOB_PREFIX
+from src.domain.services.media_blob_service import MediaBlobService
+from src.infrastructure.storage.deletion_jobs import DeletionProgress
+from src.domain.errors.custom_errors import MediaItemNotFoundError, PostNotFoundError, BlobPathNotAllowedError
+
+logger = logging.getLogger(__name__)
 
 class MediaItemService:
     def __init__(self, 
                  media_item_repository: MediaItemRepository | None = None,
                  post_repository: PostRepository | None = None,
-                 media_storage_service: MediaStorageService | None = None):
+                 media_storage_service: MediaStorageService | None = None,
+                 media_blob_service: MediaBlobService | None = None):
         self.media_item_repository = media_item_repository or MediaItemRepository()
         self.post_repository = post_repository or PostRepository()
         self.media_storage_service = media_storage_service or MediaStorageService()
+        self.media_blob_service = media_blob_service or MediaBlobService(media_storage_service=self.media_storage_service)
 
     async def _validate_post_exists(self, post_id: int, session: AsyncSession) -> None:
         """Validate that a post exists, raise PostNotFoundError if not"""
@@ -21,12 +28,26 @@ class MediaItemService:
         if not post:
             raise PostNotFoundError(post_id)
 
-    async def create_media_item(self, post_id: int, path: str, media_type: MediaType, order: int, session: AsyncSession) -> MediaItem:
+    async def create_media_item(self, post_id: int, path: str, media_type: MediaType, order: int, session: AsyncSession,
+                                metadata: MediaMetadata | None = None) -> MediaItem:
         await self._validate_post_exists(post_id, session)
         
-        media_item = MediaItem(post_id=post_id, path=path, type=media_type, order=order)
+        media_item = MediaItem(
+            post_id=post_id, path=path, type=media_type, order=order,
+            **(metadata.model_dump() if metadata else {})
+        )
         return await self.media_item_repository.create_media_item(media_item, session)
 
+    async def create_media_item_for_path(self, post_id: int, path: str, media_type: MediaType, order: int,
+                                         session: AsyncSession) -> MediaItem:
+        """
+        Create a media item for an object stored by the caller. Blob paths are refused:
+        their references are only taken by the uploads that create items for them.
+        """
+        if path.startswith(BLOB_PREFIX):
+            raise BlobPathNotAllowedError(path)
+        return await self.create_media_item(post_id, path, media_type, order, session)
+
     async def get_media_items_by_post_id(self, post_id: int, session: AsyncSession) -> Sequence[MediaItem]:
         await self._validate_post_exists(post_id, session)
         return await self.media_item_repository.get_media_items_by_post_id(post_id, session)
@@ -42,8 +63,11 @@ class MediaItemService:
         if not media_item:
             raise MediaItemNotFoundError(media_item_id)
         
-        # Update only provided fields
-        if path is not None:
+        # Update only provided fields. Moving an item to or off a blob would
+        # change the blob's references behind its count.
+        if path is not None and path != media_item.path:
+            if path.startswith(BLOB_PREFIX) or media_item.path.startswith(BLOB_PREFIX):
+                raise BlobPathNotAllowedError(path)
             media_item.path = path
         if media_type is not None:
             media_item.type = media_type
@@ -62,26 +86,111 @@ class MediaItemService:
         if not deleted:
             raise MediaItemNotFoundError(media_item_id)
         
-        # Delete the actual file from storage
-        self.media_storage_service.delete_file(media_item.path)
+        await self.delete_detached_media_files([media_item], session)
+
+    async def delete_detached_media_files(self, media_items: Sequence[MediaItem], session: AsyncSession,
+                                          progress: DeletionProgress | None = None) -> None:
+        """
+        Delete the stored files of media items whose rows (and blob references) are
+        already deleted: blobs left without references are deleted, files owned by a
+        single media item are removed together in multi-object deletes.
+        """
+        owned: List[str] = []
+        for media_item in media_items:
+            derivatives = list((media_item.derivatives or {}).values())
+            collected = await self.media_blob_service.collect(media_item.path, derivatives, session, progress)
+            # A blob whose row is gone was collected already, and may have been stored again since
+            if not collected and not media_item.path.startswith(BLOB_PREFIX):
+                owned += [media_item.path, *derivatives]
+        if owned:
+            await self.media_storage_service.delete_files(owned, progress)
 
     async def delete_media_items_by_post_id(self, post_id: int, session: AsyncSession) -> None:
         """Delete all media items for a post from database only (not storage)"""
         await self.media_item_repository.delete_media_items_by_post_id(post_id, session)
+
+    async def detach_post_media(self, post_id: int, session: AsyncSession) -> Sequence[MediaItem]:
+        """Delete a post's media item rows and return them, so their files can be deleted later"""
+        media_items = await self.media_item_repository.get_media_items_by_post_id(post_id, session)
+        await self.media_item_repository.delete_media_items_by_post_id(post_id, session)
+        return media_items
+
+    async def detach_user_media(self, user_id: int, session: AsyncSession) -> Sequence[MediaItem]:
+        """Delete the media item rows of all of a user's posts and return them"""
+        media_items = await self.media_item_repository.get_media_items_by_user_id(user_id, session)
+        for post_id in {media_item.post_id for media_item in media_items}:
+            await self.media_item_repository.delete_media_items_by_post_id(post_id, session)
+        return media_items
     
-    async def delete_post_media_with_files(self, post_id: int, user_id: int, session: AsyncSession) -> int:
+    async def delete_post_media_with_files(self, post_id: int, user_id: int, session: AsyncSession,
+                                           progress: DeletionProgress | None = None) -> int:
         """
         Delete all media items for a post from both database and storage.
-        Returns count of files deleted from storage.
+        Shared blobs are only deleted when no other media item references them.
+        Returns count of files deleted from the post's own storage prefix.
         """
-        # Delete from database first
-        await self.media_item_repository.delete_media_items_by_post_id(post_id, session)
-        
-        # Delete all files from storage for this post
-        deleted_count = self.media_storage_service.delete_post_media(user_id, post_id)
-        
-        return deleted_count
+        media_items = await self.detach_post_media(post_id, session)
+        await self.delete_detached_media_files(media_items, session, progress)
+        return await self.media_storage_service.delete_post_media(user_id, post_id, progress)
+
+    async def delete_user_media_with_files(self, user_id: int, session: AsyncSession,
+                                           progress: DeletionProgress | None = None) -> int:
+        """
+        Delete all media items of a user's posts from both database and storage,
+        releasing their blobs. Returns count of files deleted from the user's own prefix.
+        """
+        media_items = await self.detach_user_media(user_id, session)
+        await self.delete_detached_media_files(media_items, session, progress)
+        return await self.media_storage_service.delete_user_media(user_id, progress)
 
-    def get_media_item_stream(self, file_path: str) -> tuple[Any, str, int]:
+    async def get_media_item_stream(self, file_path: str, info: FileInfo | None = None) -> tuple[Any, str, int]:
         """Get a media item stream for serving"""
-        return self.media_storage_service.get_file_stream(file_path)
+        return await self.media_storage_service.get_file_stream(file_path, info)
+
+    async def get_media_item_info(self, file_path: str) -> FileInfo:
+        """Get the stored size, content type and validators of a media file"""
+        return await self.media_storage_service.get_file_info(file_path)
+
+    async def get_media_item_range(self, file_path: str, offset: int, length: int) -> Any:
+        """Get a stream over a byte range of a media file"""
+        return await self.media_storage_service.get_file_range(file_path, offset, length)
+
+    def get_stored_info(self, media_item: MediaItem) -> FileInfo | None:
+        """Storage metadata of a media item's original recorded at ingest, if it was"""
+        if media_item.size_bytes is None or not media_item.content_type:
+            return None
+        return FileInfo(
+            content_type=media_item.content_type,
+            size=media_item.size_bytes,
+            etag=media_item.etag,
+            last_modified=None
+        )
+
+    async def backfill_media_metadata(self, session: AsyncSession, batch_size: int = 100) -> int:
+        """
+        Record storage metadata, checksum and dimensions of media items uploaded before
+        they were captured at ingest. Each original is read once. Returns the number of
+        media items updated; files that cannot be read are logged and skipped.
+        """
+        updated = 0
+        after_id = 0
+        while True:
+            batch = await self.media_item_repository.get_media_items_without_metadata(after_id, batch_size, session)
+            if not batch:
+                return updated
+            for media_item in batch:
+                after_id = media_item.id or after_id
+                try:
+                    info, probe = await self.media_storage_service.probe_file(media_item.path)
+                except Exception as e:
+                    logger.warning(f"Could not read {media_item.path} of media item {media_item.id}: {e}")
+                    continue
+                media_item.size_bytes = probe.size_bytes
+                media_item.content_type = info.content_type
+                media_item.etag = info.etag
+                media_item.checksum = probe.checksum
+                media_item.width = probe.width
+                media_item.height = probe.height
+                media_item.duration_seconds = probe.duration_seconds
+                await self.media_item_repository.update_media_item(media_item, session)
+                updated += 1
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+from sqlmodel.ext.asyncio.session import AsyncSession
+from src.domain.models.contact import Contact
+from src.domain.models.notification_job import NotificationJob, NotificationStatus
+from src.domain.services.notifications.notification_service import NotificationService
+from src.infrastructure.repositories.notification_job_repository import NotificationJobRepository
+from src.infrastructure.notifications.sms_provider import SmsDeliveryError
+from src.utils.env import get_optional_env_var
+
+logger = logging.getLogger(__name__)
+
+# Jobs claimed and sent together
+NOTIFICATION_BATCH_SIZE = int(get_optional_env_var("NOTIFICATION_BATCH_SIZE", "100"))
+# Sends tried before a job is dead-lettered
+NOTIFICATION_MAX_ATTEMPTS = int(get_optional_env_var("NOTIFICATION_MAX_ATTEMPTS", "6"))
+# Delay before the first retry, doubled after every failure up to the cap
+RETRY_BASE_DELAY = timedelta(seconds=30)
+RETRY_MAX_DELAY = timedelta(hours=1)
+# How long a claimed job is hidden from other dispatchers while it is being sent
+CLAIM_LEASE = timedelta(minutes=5)
+# How often the outbox is checked for retries that came due, when not woken earlier
+POLL_INTERVAL_SECONDS = 5
+# Longest error message kept on a job
+MAX_ERROR_LENGTH = 500
+
+class NotificationDispatcher:
+    """
+    Sends the notifications queued in the outbox, outside the requests that queue them.
+
+    Due jobs are claimed a batch at a time and their messages sent concurrently, within
+    the SMS client's parallelism and rate limits. A failed send is retried with
+    exponential backoff. After `max_attempts`, or at once when the provider refused
+    the message for good, the job is dead-lettered and kept for inspection. Jobs left
+    behind by a restart are picked up when the dispatcher starts, or once their lease
+    runs out.
+    """
+
+    def __init__(self,
+                 notification_service: NotificationService | None = None,
+                 repository: NotificationJobRepository | None = None,
+                 batch_size: int = NOTIFICATION_BATCH_SIZE,
+                 max_attempts: int = NOTIFICATION_MAX_ATTEMPTS):
+        self.notification_service = notification_service or NotificationService()
+        self.repository = repository or NotificationJobRepository()
+        self.batch_size = max(batch_size, 1)
+        self.max_attempts = max(max_attempts, 1)
+        # Bound to the loop the dispatcher runs on, once it runs
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+
+    def wake(self) -> None:
+        """Dispatch now rather than at the next poll, e.g. after a post's jobs were committed"""
+        if self._loop is None or self._wakeup is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            # The loop was closed
+            pass
+
+    def retry_delay(self, attempts: int) -> timedelta:
+        return min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+
+    async def dispatch_pending(self, session_factory: Callable[[], AsyncSession]) -> int:
+        """Send every job that is due, batch by batch. Returns the number of notifications sent."""
+        sent = 0
+        while True:
+            now = datetime.now(timezone.utc)
+            async with session_factory() as session:
+                claimed = await self.repository.claim_due(now, now + CLAIM_LEASE, self.batch_size, session)
+                if not claimed:
+                    return sent
+                deliverable = [(job, contact, sender_name) for job, contact, sender_name in claimed
+                               if contact is not None and sender_name is not None]
+                # The contact or the post was deleted after the job was queued
+                dropped = [job for job, contact, sender_name in claimed
+                           if contact is None or sender_name is None]
+                tokens = self.notification_service.sign_view_tokens(job.contact_id for job, _, _ in deliverable)
+                results = await asyncio.gather(*[
+                    self._deliver(job, contact, sender_name, tokens[job.contact_id])
+                    for job, contact, sender_name in deliverable
+                ])
+                await self.repository.settle([job for job, _, _ in deliverable], dropped, session)
+            sent += sum(results)
+            self._log_costs([job for job, _, _ in deliverable])
+            if len(claimed) < self.batch_size:
+                return sent
+
+    async def _deliver(self, job: NotificationJob, contact: Contact, sender_name: str, token: str) -> bool:
+        """Send one job's message and record the outcome on the job"""
+        job.attempts += 1
+        try:
+            job.message_count, job.cost = await self.notification_service.send_post_notification(
+                contact, sender_name, job.post_id, token
+            )
+        except Exception as e:
+            job.last_error = str(e)[:MAX_ERROR_LENGTH]
+            # A permanent failure (e.g. an invalid number) is not retried
+            retryable = not isinstance(e, SmsDeliveryError) or e.retryable
+            if not retryable or job.attempts >= self.max_attempts:
+                job.status = NotificationStatus.dead.value
+                logger.error(f"Gave up notifying contact {job.contact_id} of post {job.post_id} "
+                             f"after {job.attempts} attempts: {e}")
+            else:
+                job.next_attempt_at = datetime.now(timezone.utc) + self.retry_delay(job.attempts)
+                logger.warning(f"Failed to notify contact {job.contact_id} of post {job.post_id} "
+                               f"(attempt {job.attempts}), retrying: {e}")
+            return False
+        job.status = NotificationStatus.sent.value
+        job.sent_at = datetime.now(timezone.utc)
+        job.last_error = None
+        return True
+
+    def _log_costs(self, jobs: list[NotificationJob]) -> None:
+        """Log the SMS sent for each post of a batch and what they cost"""
+        per_post: dict[int, list[NotificationJob]] = {}
+        for job in jobs:
+            if job.status == NotificationStatus.sent.value:
+                per_post.setdefault(job.post_id, []).append(job)
+        for post_id, sent_jobs in per_post.items():
+            messages = sum(job.message_count or 0 for job in sent_jobs)
+            cost = sum(job.cost or 0 for job in sent_jobs)
+            logger.info(f"Notified {len(sent_jobs)} contacts of post {post_id}: {messages} SMS, cost {cost:.4f}")
+
+    async def run_periodically(self, session_factory: Callable[[], AsyncSession],
+                               interval_seconds: float = POLL_INTERVAL_SECONDS) -> None:
+        """Dispatch when woken and every `interval_seconds` until cancelled"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        while True:
+            self._wakeup.clear()
+            try:
+                await self.dispatch_pending(session_factory)
+            except Exception as e:
+                logger.error(f"Could not dispatch notifications: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), interval_seconds)
+            except asyncio.TimeoutError:
+                pass
@@ -4,10 +4,12 @@ from src.domain.models.post import Post
 from src.domain.models.audience import Audience
 from src.domain.models.user import User
 from src.domain.models.media_item import MediaItem
+from src.domain.models.notification_job import NotificationReport
 from src.infrastructure.repositories.post_repository import PostRepository
 from src.infrastructure.repositories.audience_repository import AudienceRepository
 from src.infrastructure.repositories.user_repository import UserRepository
 from src.infrastructure.repositories.media_item_repository import MediaItemRepository
+from src.infrastructure.repositories.notification_job_repository import NotificationJobRepository
 from src.domain.errors.custom_errors import PostNotFoundError, AudienceNotFoundError, UserNotFoundError
 
 class PostService:
@@ -16,6 +18,7 @@ class PostService:
         self.audience_repository = AudienceRepository()
         self.user_repository = UserRepository()
         self.media_item_repository = MediaItemRepository()
+        self.notification_job_repository = NotificationJobRepository()
 
     async def get_posts(self, session: AsyncSession) -> Sequence[Post]:
         return await self.repository.get_posts(session)
@@ -43,13 +46,25 @@ class PostService:
                 if not audience:
                     raise AudienceNotFoundError(audience_id)
         
-        post = await self.repository.create_post(description, user_id, session)
+        # The post, its audiences and its notifications are committed together
+        post = Post(description=description, user_id=user_id)
+        return await self.repository.create_post_with_media(post, audience_ids or [], [], session)
+
+    async def create_post_with_media(self, description: str, user_id: int, session: AsyncSession,
+                                     audience_ids: List[int] | None, media_items: List[MediaItem]) -> Post:
+        """Create a post together with its audiences and media items, all or nothing"""
+        user = await self.user_repository.get_user_by_id(user_id, session)
+        if not user:
+            raise UserNotFoundError(user_id)
         
-        # Assign audiences if provided
-        if audience_ids and post.id is not None:
-            await self.repository.assign_audiences_to_post(post.id, audience_ids, session)
+        if audience_ids:
+            for audience_id in audience_ids:
+                audience = await self.audience_repository.get_audience_by_id(audience_id, session)
+                if not audience:
+                    raise AudienceNotFoundError(audience_id)
         
-        return post
+        post = Post(description=description, user_id=user_id)
+        return await self.repository.create_post_with_media(post, audience_ids or [], media_items, session)
 
     async def update_post(self, post_id: int, session: AsyncSession, description: str | None = None, audience_ids: List[int] | None = None) -> Post:
         post = await self.repository.get_post_by_id(post_id, session)
@@ -72,10 +87,19 @@ class PostService:
         
         return post
 
-    async def delete_post(self, post_id: int, session: AsyncSession) -> None:
-        deleted = await self.repository.delete_post(post_id, session)
-        if not deleted:
+    async def delete_post(self, post_id: int, session: AsyncSession) -> Sequence[MediaItem]:
+        """Delete a post and its media item rows; returns the media items so their files can be deleted"""
+        media_items = await self.repository.delete_post(post_id, session)
+        if media_items is None:
+            raise PostNotFoundError(post_id)
+        return media_items
+
+    async def get_notification_report(self, post_id: int, session: AsyncSession) -> NotificationReport:
+        """SMS sent to the post's audiences so far and their cost"""
+        post = await self.repository.get_post_by_id(post_id, session)
+        if not post:
             raise PostNotFoundError(post_id)
+        return await self.notification_job_repository.get_report(post_id, session)
 
     async def get_posts_by_user(self, user_id: int, session: AsyncSession) -> Sequence[Post]:
         # Validate user exists
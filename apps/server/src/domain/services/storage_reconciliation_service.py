@@ -0,0 +1,319 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set
+from sqlmodel.ext.asyncio.session import AsyncSession
+from src.infrastructure.repositories.media_item_repository import MediaItemRepository
+from src.infrastructure.repositories.media_blob_repository import MediaBlobRepository
+from src.infrastructure.storage.media_storage_service import MediaStorageService, StoredObject
+from src.infrastructure.imaging.derivatives import rendition_prefix, rendition_owner_prefix
+from src.domain.services.media_item_service import MediaItemService
+from src.domain.services.media_blob_service import MediaBlobService
+from src.domain.errors.custom_errors import MediaItemNotFoundError
+
+logger = logging.getLogger(__name__)
+
+# Findings listed per kind in a report; the counts cover all of them
+MAX_REPORTED_PATHS = 20
+
+@dataclass
+class ReconciliationReport:
+    """What a reconciliation found, and repaired if asked to"""
+    objects_scanned: int = 0
+    bytes_scanned: int = 0
+    # Objects nothing in the database refers to
+    orphaned_objects: int = 0
+    orphaned_bytes: int = 0
+    # Unreferenced objects too new to tell from uploads in progress
+    recent_objects_skipped: int = 0
+    # Database rows referring to objects that do not exist
+    missing_media_items: int = 0
+    missing_renditions: int = 0
+    missing_blobs: int = 0
+    # Blobs left without references by a deletion job that did not finish
+    unreferenced_blobs: int = 0
+    repaired: int = 0
+    samples: Dict[str, List[str]] = field(default_factory=dict)
+
+    def note(self, kind: str, description: str) -> None:
+        sample = self.samples.setdefault(kind, [])
+        if len(sample) < MAX_REPORTED_PATHS:
+            sample.append(description)
+
+
+@dataclass(eq=False)
+class _Reference:
+    """A path the database refers to, held while the listing is near it"""
+    path: str
+    # None for a blob row
+    media_item_id: Optional[int] = None
+    derivatives: Dict[str, str] = field(default_factory=dict)
+    found: bool = False
+    renditions_seen: Set[str] = field(default_factory=set)
+
+    @property
+    def prefix(self) -> str:
+        return rendition_prefix(self.path)
+
+    def passed_by(self, key: str) -> bool:
+        """Whether listing `key` means no object of this reference is still to come"""
+        return key > self.prefix and not key.startswith(self.prefix)
+
+
+class _ReferenceStream:
+    """Media item and blob paths merged into one stream in path order"""
+
+    def __init__(self, media_items: AsyncIterator[Any], blobs: AsyncIterator[Any]):
+        self._sources = [media_items, blobs]
+        self._heads: List[Optional[_Reference]] = [None, None]
+        self._done = [False, False]
+
+    async def _head(self, index: int) -> Optional[_Reference]:
+        if self._heads[index] is None and not self._done[index]:
+            try:
+                row = await anext(self._sources[index])
+            except StopAsyncIteration:
+                self._done[index] = True
+                return None
+            if index == 0:
+                self._heads[index] = _Reference(path=row.path, media_item_id=row.id, derivatives=row.derivatives or {})
+            else:
+                self._heads[index] = _Reference(path=row.path)
+        return self._heads[index]
+
+    async def peek(self) -> Optional[_Reference]:
+        media_item, blob = await self._head(0), await self._head(1)
+        if media_item is None or (blob is not None and blob.path < media_item.path):
+            return blob
+        return media_item
+
+    async def pop(self) -> Optional[_Reference]:
+        reference = await self.peek()
+        if reference is not None:
+            self._heads[0 if self._heads[0] is reference else 1] = None
+        return reference
+
+
+class StorageReconciliationService:
+    """
+    Finds objects in the bucket that no database row refers to, and rows referring to
+    objects that do not exist, by walking the bucket listing and the media item and
+    blob paths side by side in the same (byte-wise) order. Memory holds one listing
+    page and the references near the current key, however large either side is.
+
+    Renditions are kept when their original is referenced, recorded or not, since
+    they are served by path. Every finding is confirmed before it is reported (a point
+    query for an orphan, a stat for a missing object), so rows and objects created
+    while the walk runs are never mistaken for either. Unreferenced objects newer than
+    `min_age` are skipped as possibly belonging to an upload in progress. An orphaned
+    blob stored again by an upload in the moment between its check and its deletion
+    is lost; the media item then shows up as missing on the next run.
+    """
+
+    def __init__(self,
+                 media_item_repository: MediaItemRepository | None = None,
+                 media_blob_repository: MediaBlobRepository | None = None,
+                 media_storage_service: MediaStorageService | None = None,
+                 media_item_service: MediaItemService | None = None,
+                 media_blob_service: MediaBlobService | None = None):
+        self.media_item_repository = media_item_repository or MediaItemRepository()
+        self.media_blob_repository = media_blob_repository or MediaBlobRepository()
+        self.media_storage_service = media_storage_service or MediaStorageService()
+        self.media_blob_service = media_blob_service or MediaBlobService(
+            media_blob_repository=self.media_blob_repository,
+            media_storage_service=self.media_storage_service
+        )
+        self.media_item_service = media_item_service or MediaItemService(
+            media_item_repository=self.media_item_repository,
+            media_storage_service=self.media_storage_service
+        )
+
+    async def reconcile(self, session_factory: Callable[[], AsyncSession], repair: bool = False,
+                        checkpoint_path: str | None = None, max_objects_per_second: float = 1000,
+                        min_age: timedelta = timedelta(hours=24)) -> ReconciliationReport:
+        """
+        Walk the whole bucket and report (or, with `repair`, also fix) what is out of sync:
+        orphaned objects are deleted, media items whose original is missing are deleted,
+        missing renditions are forgotten so they are rendered again, unused blob rows
+        whose object is missing are deleted, and blobs left without references are
+        deleted (their renditions go as orphans on a later run). The listing is paced to
+        `max_objects_per_second`. With `checkpoint_path`, progress is saved after every
+        page and a later run resumes from it; the file is removed once the walk completes.
+        """
+        report, start_after = self._load_checkpoint(checkpoint_path)
+        from_path = self._resume_path(start_after)
+        cutoff = datetime.now(timezone.utc) - min_age
+        # The two streams each hold a cursor open, so lookups and repairs get their own session
+        async with session_factory() as media_item_session, session_factory() as blob_session, \
+                session_factory() as session:
+            references = _ReferenceStream(
+                self.media_item_repository.stream_paths(from_path, media_item_session),
+                self.media_blob_repository.stream_paths(from_path, blob_session)
+            )
+            window: List[_Reference] = []
+            async for page in self.media_storage_service.list_objects(start_after):
+                if not page:
+                    continue
+                started = time.monotonic()
+                orphans: List[str] = []
+                for stored in page:
+                    owner = rendition_owner_prefix(stored.path)
+                    while (reference := await references.peek()) is not None and (
+                            reference.path <= stored.path or (owner and reference.path.startswith(owner))):
+                        window.append(await references.pop())
+                    for reference in [reference for reference in window if reference.passed_by(stored.path)]:
+                        window.remove(reference)
+                        await self._check_reference(reference, report, repair, session)
+                    if not self._match(stored.path, owner, window):
+                        await self._check_object(stored, owner, cutoff, report, session, orphans)
+                    report.objects_scanned += 1
+                    report.bytes_scanned += stored.size
+                if orphans and repair:
+                    report.repaired += (await self.media_storage_service.delete_files(orphans)).deleted
+                await session.commit()
+                self._save_checkpoint(checkpoint_path, page[-1].path, report)
+                logger.info(f"Reconciled {report.objects_scanned} objects up to {page[-1].path}")
+                pause = len(page) / max_objects_per_second - (time.monotonic() - started)
+                if pause > 0:
+                    await asyncio.sleep(pause)
+
+            # Whatever the listing did not reach does not exist
+            for reference in window:
+                await self._check_reference(reference, report, repair, session)
+            while (reference := await references.pop()) is not None:
+                await self._check_reference(reference, report, repair, session)
+            await session.commit()
+            await self._collect_unreferenced_blobs(report, repair, session)
+
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        return report
+
+    def _match(self, key: str, owner: str | None, window: List[_Reference]) -> bool:
+        """Mark the references the object at `key` satisfies; False if there are none"""
+        matched = False
+        for reference in window:
+            if reference.path == key:
+                reference.found = matched = True
+            elif owner and reference.prefix == owner:
+                reference.renditions_seen.add(key)
+                matched = True
+        return matched
+
+    async def _check_object(self, stored: StoredObject, owner: str | None, cutoff: datetime,
+                            report: ReconciliationReport, session: AsyncSession, orphans: List[str]) -> None:
+        if stored.last_modified is None or stored.last_modified > cutoff:
+            report.recent_objects_skipped += 1
+            return
+        if await self._is_referenced(stored.path, owner, session):
+            return
+        report.orphaned_objects += 1
+        report.orphaned_bytes += stored.size
+        report.note("orphaned_objects", stored.path)
+        orphans.append(stored.path)
+
+    async def _is_referenced(self, path: str, owner: str | None, session: AsyncSession) -> bool:
+        """Point lookup of a path the walk found no reference to, in case it was added meanwhile"""
+        if await self.media_item_repository.has_media_item_with_path(path, session) or \
+                await self.media_blob_repository.has_blob_with_path(path, session):
+            return True
+        return bool(owner) and (
+            await self.media_item_repository.has_media_item_with_path(owner, session, prefix=True) or
+            await self.media_blob_repository.has_blob_with_path(owner, session, prefix=True)
+        )
+
+    async def _check_reference(self, reference: _Reference, report: ReconciliationReport,
+                               repair: bool, session: AsyncSession) -> None:
+        if not reference.found:
+            if not await self.media_storage_service.is_missing(reference.path):
+                return
+            if reference.media_item_id is None:
+                report.missing_blobs += 1
+                report.note("missing_blobs", reference.path)
+                if repair and await self._delete_unused_blob(reference.path, session):
+                    report.repaired += 1
+                return
+            report.missing_media_items += 1
+            report.note("missing_media_items", f"{reference.media_item_id}: {reference.path}")
+            if repair:
+                try:
+                    await self.media_item_service.delete_media_item(reference.media_item_id, session)
+                    report.repaired += 1
+                except MediaItemNotFoundError:
+                    pass
+            return
+
+        missing = {
+            key: path for key, path in reference.derivatives.items()
+            if path not in reference.renditions_seen and await self.media_storage_service.is_missing(path)
+        }
+        if not missing:
+            return
+        report.missing_renditions += len(missing)
+        for path in missing.values():
+            report.note("missing_renditions", f"{reference.media_item_id}: {path}")
+        if repair and reference.media_item_id is not None:
+            report.repaired += await self._forget_renditions(reference.media_item_id, missing, session)
+
+    async def _collect_unreferenced_blobs(self, report: ReconciliationReport, repair: bool,
+                                          session: AsyncSession) -> None:
+        for path in await self.media_blob_repository.get_unreferenced_paths(session):
+            report.unreferenced_blobs += 1
+            report.note("unreferenced_blobs", path)
+            if repair and await self.media_blob_service.collect(path, [], session):
+                report.repaired += 1
+
+    async def _delete_unused_blob(self, path: str, session: AsyncSession) -> bool:
+        """
+        Delete a blob row whose object is missing if no media item uses it. Blobs still in
+        use are released by the repair of those media items instead.
+        """
+        blob = await self.media_blob_repository.get_blob_by_path_for_update(path, session)
+        if blob is None or await self.media_item_repository.has_media_item_with_path(path, session):
+            await session.commit()
+            return False
+        await self.media_blob_repository.delete_blob(blob, session)
+        await session.commit()
+        return True
+
+    async def _forget_renditions(self, media_item_id: int, missing: Dict[str, str], session: AsyncSession) -> int:
+        """Drop missing renditions from a media item, so they are rendered again when requested"""
+        media_item = await self.media_item_repository.get_media_item_by_id(media_item_id, session)
+        if media_item is None or not media_item.derivatives:
+            return 0
+        kept = {key: path for key, path in media_item.derivatives.items() if missing.get(key) != path}
+        if len(kept) == len(media_item.derivatives):
+            return 0
+        forgotten = len(media_item.derivatives) - len(kept)
+        media_item.derivatives = kept or None
+        await self.media_item_repository.update_media_item(media_item, session)
+        return forgotten
+
+    def _resume_path(self, start_after: str | None) -> str:
+        """Lowest path a reference still pending at listing position `start_after` can have"""
+        if start_after is None:
+            return ""
+        directory, _, file_name = start_after.rpartition("/")
+        stem = file_name.split(".", 1)[0]
+        return f"{directory}/{stem}" if directory else stem
+
+    def _load_checkpoint(self, checkpoint_path: str | None) -> tuple[ReconciliationReport, str | None]:
+        if not checkpoint_path or not os.path.exists(checkpoint_path):
+            return ReconciliationReport(), None
+        with open(checkpoint_path) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        logger.info(f"Resuming reconciliation after {checkpoint['after']}")
+        return ReconciliationReport(**checkpoint["report"]), checkpoint["after"]
+
+    def _save_checkpoint(self, checkpoint_path: str | None, after: str, report: ReconciliationReport) -> None:
+        if not checkpoint_path:
+            return
+        # Written aside and renamed, so an interrupted run never leaves a torn checkpoint
+        temp_path = f"{checkpoint_path}.tmp"
+        with open(temp_path, "w") as checkpoint_file:
+            json.dump({"after": after, "report": asdict(report)}, checkpoint_file)
+        os.replace(temp_path, checkpoint_path)
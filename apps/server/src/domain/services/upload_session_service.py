@@ -0,0 +1,250 @@
+import asyncio
+import logging
+import re
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Sequence
+from sqlmodel.ext.asyncio.session import AsyncSession
+from src.domain.models.media_item import MediaItem, MediaMetadata, MediaType
+from src.domain.models.upload_session import UploadSession, UploadSessionPart
+from src.infrastructure.repositories.upload_session_repository import UploadSessionRepository
+from src.infrastructure.repositories.post_repository import PostRepository
+from src.infrastructure.storage.media_storage_service import MediaStorageService, STAGING_PREFIX
+from src.infrastructure.storage.upload_pipe import UPLOAD_PART_SIZE
+from src.domain.services.media_item_service import MediaItemService
+from src.domain.services.media_blob_service import MediaBlobService
+from src.domain.errors.custom_errors import (
+    PostNotFoundError, PostNotOwnedError, FileTooLargeError, UploadSessionNotFoundError, UploadIncompleteError,
+    ChecksumMismatchError
+)
+from src.utils.env import get_optional_env_var
+
+logger = logging.getLogger(__name__)
+
+# Largest file a resumable upload session accepts
+UPLOAD_SESSION_MAX_BYTES = int(get_optional_env_var("UPLOAD_SESSION_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+# Sessions (and multipart uploads without one) idle for longer than this are aborted
+UPLOAD_SESSION_TTL = timedelta(hours=float(get_optional_env_var("UPLOAD_SESSION_TTL_HOURS", "24")))
+# How often stale sessions are looked for
+COLLECT_INTERVAL_SECONDS = 60 * 60
+# How long a presigned URL for a direct upload stays valid
+DIRECT_UPLOAD_URL_TTL = timedelta(seconds=int(get_optional_env_var("DIRECT_UPLOAD_URL_TTL_SECONDS", "900")))
+SHA256_HEX = re.compile(r"^[0-9a-f]{64}$")
+
+class UploadSessionService:
+    """
+    Uploads that happen outside a single request to the API.
+
+    Resumable uploads are for files too large to send in one request, e.g. videos over
+    mobile data. A session maps onto a multipart upload in storage: every part is
+    stored as it arrives and recorded, so after an interruption the client asks which
+    parts were received and sends only the others.
+
+    Direct uploads keep the bytes away from the API server: the client gets a presigned
+    URL and PUTs the file to storage itself.
+
+    Completing either kind checks the stored object against what the client declared,
+    reads it back once for its checksum, dimensions and duration, moves it to its
+    content address and creates the media item.
+    """
+
+    def __init__(self,
+                 upload_session_repository: UploadSessionRepository | None = None,
+                 post_repository: PostRepository | None = None,
+                 media_storage_service: MediaStorageService | None = None,
+                 media_item_service: MediaItemService | None = None,
+                 media_blob_service: MediaBlobService | None = None):
+        self.upload_session_repository = upload_session_repository or UploadSessionRepository()
+        self.post_repository = post_repository or PostRepository()
+        self.media_storage_service = media_storage_service or MediaStorageService()
+        self.media_blob_service = media_blob_service or MediaBlobService(media_storage_service=self.media_storage_service)
+        self.media_item_service = media_item_service or MediaItemService(
+            media_storage_service=self.media_storage_service, media_blob_service=self.media_blob_service
+        )
+
+    async def _validate(self, user_id: int, post_id: int, size_bytes: int, sha256: str | None,
+                        session: AsyncSession) -> None:
+        post = await self.post_repository.get_post_by_id(post_id, session)
+        if not post:
+            raise PostNotFoundError(post_id)
+        if post.user_id != user_id:
+            raise PostNotOwnedError(post_id)
+        if size_bytes > UPLOAD_SESSION_MAX_BYTES:
+            raise FileTooLargeError(UPLOAD_SESSION_MAX_BYTES)
+        if size_bytes <= 0:
+            raise ValueError("File size must be positive")
+        if sha256 is not None and not SHA256_HEX.match(sha256.lower()):
+            raise ValueError("sha256 must be 64 hexadecimal digits")
+
+    async def create_session(self, user_id: int, post_id: int, file_name: str, content_type: str, size_bytes: int,
+                             session: AsyncSession, order: int = 0, sha256: str | None = None) -> UploadSession:
+        await self._validate(user_id, post_id, size_bytes, sha256, session)
+        object_name = self.media_storage_service.staging_path(file_name)
+        upload_id = await self.media_storage_service.create_multipart_upload(object_name, content_type)
+        upload_session = UploadSession(
+            id=uuid.uuid4().hex, user_id=user_id, post_id=post_id, order=order, file_name=file_name,
+            content_type=content_type, size_bytes=size_bytes, part_size=UPLOAD_PART_SIZE,
+            sha256=sha256.lower() if sha256 else None, object_name=object_name, upload_id=upload_id
+        )
+        try:
+            return await self.upload_session_repository.create_session(upload_session, session)
+        except BaseException:
+            await self.media_storage_service.abort_multipart_upload(object_name, upload_id)
+            raise
+
+    async def create_direct_upload(self, user_id: int, post_id: int, file_name: str, content_type: str,
+                                   size_bytes: int, sha256: str, session: AsyncSession,
+                                   order: int = 0) -> tuple[UploadSession, str]:
+        """
+        Start a direct upload. Returns the session and the presigned URL the client PUTs
+        the file to, with `content_type` as its Content-Type, within DIRECT_UPLOAD_URL_TTL.
+        The checksum is required, as the server never sees the bytes on their way in.
+        """
+        await self._validate(user_id, post_id, size_bytes, sha256, session)
+        upload_session = await self.upload_session_repository.create_session(UploadSession(
+            id=uuid.uuid4().hex, user_id=user_id, post_id=post_id, order=order, file_name=file_name,
+            content_type=content_type, size_bytes=size_bytes, part_size=size_bytes, sha256=sha256.lower(),
+            object_name=self.media_storage_service.staging_path(file_name)
+        ), session)
+        url = self.media_storage_service.presigned_put_url(upload_session.object_name, DIRECT_UPLOAD_URL_TTL)
+        return upload_session, url
+
+    async def get_session(self, session_id: str, user_id: int, session: AsyncSession) -> UploadSession:
+        """An upload session of the user; other users' sessions are reported as not found"""
+        upload_session = await self.upload_session_repository.get_session_by_id(session_id, session)
+        if upload_session is None or upload_session.user_id != user_id:
+            raise UploadSessionNotFoundError(session_id)
+        return upload_session
+
+    def part_count(self, upload_session: UploadSession) -> int:
+        return -(-upload_session.size_bytes // upload_session.part_size)
+
+    def part_length(self, upload_session: UploadSession, part_number: int) -> int:
+        """Bytes part `part_number` (from 1) must have: `part_size`, the last one the remainder"""
+        if upload_session.upload_id is None:
+            raise ValueError("A direct upload is sent to storage, not in parts")
+        count = self.part_count(upload_session)
+        if not 1 <= part_number <= count:
+            raise ValueError(f"Part number must be between 1 and {count}")
+        if part_number < count:
+            return upload_session.part_size
+        return upload_session.size_bytes - upload_session.part_size * (count - 1)
+
+    async def get_parts(self, upload_session: UploadSession, session: AsyncSession) -> Sequence[UploadSessionPart]:
+        return await self.upload_session_repository.get_parts(upload_session.id, session)
+
+    async def upload_part(self, upload_session: UploadSession, part_number: int, data: bytes,
+                          session: AsyncSession) -> UploadSessionPart:
+        expected = self.part_length(upload_session, part_number)
+        if len(data) != expected:
+            raise ValueError(f"Part {part_number} must be {expected} bytes, got {len(data)}")
+        etag = await self.media_storage_service.upload_part(
+            upload_session.object_name, upload_session.upload_id, part_number, data
+        )
+        part = UploadSessionPart(session_id=upload_session.id, part_number=part_number, etag=etag, size_bytes=len(data))
+        return await self.upload_session_repository.save_part(upload_session, part, session)
+
+    async def complete(self, upload_session: UploadSession, media_type: MediaType, session: AsyncSession) -> MediaItem:
+        """
+        Turn the uploaded file of a session into a media item: the parts of a resumable
+        upload are assembled first, a direct upload must have been stored. A file that does
+        not match its declared size, content type or checksum is discarded with the session.
+        """
+        if upload_session.upload_id is None:
+            await self._check_direct_upload(upload_session, session)
+        else:
+            parts = await self.upload_session_repository.get_parts(upload_session.id, session)
+            received = {part.part_number: part.etag for part in parts}
+            missing = [number for number in range(1, self.part_count(upload_session) + 1) if number not in received]
+            if missing:
+                raise UploadIncompleteError(missing)
+            await self.media_storage_service.complete_multipart_upload(
+                upload_session.object_name, upload_session.upload_id, sorted(received.items())
+            )
+        info, probe = await self.media_storage_service.probe_file(upload_session.object_name)
+        if upload_session.sha256 and probe.checksum != upload_session.sha256:
+            await self.abort(upload_session, session)
+            raise ChecksumMismatchError(upload_session.sha256, probe.checksum)
+
+        blob, _ = await self.media_blob_service.store_staged(
+            upload_session.object_name, probe.checksum, upload_session.file_name, probe.size_bytes,
+            upload_session.content_type, session, staged_etag=info.etag
+        )
+        try:
+            media_item = await self.media_item_service.create_media_item(
+                post_id=upload_session.post_id,
+                path=blob.path,
+                media_type=media_type,
+                order=upload_session.order,
+                session=session,
+                metadata=MediaMetadata(
+                    size_bytes=probe.size_bytes,
+                    content_type=upload_session.content_type,
+                    etag=blob.etag,
+                    checksum=probe.checksum,
+                    width=probe.width,
+                    height=probe.height,
+                    duration_seconds=probe.duration_seconds
+                )
+            )
+        except BaseException:
+            await session.rollback()
+            await self.media_blob_service.release(blob.path, [], session)
+            # The assembled file is gone, so the session cannot be completed again
+            await self.upload_session_repository.delete_session(upload_session, session)
+            raise
+        await self.upload_session_repository.delete_session(upload_session, session)
+        logger.info(f"Completed upload session {upload_session.id} as media item {media_item.id}")
+        return media_item
+
+    async def _check_direct_upload(self, upload_session: UploadSession, session: AsyncSession) -> None:
+        """Check the object a client uploaded with a presigned URL against what it declared"""
+        if await self.media_storage_service.is_missing(upload_session.object_name):
+            raise UploadIncompleteError([])
+        info = await self.media_storage_service.get_file_info(upload_session.object_name)
+        if info.size != upload_session.size_bytes or info.content_type != upload_session.content_type:
+            await self.abort(upload_session, session)
+            raise ValueError(
+                f"Uploaded {info.size} bytes of {info.content_type}, "
+                f"declared {upload_session.size_bytes} bytes of {upload_session.content_type}"
+            )
+
+    async def abort(self, upload_session: UploadSession, session: AsyncSession) -> None:
+        """Drop a session with what was stored of its file"""
+        if upload_session.upload_id is not None:
+            await self.media_storage_service.abort_multipart_upload(upload_session.object_name, upload_session.upload_id)
+        await self.media_storage_service.delete_file(upload_session.object_name)
+        await self.upload_session_repository.delete_session(upload_session, session)
+
+    async def collect_stale_sessions(self, session: AsyncSession, batch_size: int = 100) -> int:
+        """
+        Abort sessions idle for longer than UPLOAD_SESSION_TTL, and multipart uploads as
+        old under the staging prefix that no session tracks (left by a crash between
+        starting one and recording it). Returns the number of uploads aborted.
+        """
+        idle_since = datetime.now(timezone.utc) - UPLOAD_SESSION_TTL
+        aborted = 0
+        while stale := await self.upload_session_repository.get_stale_sessions(idle_since, batch_size, session):
+            for upload_session in stale:
+                await self.abort(upload_session, session)
+                aborted += 1
+        for object_name, upload_id, initiated in await self.media_storage_service.list_multipart_uploads(STAGING_PREFIX):
+            if initiated is None or initiated >= idle_since:
+                continue
+            if await self.upload_session_repository.get_session_by_upload_id(upload_id, session) is None:
+                await self.media_storage_service.abort_multipart_upload(object_name, upload_id)
+                aborted += 1
+        if aborted:
+            logger.info(f"Aborted {aborted} stale uploads")
+        return aborted
+
+    async def collect_periodically(self, session_factory: Callable[[], AsyncSession],
+                                   interval_seconds: float = COLLECT_INTERVAL_SECONDS) -> None:
+        """Collect stale sessions every `interval_seconds` until cancelled"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                async with session_factory() as session:
+                    await self.collect_stale_sessions(session)
+            except Exception as e:
+                logger.error(f"Could not collect stale upload sessions: {e}")
@@ -1,5 +1,6 @@
 import jwt
 from datetime import datetime, timedelta, timezone
+from typing import Iterable
 from src.utils.env import get_env_var
 
 class JwtProvider:
@@ -28,6 +29,10 @@ class JwtProvider:
         }
         return jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
     
+    def create_contact_view_tokens(self, contact_ids: Iterable[int], expires_days: int = 30) -> dict[int, str]:
+        """Contact view tokens for a set of recipients, one per distinct contact"""
+        return {contact_id: self.create_contact_view_token(contact_id, expires_days) for contact_id in set(contact_ids)}
+
     def verify_token(self, token: str) -> dict | None:
         """Verify a JWT token"""
         try:
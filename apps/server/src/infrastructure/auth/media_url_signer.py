@@ -0,0 +1,66 @@
+import base64
+import hashlib
+import hmac
+import math
+import time
+from urllib.parse import urlencode
+from src.utils.env import get_env_var, get_optional_env_var
+
+class MediaUrlSigner:
+    """
+    Signs short-lived media stream URLs with HMAC-SHA256.
+
+    A signature binds the media item id, its storage path, the viewer and the
+    expiry, so the stream endpoint can serve the object without any database
+    work. Keys come from MEDIA_URL_SIGNING_KEYS as "kid:secret" pairs separated
+    by commas; the first key signs and every listed key verifies, which allows
+    rotation. Without it a key is derived from JWT_SECRET_KEY.
+    """
+
+    def __init__(self):
+        self.keys = self._load_keys()
+        self.active_key_id = next(iter(self.keys))
+        self.ttl_seconds = int(get_optional_env_var("MEDIA_URL_TTL_SECONDS", "3600"))
+        # Expiries are rounded up to this granularity so feed loads emit identical URLs
+        # for a whole window; browser and CDN caches are keyed by URL, so a short
+        # window would make every feed refresh download all media again. A URL is
+        # valid for at least the TTL and at most the TTL plus one window.
+        self.expiry_granularity = int(get_optional_env_var("MEDIA_URL_EXPIRY_GRANULARITY_SECONDS", "86400"))
+
+    def _load_keys(self) -> dict[str, bytes]:
+        configured = get_optional_env_var("MEDIA_URL_SIGNING_KEYS", "")
+        keys: dict[str, bytes] = {}
+        for pair in configured.split(","):
+            if ":" in pair:
+                key_id, secret = pair.strip().split(":", 1)
+                keys[key_id] = secret.encode()
+        if not keys:
+            keys["default"] = hashlib.sha256(b"media-url:" + get_env_var("JWT_SECRET_KEY").encode()).digest()
+        return keys
+
+    def _signature(self, key: bytes, media_item_id: int, path: str, viewer: str, expires: int) -> str:
+        message = f"{media_item_id}\n{path}\n{viewer}\n{expires}".encode()
+        digest = hmac.new(key, message, hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+    def sign(self, media_item_id: int, path: str, viewer: str) -> dict[str, str]:
+        """Return the query parameters authorizing `viewer` to stream the media item"""
+        expires = math.ceil((time.time() + self.ttl_seconds) / self.expiry_granularity) * self.expiry_granularity
+        return {
+            "path": path,
+            "viewer": viewer,
+            "expires": str(expires),
+            "kid": self.active_key_id,
+            "sig": self._signature(self.keys[self.active_key_id], media_item_id, path, viewer, expires)
+        }
+
+    def signed_stream_url(self, media_item_id: int, path: str, viewer: str) -> str:
+        return f"/media-items/{media_item_id}/stream?{urlencode(self.sign(media_item_id, path, viewer))}"
+
+    def verify(self, media_item_id: int, path: str, viewer: str, expires: int, key_id: str, signature: str) -> bool:
+        """Check the signature and expiry of a signed stream URL"""
+        key = self.keys.get(key_id)
+        if key is None or expires < time.time():
+            return False
+        expected = self._signature(key, media_item_id, path, viewer, expires)
+        return hmac.compare_digest(expected, signature)
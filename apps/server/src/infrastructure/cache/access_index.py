@@ -0,0 +1,77 @@
+from typing import Iterable
+
+class AccessIndex:
+    """
+    In-process index answering "can contact C see post P" without queries.
+
+    Holds contact -> audience ids and post -> audience ids. It is loaded in full
+    once (`load`) and then kept current by the audience and post write paths
+    after they commit. Until it is loaded, `can_access` returns None and callers
+    fall back to the database.
+    """
+
+    def __init__(self):
+        self._contact_audiences: dict[int, set[int]] = {}
+        self._post_audiences: dict[int, set[int]] = {}
+        self.is_warm = False
+
+    def load(self, contact_links: Iterable[tuple[int, int]], post_links: Iterable[tuple[int, int]]) -> None:
+        """Replace the index from (contact_id, audience_id) and (post_id, audience_id) pairs"""
+        contact_audiences: dict[int, set[int]] = {}
+        for contact_id, audience_id in contact_links:
+            contact_audiences.setdefault(contact_id, set()).add(audience_id)
+        post_audiences: dict[int, set[int]] = {}
+        for post_id, audience_id in post_links:
+            post_audiences.setdefault(post_id, set()).add(audience_id)
+        self._contact_audiences = contact_audiences
+        self._post_audiences = post_audiences
+        self.is_warm = True
+
+    def reset(self) -> None:
+        self._contact_audiences = {}
+        self._post_audiences = {}
+        self.is_warm = False
+
+    def can_access(self, contact_id: int, post_id: int) -> bool | None:
+        """Return whether the contact shares an audience with the post, or None when the index is cold"""
+        if not self.is_warm:
+            return None
+        contact_audiences = self._contact_audiences.get(contact_id)
+        post_audiences = self._post_audiences.get(post_id)
+        if not contact_audiences or not post_audiences:
+            return False
+        return not contact_audiences.isdisjoint(post_audiences)
+
+    def set_post_audiences(self, post_id: int, audience_ids: Iterable[int]) -> None:
+        self._post_audiences[post_id] = set(audience_ids)
+
+    def remove_post(self, post_id: int) -> None:
+        self._post_audiences.pop(post_id, None)
+
+    def add_contacts_to_audience(self, audience_id: int, contact_ids: Iterable[int]) -> None:
+        for contact_id in contact_ids:
+            self._contact_audiences.setdefault(contact_id, set()).add(audience_id)
+
+    def remove_contacts_from_audience(self, audience_id: int, contact_ids: Iterable[int]) -> None:
+        for contact_id in contact_ids:
+            self._contact_audiences.get(contact_id, set()).discard(audience_id)
+
+    def remove_audience(self, audience_id: int) -> None:
+        for audience_ids in self._contact_audiences.values():
+            audience_ids.discard(audience_id)
+        for audience_ids in self._post_audiences.values():
+            audience_ids.discard(audience_id)
+
+    def remove_contact(self, contact_id: int) -> None:
+        self._contact_audiences.pop(contact_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "warm": self.is_warm,
+            "contacts": len(self._contact_audiences),
+            "posts": len(self._post_audiences)
+        }
+
+
+# Create singleton instance shared by the write paths and the authorization service
+access_index = AccessIndex()
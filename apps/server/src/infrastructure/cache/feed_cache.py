@@ -0,0 +1,117 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Iterable
+
+from src.utils.env import get_optional_env_var
+
+class _ComputationAbandoned(Exception):
+    """The caller computing a value was cancelled; one of its waiters computes it instead"""
+
+
+class FeedCache:
+    """
+    In-process cache of rendered contact feeds.
+
+    Entries are keyed by (contact_id, feed version, request params). Write paths
+    bump a contact's version through `invalidate_contacts`, which makes every
+    older entry for that contact unreachable; unreachable entries age out via
+    LRU eviction or TTL. Concurrent misses for the same key share a single
+    computation. State is per process, so the TTL bounds staleness if the API
+    is ever run with several workers.
+    """
+
+    def __init__(self, max_entries: int | None = None, ttl_seconds: float | None = None):
+        self.max_entries = max_entries or int(get_optional_env_var("FEED_CACHE_MAX_ENTRIES", "1024"))
+        self.ttl_seconds = ttl_seconds or float(get_optional_env_var("FEED_CACHE_TTL_SECONDS", "60"))
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._versions: dict[int, int] = {}
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def version(self, contact_id: int) -> int:
+        return self._versions.get(contact_id, 0)
+
+    def invalidate_contacts(self, contact_ids: Iterable[int]) -> None:
+        """Bump the feed version of every given contact"""
+        for contact_id in contact_ids:
+            self._versions[contact_id] = self.version(contact_id) + 1
+
+    async def get_or_compute(self, contact_id: int, params: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached value for the contact's current feed version, computing it at
+        most once at a time. Each caller's `compute` uses its own request's resources, so
+        when the computing request is cancelled (e.g. the client went away) a waiting
+        caller takes over with its own `compute` instead of failing with it.
+        """
+        version = self.version(contact_id)
+        key = (contact_id, version, params)
+
+        while True:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(in_flight)
+            except _ComputationAbandoned:
+                continue
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.set_exception(_ComputationAbandoned())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting on it
+            future.exception()
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+
+        future.set_result(value)
+        # Don't store a value computed while the feed changed underneath it
+        if self.version(contact_id) == version:
+            self._store(key, value)
+        return value
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0
+        }
+
+
+# Create singleton instance shared by the write paths and the view service
+feed_cache = FeedCache()
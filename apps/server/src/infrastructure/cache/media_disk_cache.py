@@ -0,0 +1,258 @@
+import hashlib
+import os
+import re
+import tempfile
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterator, Optional, Set
+from src.utils.env import get_optional_env_var
+
+# Names of the files the cache creates in its directory: entries are named by the
+# SHA-256 of their key, fills in progress are temporary files with this prefix
+ENTRY_NAME = re.compile(r"[0-9a-f]{64}")
+FILL_PREFIX = "media-cache-"
+FILL_SUFFIX = ".part"
+
+@dataclass
+class CacheEntry:
+    disk_path: str
+    size: int
+    content_type: str
+    etag: str | None
+    last_modified: datetime | None
+
+
+class CachedFile:
+    """
+    An open handle on a cached object, or on a byte range of it.
+    Reads use pread on its own descriptor, so eviction of the entry (unlink) while a
+    response is being sent is harmless. Mirrors the `stream` / `close` / `release_conn`
+    surface of minio responses so callers can treat both alike.
+    """
+
+    def __init__(self, entry: CacheEntry, offset: int = 0, length: int | None = None):
+        self.file = open(entry.disk_path, "rb")
+        self.content_type = entry.content_type
+        self.etag = entry.etag
+        self.last_modified = entry.last_modified
+        self.size = entry.size
+        self.offset = offset
+        self.length = entry.size - offset if length is None else min(length, entry.size - offset)
+
+    def stream(self, amt: int = 256 * 1024) -> Iterator[bytes]:
+        position, end = self.offset, self.offset + self.length
+        while position < end:
+            chunk = os.pread(self.file.fileno(), min(amt, end - position), position)
+            if not chunk:
+                break
+            position += len(chunk)
+            yield chunk
+
+    def close(self) -> None:
+        self.file.close()
+
+    def release_conn(self) -> None:
+        pass
+
+
+class CacheFill:
+    """
+    Writes an object into the cache as it is streamed from MinIO to a client.
+    `write` is called from the thread reading the object, one chunk at a time;
+    `commit` (read to the end) or `abort` once the read has finished.
+    """
+
+    def __init__(self, cache: "MediaDiskCache", key: str, entry: CacheEntry, descriptor: int, temp_path: str):
+        self.cache = cache
+        self.key = key
+        self.entry = entry
+        self.temp_path = temp_path
+        self._file = os.fdopen(descriptor, "wb")
+        self._failed = False
+
+    def write(self, chunk: bytes) -> None:
+        if self._failed:
+            return
+        try:
+            self._file.write(chunk)
+        except OSError:
+            # A full disk costs the cache entry, never the response
+            self._failed = True
+
+    def commit(self) -> None:
+        self._file.close()
+        self.cache._finish_fill(self, completed=True, failed=self._failed)
+
+    def abort(self) -> None:
+        self._file.close()
+        self.cache._finish_fill(self, completed=False, failed=self._failed)
+
+
+class MediaDiskCache:
+    """
+    Bounded on-disk LRU cache of media objects in front of MinIO.
+
+    A miss is not waited for: the object is streamed from MinIO and written to a
+    temporary file in the cache directory on the way (`begin_fill`), which is renamed
+    into place once the client has read it all, so a reader never sees a partial file.
+    Other misses for the same key meanwhile stream from MinIO without filling. The
+    index lives in memory; `start()` removes the cache's own files (and nothing else)
+    from the directory when the server starts, and until then nothing is cached, so
+    other processes importing this module (the CLI tools) never touch a running
+    server's directory. MEDIA_CACHE_MAX_BYTES=0 disables the cache.
+    """
+
+    def __init__(self, directory: str | None = None, max_bytes: int | None = None):
+        self.directory = directory or get_optional_env_var(
+            "MEDIA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "life-abroad-media-cache")
+        )
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            get_optional_env_var("MEDIA_CACHE_MAX_BYTES", str(1024 * 1024 * 1024))
+        )
+        # Larger objects would flush most of the cache, they are streamed from MinIO instead
+        self.max_object_bytes = self.max_bytes // 8
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._in_flight: Set[str] = set()
+        # Keys deleted while their fill was running; the fill result is dropped
+        self._stale: Set[str] = set()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+        self.fill_failures = 0
+        self.fills_abandoned = 0
+        self._started = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def start(self) -> None:
+        """Remove the files a previous run left in the directory and start caching; later calls do nothing"""
+        if self._started or not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # The directory is configured by the operator and may hold other files
+        for entry in os.scandir(self.directory):
+            if entry.is_file(follow_symlinks=False) and (
+                    ENTRY_NAME.fullmatch(entry.name)
+                    or (entry.name.startswith(FILL_PREFIX) and entry.name.endswith(FILL_SUFFIX))):
+                self._unlink(entry.path)
+        self._started = True
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest())
+
+    def peek(self, key: str) -> Optional[CacheEntry]:
+        """Get an entry's metadata without counting a hit"""
+        return self._entries.get(key)
+
+    def open(self, key: str, offset: int = 0, length: int | None = None) -> Optional[CachedFile]:
+        """Open a cached object (or a range of it) and mark it recently used; None on a miss"""
+        cached = self._open(key, offset, length)
+        if cached is not None:
+            self.hits += 1
+            self.bytes_saved += cached.length
+        return cached
+
+    def _open(self, key: str, offset: int = 0, length: int | None = None) -> Optional[CachedFile]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        try:
+            cached = CachedFile(entry, offset, length)
+        except FileNotFoundError:
+            self.discard(key)
+            return None
+        self._entries.move_to_end(key)
+        return cached
+
+    def begin_fill(self, key: str, size: int, content_type: str, etag: str | None,
+                   last_modified: datetime | None) -> Optional[CacheFill]:
+        """
+        Start caching an object that is about to be streamed from MinIO. Returns None
+        when it is not cacheable, already cached, or being filled by another request.
+        """
+        if not self._started or size > self.max_object_bytes or key in self._entries:
+            return None
+        self.misses += 1
+        if key in self._in_flight:
+            return None
+        try:
+            descriptor, temp_path = tempfile.mkstemp(dir=self.directory, prefix=FILL_PREFIX, suffix=FILL_SUFFIX)
+        except OSError:
+            self.fill_failures += 1
+            return None
+        self._in_flight.add(key)
+        entry = CacheEntry(self._disk_path(key), size, content_type, etag, last_modified)
+        return CacheFill(self, key, entry, descriptor, temp_path)
+
+    def _finish_fill(self, fill: CacheFill, completed: bool, failed: bool) -> None:
+        self._in_flight.discard(fill.key)
+        stale = fill.key in self._stale
+        self._stale.discard(fill.key)
+        if completed and not failed and not stale:
+            try:
+                fill.entry.size = os.path.getsize(fill.temp_path)
+                os.replace(fill.temp_path, fill.entry.disk_path)
+            except OSError:
+                failed = True
+            else:
+                self._insert(fill.key, fill.entry)
+                return
+        if failed:
+            self.fill_failures += 1
+        elif not completed:
+            self.fills_abandoned += 1
+        self._unlink(fill.temp_path)
+
+    def _insert(self, key: str, entry: CacheEntry) -> None:
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.total_bytes -= previous.size
+        self._entries[key] = entry
+        self.total_bytes += entry.size
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            oldest_key, oldest = self._entries.popitem(last=False)
+            self.total_bytes -= oldest.size
+            self.evictions += 1
+            self._unlink(oldest.disk_path)
+
+    def _unlink(self, disk_path: str) -> None:
+        try:
+            os.unlink(disk_path)
+        except FileNotFoundError:
+            pass
+
+    def discard(self, key: str) -> None:
+        if key in self._in_flight:
+            self._stale.add(key)
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry.size
+            self._unlink(entry.disk_path)
+
+    def discard_prefix(self, prefix: str) -> None:
+        for key in [key for key in [*self._entries, *self._in_flight] if key.startswith(prefix)]:
+            self.discard(key)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "fill_failures": self.fill_failures,
+            "fills_abandoned": self.fills_abandoned,
+            "bytes_saved": self.bytes_saved,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
+
+
+# Create singleton instance shared by every MediaStorageService
+media_disk_cache = MediaDiskCache()
@@ -1,9 +1,16 @@
 # apps/server/src/infrastructure/database.py
-from typing import AsyncGenerator
+import logging
+from typing import Any, AsyncGenerator
 from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, async_sessionmaker
+from sqlmodel import SQLModel
 from src.utils.env import get_env_var
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = get_env_var("DATABASE_URL")
 
 engine: AsyncEngine = create_async_engine(DATABASE_URL, echo=True, future=True)
@@ -11,4 +18,50 @@ async_session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncS
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_session() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+def add_missing_columns(connection: Connection) -> None:
+    """
+    Add nullable columns declared on existing tables, which `create_all` skips.
+    Lets new optional model fields roll out without recreating the database.
+    """
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    for table in SQLModel.metadata.tables.values():
+        if table.name not in existing_tables:
+            continue
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+
+def add_missing_indexes(connection: Connection) -> None:
+    """
+    Create indexes declared on existing tables, which `create_all` skips. A unique
+    index the existing rows violate is logged and left out rather than failing startup.
+    """
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    for table in SQLModel.metadata.tables.values():
+        if table.name not in existing_tables:
+            continue
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                continue
+            try:
+                with connection.begin_nested():
+                    index.create(connection)
+            except IntegrityError as e:
+                logger.error(f"Could not create index {index.name} on {table.name}: {e}")
+
+def byte_ordered(column: Any, session: AsyncSession) -> Any:
+    """
+    `column` compared and sorted byte by byte, the order object storage lists keys in.
+    Postgres otherwise uses the locale's collation; SQLite already compares bytes.
+    """
+    if session.bind is not None and session.bind.dialect.name == "postgresql":
+        return column.collate("C")
+    return column
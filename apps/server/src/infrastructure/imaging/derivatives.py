@@ -0,0 +1,183 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Any, Awaitable, Callable, Dict, List
+from PIL import Image, ImageOps, features
+from src.infrastructure.imaging.placeholder import ImagePlaceholder, compute_placeholder, render_placeholder
+from src.utils.env import get_optional_env_var
+
+# Longest edge in pixels of each rendition; originals smaller than that are re-encoded as is
+DERIVATIVE_SIZES: Dict[str, int] = {
+    "thumb": 320,
+    "medium": 1024,
+    "large": 2048
+}
+
+@dataclass(frozen=True)
+class ImageFormat:
+    name: str
+    extension: str
+    content_type: str
+    save_options: dict
+
+# Formats every rendition is encoded in, smallest (preferred) first. JPEG is the
+# universal fallback and its path is the rendition's canonical path.
+DERIVATIVE_FORMATS: List[ImageFormat] = [
+    image_format for image_format in [
+        ImageFormat("avif", "avif", "image/avif", {"quality": 55, "speed": 6}),
+        ImageFormat("webp", "webp", "image/webp", {"quality": 78, "method": 4}),
+        ImageFormat("jpeg", "jpg", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+    ]
+    if image_format.name == "jpeg" or features.check(image_format.name)
+]
+FALLBACK_FORMAT = DERIVATIVE_FORMATS[-1]
+# Extensions of every format a rendition may have been stored in, supported here or not
+RENDITION_EXTENSIONS = {"avif", "webp", "jpg"}
+# Largest original that is decoded into renditions; bigger ones are served as they are,
+# since rendering loads the whole original into memory
+DERIVATIVE_SOURCE_MAX_BYTES = int(get_optional_env_var("DERIVATIVE_SOURCE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+def rendition_prefix(original_path: str) -> str:
+    """Prefix shared by the paths of every rendition of an original: {dir}/{uuid}."""
+    directory, _, file_name = original_path.rpartition("/")
+    stem = file_name.rsplit(".", 1)[0] if "." in file_name else file_name
+    return f"{directory}/{stem}." if directory else f"{stem}."
+
+
+def derivative_path(original_path: str, size: str, image_format: ImageFormat = FALLBACK_FORMAT) -> str:
+    """Storage path of a rendition, next to its original: {dir}/{uuid}.{size}.{ext}"""
+    return f"{rendition_prefix(original_path)}{size}.{image_format.extension}"
+
+
+def rendition_owner_prefix(path: str) -> str | None:
+    """`rendition_prefix` of the original a path named like a rendition belongs to, or None"""
+    stem, _, extension = path.rpartition(".")
+    owner, _, size = stem.rpartition(".")
+    if not owner or size not in DERIVATIVE_SIZES or extension not in RENDITION_EXTENSIONS:
+        return None
+    return f"{owner}."
+
+
+def is_renderable(content_type: str | None, size_bytes: int | None) -> bool:
+    """Whether an original of this type and size may be rendered; unknown values are not held against it"""
+    if content_type is not None and not content_type.startswith("image/"):
+        return False
+    return size_bytes is None or size_bytes <= DERIVATIVE_SOURCE_MAX_BYTES
+
+
+def derivative_key(size: str, image_format: ImageFormat = FALLBACK_FORMAT) -> str:
+    """Key of a rendition in MediaItem.derivatives: the size for JPEG, "{size}.{format}" otherwise"""
+    return size if image_format is FALLBACK_FORMAT else f"{size}.{image_format.name}"
+
+
+def variant_path(rendition_path: str, image_format: ImageFormat) -> str | None:
+    """Path of another encoding of a canonical (JPEG) rendition path, or None if it is not one"""
+    stem, _, extension = rendition_path.rpartition(".")
+    if extension != FALLBACK_FORMAT.extension or stem.rpartition(".")[2] not in DERIVATIVE_SIZES:
+        return None
+    return f"{stem}.{image_format.extension}"
+
+
+@dataclass
+class RenderedImage:
+    # {size: {format name: bytes}}
+    renditions: Dict[str, Dict[str, bytes]]
+    placeholder: ImagePlaceholder
+
+
+def render_derivatives(data: bytes, sizes: List[str], formats: List[str]) -> RenderedImage:
+    """
+    Decode an image once and encode each requested size in each format, then compute
+    its placeholder from the smallest. Runs in a worker process; sizes are rendered
+    largest first so each one is downscaled from the previous instead of from the original.
+    """
+    encoders = [image_format for image_format in DERIVATIVE_FORMATS if image_format.name in formats]
+    ordered = sorted(sizes, key=lambda size: DERIVATIVE_SIZES[size], reverse=True)
+    with Image.open(BytesIO(data)) as source:
+        # Let the JPEG decoder skip detail we would throw away anyway
+        largest = DERIVATIVE_SIZES[ordered[0]]
+        source.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(source)
+        if image.mode in ("RGBA", "LA", "P"):
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.getchannel("A"))
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        rendered: Dict[str, Dict[str, bytes]] = {}
+        for size in ordered:
+            edge = DERIVATIVE_SIZES[size]
+            image.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+            rendered[size] = {}
+            for image_format in encoders:
+                output = BytesIO()
+                image.save(output, image_format.name.upper(), **image_format.save_options)
+                rendered[size][image_format.name] = output.getvalue()
+        return RenderedImage(rendered, compute_placeholder(image))
+
+
+class ImageProcessor:
+    """
+    Process pool for CPU-bound image work, so resizing never holds the GIL of the
+    server process. At most `max_workers` jobs run or hold their source image in
+    memory at once; further callers wait. The pool is created on first use.
+    """
+
+    def __init__(self, max_workers: int | None = None):
+        self.max_workers = max_workers or int(get_optional_env_var("IMAGE_MAX_WORKERS", "2"))
+        self._executor: ProcessPoolExecutor | None = None
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    async def render(self, load: Callable[[], Awaitable[bytes]], sizes: List[str], formats: List[str]) -> RenderedImage:
+        """Load the source image and render the given sizes and formats in the pool"""
+        return await self._run(load, render_derivatives, sizes, formats)
+
+    async def placeholder(self, load: Callable[[], Awaitable[bytes]]) -> ImagePlaceholder:
+        """Load an image and compute its placeholder in the pool"""
+        return await self._run(load, render_placeholder)
+
+    async def _run(self, load: Callable[[], Awaitable[bytes]], function: Callable[..., Any], *args: Any) -> Any:
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        try:
+            data = await load()
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._get_executor(), function, data, *args)
+            self.completed += 1
+            return result
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            self.active -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "active": self.active,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "failed": self.failed
+        }
+
+
+# Create singleton instance shared by every derivative job
+image_processor = ImageProcessor()
@@ -0,0 +1,177 @@
+import hashlib
+import struct
+from PIL import ImageFile
+
+# Containers whose duration and dimensions are read from the ISO base media `moov` box
+MP4_CONTENT_TYPES = {"video/mp4", "video/quicktime", "video/x-m4v", "video/3gpp"}
+# A `moov` box larger than this is not buffered (metadata stays unknown)
+MAX_MOOV_BYTES = 8 * 1024 * 1024
+# Image formats Pillow cannot identify within this many bytes are not probed further
+MAX_IMAGE_HEADER_BYTES = 512 * 1024
+# EXIF orientations that rotate the image by 90 or 270 degrees
+ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+class Mp4Probe:
+    """
+    Incremental ISO-BMFF (MP4/MOV) box walker. Media data is skipped without
+    buffering; only the `moov` box is collected and parsed for duration and
+    the display size of the video track.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._skip = 0
+        self._moov_size: int | None = None
+        self.done = False
+        self.width: int | None = None
+        self.height: int | None = None
+        self.duration_seconds: float | None = None
+
+    def feed(self, chunk: bytes) -> None:
+        data = memoryview(chunk)
+        while data and not self.done:
+            if self._skip:
+                skipped = min(self._skip, len(data))
+                self._skip -= skipped
+                data = data[skipped:]
+                continue
+            if self._moov_size is not None:
+                needed = self._moov_size - len(self._buffer)
+                self._buffer += data[:needed]
+                data = data[needed:]
+                if len(self._buffer) == self._moov_size:
+                    self._parse_moov(bytes(self._buffer))
+                    self.done = True
+                continue
+
+            # Collect the next box header, which may span chunks
+            self._buffer += data
+            data = memoryview(b"")
+            if len(self._buffer) < 8:
+                return
+            size, box_type = struct.unpack(">I4s", self._buffer[:8])
+            header_size = 8
+            if size == 1:
+                if len(self._buffer) < 16:
+                    return
+                size = struct.unpack(">Q", self._buffer[8:16])[0]
+                header_size = 16
+            if size < header_size:
+                # Box extends to the end of the file (0) or is corrupt
+                self.done = True
+                return
+            data = memoryview(bytes(self._buffer[header_size:]))
+            self._buffer = bytearray()
+            if box_type == b"moov":
+                if size > MAX_MOOV_BYTES:
+                    self.done = True
+                    return
+                self._moov_size = size - header_size
+            else:
+                self._skip = size - header_size
+
+    def _children(self, data: bytes):
+        offset = 0
+        while offset + 8 <= len(data):
+            size, box_type = struct.unpack(">I4s", data[offset:offset + 8])
+            header_size = 8
+            if size == 1 and offset + 16 <= len(data):
+                size = struct.unpack(">Q", data[offset + 8:offset + 16])[0]
+                header_size = 16
+            elif size == 0:
+                size = len(data) - offset
+            if size < header_size:
+                return
+            yield box_type, data[offset + header_size:offset + size]
+            offset += size
+
+    def _parse_moov(self, moov: bytes) -> None:
+        for box_type, body in self._children(moov):
+            if box_type == b"mvhd" and body:
+                if body[0] == 1:
+                    timescale, duration = struct.unpack(">IQ", body[20:32])
+                else:
+                    timescale, duration = struct.unpack(">II", body[12:20])
+                if timescale:
+                    self.duration_seconds = duration / timescale
+            elif box_type == b"trak" and self.width is None:
+                for child_type, child in self._children(body):
+                    if child_type == b"tkhd":
+                        self._parse_tkhd(child)
+
+    def _parse_tkhd(self, body: bytes) -> None:
+        # version/flags, times, track id and duration, then reserved/layer/group/volume
+        offset = 4 + (32 if body[:1] == b"\x01" else 20) + 16
+        if len(body) < offset + 44:
+            return
+        a, b, _, c, d = struct.unpack(">iiiii", body[offset:offset + 20])
+        width, height = struct.unpack(">II", body[offset + 36:offset + 44])
+        width, height = width >> 16, height >> 16
+        if not width or not height:
+            return
+        # A 90/270 degree rotation matrix has zero scale terms
+        if a == 0 and d == 0 and b != 0 and c != 0:
+            width, height = height, width
+        self.width, self.height = width, height
+
+
+class MediaProbe:
+    """
+    Collects metadata from an upload as its chunks pass by: size, SHA-256, and the
+    display dimensions (and duration for videos) from the image header or MP4 boxes.
+    Probing never fails the upload; unknown values stay None.
+    """
+
+    def __init__(self, content_type: str | None):
+        self._hash = hashlib.sha256()
+        self.size_bytes = 0
+        self.width: int | None = None
+        self.height: int | None = None
+        self.duration_seconds: float | None = None
+        content_type = (content_type or "").lower()
+        self._image_parser: ImageFile.Parser | None = ImageFile.Parser() if content_type.startswith("image/") else None
+        self._mp4: Mp4Probe | None = Mp4Probe() if content_type in MP4_CONTENT_TYPES else None
+
+    @property
+    def checksum(self) -> str:
+        return self._hash.hexdigest()
+
+    def feed(self, chunk: bytes) -> None:
+        self._hash.update(chunk)
+        self.size_bytes += len(chunk)
+        if self._image_parser is not None:
+            self._feed_image(chunk)
+        if self._mp4 is not None:
+            try:
+                self._mp4.feed(chunk)
+            except (struct.error, IndexError):
+                self._mp4 = None
+                return
+            if self._mp4.done:
+                self.width, self.height = self._mp4.width, self._mp4.height
+                self.duration_seconds = self._mp4.duration_seconds
+                self._mp4 = None
+
+    def _feed_image(self, chunk: bytes) -> None:
+        parser = self._image_parser
+        try:
+            parser.feed(chunk)
+            image = parser.image
+        except Exception:
+            self._image_parser = None
+            return
+        if image is None:
+            # The parser re-reads everything buffered so far on each chunk until it recognizes the format
+            if self.size_bytes >= MAX_IMAGE_HEADER_BYTES:
+                self._image_parser = None
+            return
+        # Only the header is needed; stop before the parser decodes pixel data
+        self._image_parser = None
+        width, height = image.size
+        try:
+            if image.getexif().get(0x0112) in ROTATED_ORIENTATIONS:
+                width, height = height, width
+        except Exception:
+            pass
+        self.width, self.height = width, height
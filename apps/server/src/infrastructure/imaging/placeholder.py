@@ -0,0 +1,107 @@
+from dataclasses import dataclass
+from io import BytesIO
+import numpy as np
+from PIL import Image, ImageOps
+
+# Images are reduced to this longest edge before anything is computed from them
+PLACEHOLDER_SAMPLE_EDGE = 32
+# BlurHash components along the longer and the shorter side
+PLACEHOLDER_COMPONENTS = (4, 3)
+# Bits kept per channel when pixels are grouped to find the dominant colour
+DOMINANT_COLOR_BITS = 4
+
+BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+
+@dataclass(frozen=True)
+class ImagePlaceholder:
+    """What a client paints before a photo loads"""
+    blurhash: str
+    # "#rrggbb"
+    dominant_color: str
+
+
+def compute_placeholder(image: Image.Image) -> ImagePlaceholder:
+    """BlurHash and dominant colour of an RGB image, from a copy reduced to a few pixels"""
+    sample = image.copy()
+    sample.thumbnail((PLACEHOLDER_SAMPLE_EDGE, PLACEHOLDER_SAMPLE_EDGE), Image.Resampling.BOX)
+    pixels = np.asarray(sample.convert("RGB"), dtype=np.float64)
+    return ImagePlaceholder(blurhash=encode_blurhash(pixels), dominant_color=dominant_color(pixels))
+
+
+def render_placeholder(data: bytes) -> ImagePlaceholder:
+    """Decode an image (as small as the decoder allows) and compute its placeholder; runs in a worker process"""
+    with Image.open(BytesIO(data)) as source:
+        source.draft("RGB", (PLACEHOLDER_SAMPLE_EDGE, PLACEHOLDER_SAMPLE_EDGE))
+        image = ImageOps.exif_transpose(source)
+        if image.mode in ("RGBA", "LA", "P"):
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.getchannel("A"))
+        return compute_placeholder(image)
+
+
+def encode_blurhash(pixels: np.ndarray) -> str:
+    """
+    BlurHash of an (height, width, 3) array of sRGB values in 0-255. The components
+    are a 2D cosine transform of the linear-light image, computed for all components
+    and channels at once.
+    """
+    height, width = pixels.shape[:2]
+    longer, shorter = PLACEHOLDER_COMPONENTS
+    components_x, components_y = (longer, shorter) if width >= height else (shorter, longer)
+
+    linear = _srgb_to_linear(pixels)
+    basis_x = np.cos(np.pi * np.outer(np.arange(components_x), np.arange(width)) / width)
+    basis_y = np.cos(np.pi * np.outer(np.arange(components_y), np.arange(height)) / height)
+    factors = np.einsum("jy,ix,yxc->jic", basis_y, basis_x, linear) / (width * height)
+    factors[1:] *= 2
+    factors[0, 1:] *= 2
+    factors = factors.reshape(-1, 3)
+    dc, ac = factors[0], factors[1:]
+
+    result = _base83((components_x - 1) + (components_y - 1) * 9, 1)
+    if len(ac):
+        quantised_max = int(max(0, min(82, np.floor(np.abs(ac).max() * 166 - 0.5))))
+        max_value = (quantised_max + 1) / 166
+    else:
+        quantised_max, max_value = 0, 1
+    result += _base83(quantised_max, 1)
+
+    r, g, b = _linear_to_srgb(dc)
+    result += _base83((int(r) << 16) + (int(g) << 8) + int(b), 4)
+
+    scaled = ac / max_value
+    quantised = np.clip(np.floor(np.sign(scaled) * np.sqrt(np.abs(scaled)) * 9 + 9.5), 0, 18).astype(int)
+    for qr, qg, qb in quantised:
+        result += _base83(int(qr) * 19 * 19 + int(qg) * 19 + int(qb), 2)
+    return result
+
+
+def dominant_color(pixels: np.ndarray) -> str:
+    """
+    Mean colour of the most common group of similar pixels, pixels being grouped by the
+    top DOMINANT_COLOR_BITS bits of each channel
+    """
+    flat = pixels.reshape(-1, 3)
+    levels = flat.astype(np.uint8) >> (8 - DOMINANT_COLOR_BITS)
+    groups = (levels[:, 0].astype(np.int64) << (2 * DOMINANT_COLOR_BITS)) | \
+             (levels[:, 1].astype(np.int64) << DOMINANT_COLOR_BITS) | levels[:, 2]
+    counts = np.bincount(groups)
+    red, green, blue = np.rint(flat[groups == counts.argmax()].mean(axis=0)).astype(int)
+    return f"#{red:02x}{green:02x}{blue:02x}"
+
+
+def _srgb_to_linear(values: np.ndarray) -> np.ndarray:
+    scaled = values / 255
+    return np.where(scaled <= 0.04045, scaled / 12.92, ((scaled + 0.055) / 1.055) ** 2.4)
+
+
+def _linear_to_srgb(values: np.ndarray) -> np.ndarray:
+    clipped = np.clip(values, 0, 1)
+    srgb = np.where(clipped <= 0.0031308, clipped * 12.92, 1.055 * clipped ** (1 / 2.4) - 0.055)
+    return np.floor(srgb * 255 + 0.5)
+
+
+def _base83(value: int, length: int) -> str:
+    return "".join(BASE83[(value // 83 ** (length - 1 - i)) % 83] for i in range(length))
@@ -0,0 +1,33 @@
+import asyncio
+import time
+
+class RateLimiter:
+    """
+    Spaces calls out to at most `rate` per second, allowing `burst` back to back after
+    a quiet period. Each caller is given the next free slot before it waits, so callers
+    are served in order and no lock is needed on the event loop.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self.burst = max(burst, 1)
+        self._next_slot = 0.0
+        self.acquired = 0
+        self.delayed = 0
+
+    async def acquire(self) -> None:
+        now = time.monotonic()
+        slot = max(self._next_slot, now)
+        self._next_slot = slot + self.interval
+        self.acquired += 1
+        delay = slot - (self.burst - 1) * self.interval - now
+        if delay > 0:
+            self.delayed += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            "per_second": 1 / self.interval if self.interval else None,
+            "acquired": self.acquired,
+            "delayed": self.delayed
+        }
@@ -0,0 +1,81 @@
+import asyncio
+import httpx
+from typing import Any
+from src.infrastructure.notifications.rate_limiter import RateLimiter
+from src.utils.env import get_optional_env_var
+
+# SMS API requests in flight at once
+SMS_PARALLELISM = int(get_optional_env_var("SMS_PARALLELISM", "8"))
+# Vonage accepts 30 SMS API requests per second per API key unless raised for the account
+SMS_MAX_PER_SECOND = float(get_optional_env_var("SMS_MAX_PER_SECOND", "30"))
+SMS_TIMEOUT_SECONDS = float(get_optional_env_var("SMS_TIMEOUT_SECONDS", "10"))
+# Idle connections to the provider are kept open this long for the next message
+SMS_KEEPALIVE_SECONDS = 30
+
+class SmsClient:
+    """
+    Pooled async HTTP client for an SMS provider API. Connections are kept alive
+    between messages, every request has a timeout, at most `parallelism` requests are
+    in flight and they start no faster than the provider's throughput limit. The
+    client is created on first use and closed on shutdown.
+    """
+
+    def __init__(self,
+                 parallelism: int = SMS_PARALLELISM,
+                 max_per_second: float = SMS_MAX_PER_SECOND,
+                 timeout_seconds: float = SMS_TIMEOUT_SECONDS,
+                 transport: httpx.AsyncBaseTransport | None = None):
+        self.parallelism = max(parallelism, 1)
+        self.timeout_seconds = timeout_seconds
+        self.rate_limiter = RateLimiter(max_per_second)
+        self._transport = transport
+        self._client: httpx.AsyncClient | None = None
+        self._slots = asyncio.Semaphore(self.parallelism)
+        self.active = 0
+        self.requests = 0
+        self.errors = 0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout_seconds, connect=min(self.timeout_seconds, 5.0)),
+                limits=httpx.Limits(
+                    max_connections=self.parallelism,
+                    max_keepalive_connections=self.parallelism,
+                    keepalive_expiry=SMS_KEEPALIVE_SECONDS
+                ),
+                transport=self._transport
+            )
+        return self._client
+
+    async def post_form(self, url: str, data: dict[str, Any]) -> httpx.Response:
+        """POST a form within the concurrency and rate limits"""
+        async with self._slots:
+            await self.rate_limiter.acquire()
+            self.active += 1
+            self.requests += 1
+            try:
+                return await self._get_client().post(url, data=data)
+            except httpx.HTTPError:
+                self.errors += 1
+                raise
+            finally:
+                self.active -= 1
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {
+            "parallelism": self.parallelism,
+            "active": self.active,
+            "requests": self.requests,
+            "errors": self.errors,
+            "rate_limit": self.rate_limiter.stats()
+        }
+
+
+# Create singleton instance shared by every SmsProvider, so the limits hold process-wide
+sms_client = SmsClient()
@@ -1,35 +1,92 @@
-import requests
+import asyncio
+import logging
+import httpx
+from src.infrastructure.notifications.sms_client import SmsClient, sms_client
 from src.utils.env import get_env_var
 
+logger = logging.getLogger(__name__)
+
+VONAGE_SMS_URL = "https://rest.nexmo.com/sms/json"
+# Vonage message statuses: sent, refused for exceeding the throughput limit, and the
+# other failures worth trying again later (internal error, too many connections).
+# Any other status is a permanent failure such as an invalid number, bad credentials
+# or an exhausted balance.
+SENT_STATUS = "0"
+THROTTLED_STATUS = "1"
+TRANSIENT_STATUSES = {THROTTLED_STATUS, "5", "10"}
+# Attempts for a message refused as throttled or whose connection could not be made;
+# a request that may have reached the provider is never repeated
+SMS_SEND_ATTEMPTS = 3
+SMS_RETRY_DELAY_SECONDS = 0.5
+
+class SmsDeliveryError(Exception):
+    """A message was not sent. `retryable` is False when sending it again cannot succeed."""
+
+    def __init__(self, message: str, retryable: bool):
+        self.retryable = retryable
+        super().__init__(message)
+
+def sms_cost(result: dict) -> tuple[int, float]:
+    """
+    Messages billed for a send and their total price, from a Vonage response. A long
+    text is split into several messages, each priced separately.
+    """
+    messages = result.get('messages', [])
+    return len(messages), sum(float(message.get('message-price', 0)) for message in messages)
+
 class SmsProvider:
-    def __init__(self):
+    def __init__(self, client: SmsClient | None = None):
         self.api_key = get_env_var("VONAGE_API_KEY")
         self.api_secret = get_env_var("VONAGE_API_SECRET")
         self.from_number = get_env_var("SMS_FROM_NUMBER")
-        
+        self.client = client or sms_client
+
     async def send_post_notification(self, phone_number: str, user_to: str, user_from: str, post_url: str) -> dict:
         """Send SMS notification about new post"""
         message = f"Hello {user_to}! You have a new shared memory from {user_from} to view: {post_url}"
+        data = {
+            'api_key': self.api_key,
+            'api_secret': self.api_secret,
+            'to': phone_number,
+            'from': self.from_number,
+            'text': message
+        }
+
+        for attempt in range(1, SMS_SEND_ATTEMPTS + 1):
+            try:
+                response = await self.client.post_form(VONAGE_SMS_URL, data)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                if attempt == SMS_SEND_ATTEMPTS:
+                    raise SmsDeliveryError(f"Failed to send SMS: {e}", retryable=True) from e
+                await asyncio.sleep(SMS_RETRY_DELAY_SECONDS * 2 ** (attempt - 1))
+                continue
+
+            try:
+                result = response.json()
+            except ValueError:
+                result = {'body': response.text}
+            status = _failed_status(result) if response.status_code == 200 else None
+            if response.status_code == 429 or status == THROTTLED_STATUS:
+                if attempt == SMS_SEND_ATTEMPTS:
+                    raise SmsDeliveryError(f"Failed to send SMS: throttled - {result}", retryable=True)
+                logger.info(f"SMS to {phone_number} throttled, retrying")
+                await asyncio.sleep(SMS_RETRY_DELAY_SECONDS * 2 ** (attempt - 1))
+                continue
+            if response.status_code != 200:
+                raise SmsDeliveryError(f"Failed to send SMS: {response.status_code} - {result}",
+                                       retryable=response.status_code >= 500)
+            if status is not None:
+                raise SmsDeliveryError(f"Failed to send SMS: status {status} - {result}",
+                                       retryable=status in TRANSIENT_STATUSES)
+            logger.info(f"SMS sent to {phone_number} (from {user_from} to {user_to})")
+            return result
+        raise SmsDeliveryError("Failed to send SMS", retryable=True)
 
-        print(f"Sending SMS to {phone_number} (from {user_from} to {user_to})")
-
-        response = requests.post(
-            'https://rest.nexmo.com/sms/json',
-            data={
-                'api_key': self.api_key,
-                'api_secret': self.api_secret,
-                'to': phone_number,
-                'from': self.from_number,
-                'text': message
-            }
-        )
-        
-        result = response.json()
-        print(f"SMS response: {result}")
-        
-        if response.status_code == 200:
-            print(f"SMS sent: {result.get('messages', [{}])[0].get('status', 'unknown')}")
-        else:
-            raise Exception(f"Failed to send SMS: {response.status_code} - {result}")
-            
-        return result
\ No newline at end of file
+def _failed_status(result: dict) -> str | None:
+    """Status of the first message of a response that was not sent, None if all were"""
+    messages = result.get('messages') or [{}]
+    for message in messages:
+        status = str(message.get('status', 'unknown'))
+        if status != SENT_STATUS:
+            return status
+    return None
@@ -1,11 +1,19 @@
 from typing import Sequence, List
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
+from sqlalchemy import exists
 from src.domain.models.audience import Audience
 from src.domain.models.contact import Contact
 from src.domain.models.links.audience_contact_link import AudienceContactLink
+from src.infrastructure.repositories.contact_feed_repository import ContactFeedRepository
+from src.infrastructure.cache.feed_cache import feed_cache
+from src.infrastructure.cache.access_index import access_index
+from src.domain.models.links.post_audience_link import PostAudienceLink
 
 class AudienceRepository:
+    def __init__(self):
+        self.contact_feed_repository = ContactFeedRepository()
+
     async def create_audience(self, audience: Audience, session: AsyncSession) -> Audience:
         session.add(audience)
         await session.commit()
@@ -49,21 +57,30 @@ class AudienceRepository:
             if not exists.first():
                 link = AudienceContactLink(audience_id=audience_id, contact_id=contact_id)
                 session.add(link)
+        affected_contact_ids = await self.contact_feed_repository.refresh_audience(audience_id, session)
         await session.commit()
+        feed_cache.invalidate_contacts(affected_contact_ids)
+        access_index.add_contacts_to_audience(audience_id, contact_ids)
 
     async def replace_contacts_in_audience(self, audience_id: int, contact_ids: List[int], session: AsyncSession) -> None:
         # Remove existing links
         existing = await session.exec(
             select(AudienceContactLink).where(AudienceContactLink.audience_id == audience_id)
         )
+        previous_contact_ids = []
         for link in existing:
+            previous_contact_ids.append(link.contact_id)
             await session.delete(link)
         
         # Add new links
         for contact_id in contact_ids:
             link = AudienceContactLink(audience_id=audience_id, contact_id=contact_id)
             session.add(link)
+        affected_contact_ids = await self.contact_feed_repository.refresh_audience(audience_id, session)
         await session.commit()
+        feed_cache.invalidate_contacts(affected_contact_ids)
+        access_index.remove_contacts_from_audience(audience_id, previous_contact_ids)
+        access_index.add_contacts_to_audience(audience_id, contact_ids)
 
     async def delete_audience(self, audience_id: int, session: AsyncSession) -> bool:
         audience = await session.get(Audience, audience_id)
@@ -80,8 +97,26 @@ class AudienceRepository:
         
         # Flush to ensure links are deleted before deleting audience
         await session.flush()
+        affected_contact_ids = await self.contact_feed_repository.refresh_audience(audience_id, session)
         
         # Delete the audience
         await session.delete(audience)
         await session.commit()
+        feed_cache.invalidate_contacts(affected_contact_ids)
+        access_index.remove_audience(audience_id)
         return True
+
+    async def get_all_contact_links(self, session: AsyncSession) -> Sequence[AudienceContactLink]:
+        result = await session.exec(select(AudienceContactLink))
+        return result.all()
+
+    async def contact_shares_audience_with_post(self, contact_id: int, post_id: int, session: AsyncSession) -> bool:
+        """Check in a single EXISTS query whether a contact belongs to any audience the post is shared with"""
+        result = await session.exec(
+            select(exists().where(
+                AudienceContactLink.contact_id == contact_id,
+                PostAudienceLink.post_id == post_id,
+                AudienceContactLink.audience_id == PostAudienceLink.audience_id
+            ))
+        )
+        return bool(result.one())
@@ -0,0 +1,92 @@
+from typing import List, Set
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel import select, col, func
+from sqlalchemy import delete, insert, exists
+from src.domain.models.post import Post
+from src.domain.models.contact_feed_entry import ContactFeedEntry
+from src.domain.models.links.audience_contact_link import AudienceContactLink
+from src.domain.models.links.post_audience_link import PostAudienceLink
+from src.infrastructure.cache.feed_cache import feed_cache
+
+class ContactFeedRepository:
+    """
+    Maintains the ContactFeedEntry read model from the audience link tables.
+    Refresh methods only flush so they join the caller's transaction; the caller commits
+    and then passes the returned contact ids to `feed_cache.invalidate_contacts`.
+    """
+
+    def _visible_entries(self):
+        """Select the distinct (contact_id, post_id, created_at) rows implied by the link tables"""
+        return (
+            select(AudienceContactLink.contact_id, PostAudienceLink.post_id, Post.created_at)
+            .join(PostAudienceLink, PostAudienceLink.audience_id == AudienceContactLink.audience_id)
+            .join(Post, Post.id == PostAudienceLink.post_id)
+            .distinct()
+        )
+
+    async def _insert_from(self, entries, session: AsyncSession) -> int:
+        result = await session.execute(
+            insert(ContactFeedEntry).from_select(["contact_id", "post_id", "created_at"], entries)
+        )
+        return result.rowcount
+
+    async def get_contact_ids_for_posts(self, post_ids: List[int], session: AsyncSession) -> Set[int]:
+        """Get the contacts whose feeds currently contain any of the given posts"""
+        if not post_ids:
+            return set()
+        result = await session.exec(
+            select(ContactFeedEntry.contact_id).where(col(ContactFeedEntry.post_id).in_(post_ids)).distinct()
+        )
+        return set(result.all())
+
+    async def refresh_posts(self, post_ids: List[int], session: AsyncSession) -> Set[int]:
+        """Recompute the feed entries of the given posts. Returns the contacts whose feeds may have changed."""
+        if not post_ids:
+            return set()
+        await session.flush()
+        affected = await self.get_contact_ids_for_posts(post_ids, session)
+        await session.execute(delete(ContactFeedEntry).where(col(ContactFeedEntry.post_id).in_(post_ids)))
+        await self._insert_from(
+            self._visible_entries().where(col(PostAudienceLink.post_id).in_(post_ids)), session
+        )
+        return affected | await self.get_contact_ids_for_posts(post_ids, session)
+
+    async def refresh_audience(self, audience_id: int, session: AsyncSession) -> Set[int]:
+        """Recompute the feed entries of every post shared with an audience after its membership changed"""
+        await session.flush()
+        result = await session.exec(
+            select(PostAudienceLink.post_id).where(PostAudienceLink.audience_id == audience_id)
+        )
+        return await self.refresh_posts(list(result.all()), session)
+
+    async def invalidate_cached_feeds(self, post_ids: List[int], session: AsyncSession) -> None:
+        """Drop cached feeds of every contact that can see the given posts"""
+        feed_cache.invalidate_contacts(await self.get_contact_ids_for_posts(post_ids, session))
+
+    async def delete_for_post(self, post_id: int, session: AsyncSession) -> None:
+        await session.execute(delete(ContactFeedEntry).where(col(ContactFeedEntry.post_id) == post_id))
+
+    async def delete_for_contact(self, contact_id: int, session: AsyncSession) -> None:
+        await session.execute(delete(ContactFeedEntry).where(col(ContactFeedEntry.contact_id) == contact_id))
+
+    async def rebuild_all(self, session: AsyncSession) -> int:
+        """Recompute the whole table from the link tables (recovery). Returns the number of entries."""
+        await session.execute(delete(ContactFeedEntry))
+        await self._insert_from(self._visible_entries(), session)
+        await session.commit()
+        result = await session.exec(select(func.count()).select_from(ContactFeedEntry))
+        return result.one()
+
+    async def backfill_missing(self, session: AsyncSession) -> int:
+        """
+        Insert the entries implied by the link tables that the table lacks, e.g. for posts
+        created before it existed. Run at startup; returns the number of entries added.
+        """
+        visible = self._visible_entries().subquery()
+        missing = select(visible.c.contact_id, visible.c.post_id, visible.c.created_at).where(~exists().where(
+            ContactFeedEntry.contact_id == visible.c.contact_id,
+            ContactFeedEntry.post_id == visible.c.post_id
+        ))
+        added = await self._insert_from(missing, session)
+        await session.commit()
+        return added
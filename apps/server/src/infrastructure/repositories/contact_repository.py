@@ -2,8 +2,14 @@ from typing import Sequence, List
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
 from src.domain.models.contact import Contact
+from src.infrastructure.repositories.contact_feed_repository import ContactFeedRepository
+from src.infrastructure.cache.feed_cache import feed_cache
+from src.infrastructure.cache.access_index import access_index
 
 class ContactRepository:
+    def __init__(self):
+        self.contact_feed_repository = ContactFeedRepository()
+
     async def create_contact(self, contact: Contact, session: AsyncSession) -> Contact:
         session.add(contact)
         await session.commit()
@@ -31,6 +37,9 @@ class ContactRepository:
         contact = await session.get(Contact, contact_id)
         if not contact:
             return False
+        await self.contact_feed_repository.delete_for_contact(contact_id, session)
         await session.delete(contact)
         await session.commit()
+        feed_cache.invalidate_contacts([contact_id])
+        access_index.remove_contact(contact_id)
         return True
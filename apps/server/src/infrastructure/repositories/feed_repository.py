@@ -0,0 +1,93 @@
+from typing import Sequence, List
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel import select, col, or_, and_
+from src.domain.models.post import Post
+from src.domain.models.user import User
+from src.domain.models.media_item import MediaItem
+from src.domain.models.contact_feed_entry import ContactFeedEntry
+from src.domain.models.links.audience_contact_link import AudienceContactLink
+from src.domain.models.links.post_audience_link import PostAudienceLink
+from src.utils.cursor import FeedCursor
+
+class FeedRepository:
+    """Set-based read queries for contact feeds (constant number of round trips per feed)"""
+
+    def _accessible_post_ids(self, contact_ids: List[int]):
+        """Subquery selecting the ids of posts shared with any audience the contacts belong to"""
+        return (
+            select(PostAudienceLink.post_id)
+            .join(AudienceContactLink, AudienceContactLink.audience_id == PostAudienceLink.audience_id)
+            .where(col(AudienceContactLink.contact_id).in_(contact_ids))
+        )
+
+    def _page(self, statement, created_at_column, post_id_column,
+              before: FeedCursor | None, after: FeedCursor | None, limit: int | None):
+        """Apply exclusive (created_at, id) keyset bounds, newest-first ordering and a limit"""
+        created_at_column, post_id_column = col(created_at_column), col(post_id_column)
+        if before is not None:
+            statement = statement.where(or_(
+                created_at_column < before.created_at,
+                and_(created_at_column == before.created_at, post_id_column < before.post_id)
+            ))
+        if after is not None:
+            statement = statement.where(or_(
+                created_at_column > after.created_at,
+                and_(created_at_column == after.created_at, post_id_column > after.post_id)
+            ))
+        statement = statement.order_by(created_at_column.desc(), post_id_column.desc())
+        if limit is not None:
+            statement = statement.limit(limit)
+        return statement
+
+    async def get_contact_feed(self, contact_id: int, session: AsyncSession,
+                               before: FeedCursor | None = None,
+                               after: FeedCursor | None = None,
+                               limit: int | None = None) -> Sequence[tuple[Post, str]]:
+        """
+        Get (post, creator name) rows in a contact's feed, newest first, as one
+        range scan over the materialized ContactFeedEntry table.
+        `before` and `after` are exclusive keyset bounds on (created_at, id).
+        """
+        statement = (
+            select(Post, User.name)
+            .select_from(ContactFeedEntry)
+            .join(Post, Post.id == ContactFeedEntry.post_id)
+            .join(User, User.id == Post.user_id)
+            .where(ContactFeedEntry.contact_id == contact_id)
+        )
+        statement = self._page(statement, ContactFeedEntry.created_at, ContactFeedEntry.post_id, before, after, limit)
+        result = await session.exec(statement)
+        return result.all()
+
+    async def get_posts_for_contacts(self, contact_ids: List[int], session: AsyncSession,
+                                     before: FeedCursor | None = None,
+                                     after: FeedCursor | None = None,
+                                     limit: int | None = None) -> Sequence[tuple[Post, str]]:
+        """
+        Get (post, creator name) rows visible to any of the contacts, newest first,
+        computed from the link tables and de-duplicated across contacts.
+        """
+        if not contact_ids:
+            return []
+        statement = (
+            select(Post, User.name)
+            .join(User, User.id == Post.user_id)
+            .where(col(Post.id).in_(self._accessible_post_ids(contact_ids)))
+        )
+        statement = self._page(statement, Post.created_at, Post.id, before, after, limit)
+        result = await session.exec(statement)
+        return result.all()
+
+    async def get_media_items_for_posts(self, post_ids: List[int], session: AsyncSession) -> dict[int, List[MediaItem]]:
+        """Get the media items of several posts in one query, grouped by post id and ordered"""
+        grouped: dict[int, List[MediaItem]] = {post_id: [] for post_id in post_ids}
+        if not post_ids:
+            return grouped
+        result = await session.exec(
+            select(MediaItem)
+            .where(col(MediaItem.post_id).in_(post_ids))
+            .order_by(col(MediaItem.post_id), col(MediaItem.order), col(MediaItem.id))
+        )
+        for media_item in result.all():
+            grouped[media_item.post_id].append(media_item)
+        return grouped
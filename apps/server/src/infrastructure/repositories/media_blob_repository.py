@@ -0,0 +1,68 @@
+from collections import Counter
+from typing import Any, AsyncIterator, Iterable, List
+from sqlalchemy import update
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel import select, col
+from src.domain.models.media_blob import MediaBlob
+from src.infrastructure.database import byte_ordered
+
+class MediaBlobRepository:
+    """
+    Blob rows are read with a row lock and changed inside the caller's transaction, so
+    reference changes and the storage work that depends on them are serialized per
+    blob. The caller commits.
+    """
+
+    async def get_blob_for_update(self, checksum: str, session: AsyncSession) -> MediaBlob | None:
+        result = await session.exec(select(MediaBlob).where(MediaBlob.checksum == checksum).with_for_update())
+        return result.first()
+
+    async def get_blob_by_path_for_update(self, path: str, session: AsyncSession) -> MediaBlob | None:
+        result = await session.exec(select(MediaBlob).where(MediaBlob.path == path).with_for_update())
+        return result.first()
+
+    async def drop_references(self, paths: Iterable[str], session: AsyncSession) -> None:
+        """
+        Drop one reference per path, for media item rows deleted in the same transaction.
+        Paths that are not blobs are ignored. Blobs left without references are kept for
+        `MediaBlobService.collect`, which deletes their objects.
+        """
+        # In path order, so concurrent deletes lock shared blobs in the same order
+        for path, count in sorted(Counter(paths).items()):
+            await session.execute(
+                update(MediaBlob).where(col(MediaBlob.path) == path).values(ref_count=MediaBlob.ref_count - count)
+            )
+
+    async def get_unreferenced_paths(self, session: AsyncSession, limit: int = 1000) -> List[str]:
+        """Paths of blobs no media item holds a reference to any more"""
+        result = await session.exec(
+            select(MediaBlob.path).where(MediaBlob.ref_count <= 0).order_by(col(MediaBlob.path)).limit(limit)
+        )
+        return list(result.all())
+
+    async def stream_paths(self, from_path: str, session: AsyncSession, batch_size: int = 1000) -> AsyncIterator[Any]:
+        """(checksum, path) of every blob with a path from `from_path` on, in byte order of path"""
+        path = byte_ordered(col(MediaBlob.path), session)
+        result = await session.stream(
+            select(MediaBlob.checksum, MediaBlob.path)
+            .where(path >= from_path)
+            .order_by(path)
+            .execution_options(yield_per=batch_size)
+        )
+        async for row in result:
+            yield row
+
+    async def has_blob_with_path(self, path: str, session: AsyncSession, prefix: bool = False) -> bool:
+        """Whether a blob's path is `path` (or starts with it, if `prefix`)"""
+        condition = col(MediaBlob.path).startswith(path, autoescape=True) if prefix else col(MediaBlob.path) == path
+        result = await session.exec(select(MediaBlob.checksum).where(condition).limit(1))
+        return result.first() is not None
+
+    async def save_blob(self, blob: MediaBlob, session: AsyncSession) -> MediaBlob:
+        session.add(blob)
+        await session.flush()
+        return blob
+
+    async def delete_blob(self, blob: MediaBlob, session: AsyncSession) -> None:
+        await session.delete(blob)
+        await session.flush()
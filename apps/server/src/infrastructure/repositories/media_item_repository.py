@@ -1,35 +1,111 @@
-from typing import Sequence
+from typing import Any, AsyncIterator, Sequence
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlmodel import select
-from src.domain.models.media_item import MediaItem
+from sqlmodel import select, col
+from src.infrastructure.database import byte_ordered
+from src.domain.models.media_item import MediaItem, MediaType
+from src.domain.models.post import Post
+from src.infrastructure.repositories.contact_feed_repository import ContactFeedRepository
+from src.infrastructure.repositories.media_blob_repository import MediaBlobRepository
 
 class MediaItemRepository:
+    def __init__(self):
+        self.contact_feed_repository = ContactFeedRepository()
+        self.media_blob_repository = MediaBlobRepository()
+
     async def create_media_item(self, media_item: MediaItem, session: AsyncSession) -> MediaItem:
         session.add(media_item)
         await session.commit()
         await session.refresh(media_item)
+        await self.contact_feed_repository.invalidate_cached_feeds([media_item.post_id], session)
         return media_item
 
     async def get_media_items_by_post_id(self, post_id: int, session: AsyncSession) -> Sequence[MediaItem]:
         result = await session.exec(
-            select(MediaItem).where(MediaItem.post_id == post_id)
+            select(MediaItem).where(MediaItem.post_id == post_id).order_by(col(MediaItem.order), col(MediaItem.id))
+        )
+        return result.all()
+
+    async def get_media_items_by_user_id(self, user_id: int, session: AsyncSession) -> Sequence[MediaItem]:
+        result = await session.exec(
+            select(MediaItem).join(Post, col(Post.id) == col(MediaItem.post_id)).where(Post.user_id == user_id)
+        )
+        return result.all()
+
+    async def get_derivatives_by_path(self, path: str, session: AsyncSession) -> dict | None:
+        """Renditions already recorded by another media item sharing the original at `path`"""
+        result = await session.exec(
+            select(MediaItem.derivatives).where(MediaItem.path == path, col(MediaItem.derivatives).is_not(None)).limit(1)
+        )
+        return result.first()
+
+    async def get_placeholder_by_path(self, path: str, session: AsyncSession) -> tuple[str, str] | None:
+        """(blurhash, dominant colour) already computed for another media item sharing the original at `path`"""
+        result = await session.exec(
+            select(MediaItem.blurhash, MediaItem.dominant_color)
+            .where(MediaItem.path == path, col(MediaItem.blurhash).is_not(None))
+            .limit(1)
+        )
+        row = result.first()
+        return (row[0], row[1]) if row else None
+
+    async def get_photos_without_placeholder(self, after_id: int, limit: int, session: AsyncSession) -> Sequence[MediaItem]:
+        """Page through photos with no placeholder, in id order"""
+        result = await session.exec(
+            select(MediaItem)
+            .where(MediaItem.type == MediaType.photo, col(MediaItem.blurhash).is_(None), col(MediaItem.id) > after_id)
+            .order_by(col(MediaItem.id))
+            .limit(limit)
         )
         return result.all()
 
     async def get_media_item_by_id(self, media_item_id: int, session: AsyncSession) -> MediaItem | None:
         return await session.get(MediaItem, media_item_id)
 
+    async def get_media_items_without_metadata(self, after_id: int, limit: int, session: AsyncSession) -> Sequence[MediaItem]:
+        """Page through media items with no recorded size, in id order"""
+        result = await session.exec(
+            select(MediaItem)
+            .where(col(MediaItem.size_bytes).is_(None), col(MediaItem.id) > after_id)
+            .order_by(col(MediaItem.id))
+            .limit(limit)
+        )
+        return result.all()
+
+    async def stream_paths(self, from_path: str, session: AsyncSession, batch_size: int = 1000) -> AsyncIterator[Any]:
+        """
+        (id, path, derivatives) of every media item with a path from `from_path` on, in
+        byte order of path. Rows are fetched `batch_size` at a time as they are consumed.
+        """
+        path = byte_ordered(col(MediaItem.path), session)
+        result = await session.stream(
+            select(MediaItem.id, MediaItem.path, MediaItem.derivatives)
+            .where(path >= from_path)
+            .order_by(path, col(MediaItem.id))
+            .execution_options(yield_per=batch_size)
+        )
+        async for row in result:
+            yield row
+
+    async def has_media_item_with_path(self, path: str, session: AsyncSession, prefix: bool = False) -> bool:
+        """Whether a media item's path is `path` (or starts with it, if `prefix`)"""
+        condition = col(MediaItem.path).startswith(path, autoescape=True) if prefix else col(MediaItem.path) == path
+        result = await session.exec(select(MediaItem.id).where(condition).limit(1))
+        return result.first() is not None
+
     async def update_media_item(self, media_item: MediaItem, session: AsyncSession) -> MediaItem:
         session.add(media_item)
         await session.commit()
         await session.refresh(media_item)
+        await self.contact_feed_repository.invalidate_cached_feeds([media_item.post_id], session)
         return media_item
 
     async def delete_media_item(self, media_item_id: int, session: AsyncSession) -> bool:
         media_item = await session.get(MediaItem, media_item_id)
         if media_item:
             await session.delete(media_item)
+            await self.media_blob_repository.drop_references([media_item.path], session)
             await session.commit()
+            await self.contact_feed_repository.invalidate_cached_feeds([media_item.post_id], session)
             return True
         return False
 
@@ -40,4 +116,6 @@ class MediaItemRepository:
         media_items = result.all()
         for media_item in media_items:
             await session.delete(media_item)
+        await self.media_blob_repository.drop_references([media_item.path for media_item in media_items], session)
         await session.commit()
+        await self.contact_feed_repository.invalidate_cached_feeds([post_id], session)
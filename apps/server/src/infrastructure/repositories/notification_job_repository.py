@@ -0,0 +1,104 @@
+from datetime import datetime, timezone
+from typing import Sequence
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel import select, col, func
+from sqlalchemy import DateTime, Integer, String, delete, insert, literal
+from src.domain.models.contact import Contact
+from src.domain.models.notification_job import NotificationJob, NotificationStatus, NotificationReport
+from src.domain.models.post import Post
+from src.domain.models.user import User
+from src.domain.models.links.audience_contact_link import AudienceContactLink
+from src.domain.models.links.post_audience_link import PostAudienceLink
+
+class NotificationJobRepository:
+    """
+    The notification outbox. Enqueueing only flushes so it joins the transaction that
+    creates the post; the dispatcher's methods commit.
+    """
+
+    async def enqueue_for_post(self, post_id: int, session: AsyncSession) -> None:
+        """
+        Queue a job for every distinct contact in any of the post's audiences, resolved
+        and inserted in a single statement
+        """
+        await session.flush()
+        now = datetime.now(timezone.utc)
+        recipients = (
+            select(
+                literal(post_id, Integer),
+                AudienceContactLink.contact_id,
+                literal(NotificationStatus.pending.value, String),
+                literal(0, Integer),
+                literal(now, DateTime(timezone=True)),
+                literal(now, DateTime(timezone=True))
+            )
+            .join(PostAudienceLink, PostAudienceLink.audience_id == AudienceContactLink.audience_id)
+            .where(PostAudienceLink.post_id == post_id)
+            .distinct()
+        )
+        await session.execute(insert(NotificationJob).from_select(
+            ["post_id", "contact_id", "status", "attempts", "next_attempt_at", "created_at"], recipients
+        ))
+
+    async def claim_due(self, now: datetime, lease_until: datetime, limit: int,
+                        session: AsyncSession) -> Sequence[tuple[NotificationJob, Contact | None, str | None]]:
+        """
+        Take up to `limit` pending jobs that are due, oldest first, with their contact and
+        the name of the post's author (None when either is gone). They are leased until
+        `lease_until`, so other dispatchers skip them; a dispatcher that dies before
+        settling them leaves them to be retried when the lease runs out.
+        """
+        result = await session.exec(
+            select(NotificationJob, Contact, User.name)
+            .outerjoin(Contact, col(Contact.id) == col(NotificationJob.contact_id))
+            .outerjoin(Post, col(Post.id) == col(NotificationJob.post_id))
+            .outerjoin(User, col(User.id) == col(Post.user_id))
+            .where(NotificationJob.status == NotificationStatus.pending.value,
+                   col(NotificationJob.next_attempt_at) <= now)
+            .order_by(col(NotificationJob.next_attempt_at), col(NotificationJob.id))
+            .limit(limit)
+            .with_for_update(skip_locked=True, of=NotificationJob)
+        )
+        claimed = result.all()
+        for job, _, _ in claimed:
+            job.next_attempt_at = lease_until
+            session.add(job)
+        await session.commit()
+        return claimed
+
+    async def settle(self, jobs: Sequence[NotificationJob], dropped: Sequence[NotificationJob],
+                     session: AsyncSession) -> None:
+        """Save the outcome of a batch and delete the jobs that had nobody left to notify"""
+        for job in jobs:
+            session.add(job)
+        for job in dropped:
+            await session.delete(job)
+        await session.commit()
+
+    async def delete_for_post(self, post_id: int, session: AsyncSession) -> None:
+        await session.execute(delete(NotificationJob).where(col(NotificationJob.post_id) == post_id))
+
+    async def get_report(self, post_id: int, session: AsyncSession) -> NotificationReport:
+        """Jobs of a post counted by status, with the messages billed for them and their cost"""
+        result = await session.exec(
+            select(NotificationJob.status, func.count(),
+                   func.coalesce(func.sum(NotificationJob.message_count), 0),
+                   func.coalesce(func.sum(NotificationJob.cost), 0))
+            .where(NotificationJob.post_id == post_id)
+            .group_by(col(NotificationJob.status))
+        )
+        counts = {status: 0 for status in NotificationStatus}
+        messages, cost = 0, 0.0
+        for status, count, status_messages, status_cost in result.all():
+            counts[NotificationStatus(status)] = count
+            messages += status_messages
+            cost += status_cost
+        return NotificationReport(
+            post_id=post_id,
+            recipients=sum(counts.values()),
+            sent=counts[NotificationStatus.sent],
+            pending=counts[NotificationStatus.pending],
+            dead=counts[NotificationStatus.dead],
+            messages=messages,
+            cost=round(cost, 8)
+        )
@@ -4,9 +4,20 @@ from sqlmodel import select
 from src.domain.models.post import Post
 from src.domain.models.audience import Audience
 from src.domain.models.user import User
+from src.domain.models.media_item import MediaItem
 from src.domain.models.links.post_audience_link import PostAudienceLink
+from src.infrastructure.repositories.contact_feed_repository import ContactFeedRepository
+from src.infrastructure.repositories.notification_job_repository import NotificationJobRepository
+from src.infrastructure.repositories.media_blob_repository import MediaBlobRepository
+from src.infrastructure.cache.feed_cache import feed_cache
+from src.infrastructure.cache.access_index import access_index
 
 class PostRepository:
+    def __init__(self):
+        self.contact_feed_repository = ContactFeedRepository()
+        self.notification_job_repository = NotificationJobRepository()
+        self.media_blob_repository = MediaBlobRepository()
+
     async def get_posts(self, session: AsyncSession) -> Sequence[Post]:
         result = await session.exec(select(Post))
         return result.all()
@@ -34,23 +45,57 @@ class PostRepository:
         )
         return result.all()
 
-    async def create_post(self, description: str, user_id: int, session: AsyncSession) -> Post:
-        db_post = Post(description=description, user_id=user_id)
-        session.add(db_post)
+    async def create_post_with_media(self, post: Post, audience_ids: List[int], media_items: List[MediaItem],
+                                     session: AsyncSession) -> Post:
+        """
+        Insert a post with its audience links, media items and the notifications to its
+        audiences in one transaction
+        """
+        session.add(post)
+        await session.flush()
+        for audience_id in audience_ids:
+            session.add(PostAudienceLink(post_id=post.id, audience_id=audience_id))
+        for media_item in media_items:
+            media_item.post_id = post.id
+            session.add(media_item)
+        
+        affected_contact_ids = set()
+        if audience_ids and post.id is not None:
+            affected_contact_ids = await self.contact_feed_repository.refresh_posts([post.id], session)
+            await self.notification_job_repository.enqueue_for_post(post.id, session)
         await session.commit()
-        await session.refresh(db_post)
-        return db_post
+        await session.refresh(post)
+        for media_item in media_items:
+            await session.refresh(media_item)
+        feed_cache.invalidate_contacts(affected_contact_ids)
+        if audience_ids and post.id is not None:
+            access_index.set_post_audiences(post.id, audience_ids)
+        return post
 
     async def update_post(self, post: Post, session: AsyncSession) -> Post:
         session.add(post)
         await session.commit()
         await session.refresh(post)
+        if post.id is not None:
+            await self.contact_feed_repository.invalidate_cached_feeds([post.id], session)
         return post
 
-    async def delete_post(self, post_id: int, session: AsyncSession) -> bool:
+    async def delete_post(self, post_id: int, session: AsyncSession) -> Sequence[MediaItem] | None:
+        """
+        Delete a post with its links and media item rows in one transaction. Returns the
+        deleted media items, whose files the caller deletes, or None if there is no post.
+        """
         post = await session.get(Post, post_id)
         if not post:
-            return False
+            return None
+        
+        # Media rows and their blob references go in the same transaction, so a failed
+        # delete keeps them with the post and a restart cannot leave a count too high
+        media_result = await session.exec(select(MediaItem).where(MediaItem.post_id == post_id))
+        media_items = media_result.all()
+        for media_item in media_items:
+            await session.delete(media_item)
+        await self.media_blob_repository.drop_references([media_item.path for media_item in media_items], session)
         
         # Remove all audience links first
         result = await session.exec(
@@ -60,13 +105,20 @@ class PostRepository:
         for link in links:
             await session.delete(link)
         
+        # Prune the post from every contact feed
+        affected_contact_ids = await self.contact_feed_repository.get_contact_ids_for_posts([post_id], session)
+        await self.contact_feed_repository.delete_for_post(post_id, session)
+        await self.notification_job_repository.delete_for_post(post_id, session)
+        
         # Flush to ensure links are deleted before deleting post
         await session.flush()
         
         # Delete the post
         await session.delete(post)
         await session.commit()
-        return True
+        feed_cache.invalidate_contacts(affected_contact_ids)
+        access_index.remove_post(post_id)
+        return media_items
 
     async def assign_audiences_to_post(self, post_id: int, audience_ids: List[int], session: AsyncSession) -> None:
         # Remove existing audience assignments
@@ -81,4 +133,12 @@ class PostRepository:
             link = PostAudienceLink(post_id=post_id, audience_id=audience_id)
             session.add(link)
         
+        # Fan the post out to the feeds of its audiences' contacts
+        affected_contact_ids = await self.contact_feed_repository.refresh_posts([post_id], session)
         await session.commit()
+        feed_cache.invalidate_contacts(affected_contact_ids)
+        access_index.set_post_audiences(post_id, audience_ids)
+
+    async def get_all_audience_links(self, session: AsyncSession) -> Sequence[PostAudienceLink]:
+        result = await session.exec(select(PostAudienceLink))
+        return result.all()
@@ -0,0 +1,52 @@
+from datetime import datetime, timezone
+from typing import Sequence
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel import select, col
+from sqlalchemy import delete
+from src.domain.models.upload_session import UploadSession, UploadSessionPart
+
+class UploadSessionRepository:
+    async def create_session(self, upload_session: UploadSession, session: AsyncSession) -> UploadSession:
+        session.add(upload_session)
+        await session.commit()
+        await session.refresh(upload_session)
+        return upload_session
+
+    async def get_session_by_id(self, session_id: str, session: AsyncSession) -> UploadSession | None:
+        return await session.get(UploadSession, session_id)
+
+    async def get_session_by_upload_id(self, upload_id: str, session: AsyncSession) -> UploadSession | None:
+        result = await session.exec(select(UploadSession).where(UploadSession.upload_id == upload_id))
+        return result.first()
+
+    async def get_stale_sessions(self, idle_since: datetime, limit: int, session: AsyncSession) -> Sequence[UploadSession]:
+        """Sessions that received nothing since `idle_since`, oldest first"""
+        result = await session.exec(
+            select(UploadSession)
+            .where(col(UploadSession.updated_at) < idle_since)
+            .order_by(col(UploadSession.updated_at))
+            .limit(limit)
+        )
+        return result.all()
+
+    async def get_parts(self, session_id: str, session: AsyncSession) -> Sequence[UploadSessionPart]:
+        result = await session.exec(
+            select(UploadSessionPart)
+            .where(UploadSessionPart.session_id == session_id)
+            .order_by(col(UploadSessionPart.part_number))
+        )
+        return result.all()
+
+    async def save_part(self, upload_session: UploadSession, part: UploadSessionPart,
+                        session: AsyncSession) -> UploadSessionPart:
+        """Record a received part, replacing an earlier copy of it, and mark the session active"""
+        part = await session.merge(part)
+        upload_session.updated_at = datetime.now(timezone.utc)
+        session.add(upload_session)
+        await session.commit()
+        return part
+
+    async def delete_session(self, upload_session: UploadSession, session: AsyncSession) -> None:
+        await session.execute(delete(UploadSessionPart).where(col(UploadSessionPart.session_id) == upload_session.id))
+        await session.delete(upload_session)
+        await session.commit()
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Failures kept per job for reporting; the count covers all of them
+MAX_RECORDED_ERRORS = 20
+
+@dataclass
+class DeletionProgress:
+    """Counters of a running deletion, updated as each batch completes"""
+    listed: int = 0
+    deleted: int = 0
+    failed: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    def record(self, deleted: int, failures: List[tuple[str, str]]) -> None:
+        self.deleted += deleted
+        self.failed += len(failures)
+        for path, message in failures:
+            if len(self.errors) < MAX_RECORDED_ERRORS:
+                self.errors.append(f"{path}: {message}")
+
+
+@dataclass
+class DeletionJob:
+    id: str
+    owner_id: Optional[int]
+    description: str
+    status: str = "pending"
+    progress: DeletionProgress = field(default_factory=DeletionProgress)
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    finished_at: Optional[datetime] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "description": self.description,
+            "status": self.status,
+            "listed": self.progress.listed,
+            "deleted": self.progress.deleted,
+            "failed": self.progress.failed,
+            "errors": self.progress.errors,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class DeletionJobs:
+    """
+    Storage deletions run in the background so the request that caused them returns
+    at once. Jobs are kept in memory (the most recent `max_jobs`) for progress polling;
+    a restart loses only their reports, as the objects left behind are still listed
+    under their prefix and can be deleted again.
+    """
+
+    def __init__(self, max_jobs: int = 200):
+        self.max_jobs = max_jobs
+        self._jobs: OrderedDict[str, DeletionJob] = OrderedDict()
+        # Strong references, so running jobs are not garbage collected
+        self._tasks: Set[asyncio.Task] = set()
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+
+    def start(self, description: str, owner_id: Optional[int],
+              run: Callable[[DeletionProgress], Awaitable[None]]) -> DeletionJob:
+        """Start `run(progress)` in the background and return its job"""
+        job = DeletionJob(id=uuid.uuid4().hex, owner_id=owner_id, description=description)
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+        self.started += 1
+        task = asyncio.create_task(self._run(job, run))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job: DeletionJob, run: Callable[[DeletionProgress], Awaitable[None]]) -> None:
+        job.status = "running"
+        try:
+            await run(job.progress)
+            job.status = "completed" if not job.progress.failed else "completed_with_errors"
+            self.completed += 1
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            self.failed += 1
+            logger.error(f"Deletion job {job.id} ({job.description}) failed: {e}")
+        finally:
+            job.finished_at = datetime.now(timezone.utc)
+            logger.info(f"Deletion job {job.id} ({job.description}): {job.status}, "
+                        f"{job.progress.deleted} deleted, {job.progress.failed} failed")
+
+    def get(self, job_id: str) -> Optional[DeletionJob]:
+        return self._jobs.get(job_id)
+
+    def for_owner(self, owner_id: int) -> List[DeletionJob]:
+        return [job for job in reversed(self._jobs.values()) if job.owner_id == owner_id]
+
+    def stats(self) -> dict:
+        return {
+            "running": len(self._tasks),
+            "started": self.started,
+            "completed": self.completed,
+            "failed": self.failed
+        }
+
+
+# Create singleton instance shared by every request
+deletion_jobs = DeletionJobs()
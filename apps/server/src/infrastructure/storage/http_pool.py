@@ -0,0 +1,58 @@
+import os
+import weakref
+import certifi
+import urllib3
+from urllib3.util import Retry, Timeout
+from src.utils.env import get_optional_env_var
+
+class StorageHttpPools:
+    """
+    Creates the urllib3 connection pools of the MinIO clients and reports their usage.
+
+    Each client gets its own pool manager (the minio client clears its pool when it is
+    garbage collected, so one must not be shared). Pools hold up to
+    MINIO_POOL_MAXSIZE connections per host; beyond that extra connections are opened
+    and discarded after use, which shows up as `overflow` in the stats.
+    """
+
+    def __init__(self, maxsize: int | None = None):
+        self.maxsize = maxsize or int(get_optional_env_var("MINIO_POOL_MAXSIZE", "32"))
+        self._managers: "weakref.WeakSet[urllib3.PoolManager]" = weakref.WeakSet()
+
+    def create(self) -> urllib3.PoolManager:
+        """A pool manager configured like the minio default, with a tunable size"""
+        timeout = 5 * 60
+        manager = urllib3.PoolManager(
+            timeout=Timeout(connect=timeout, read=timeout),
+            maxsize=self.maxsize,
+            cert_reqs="CERT_REQUIRED",
+            ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+            retries=Retry(total=5, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504])
+        )
+        self._managers.add(manager)
+        return manager
+
+    def stats(self) -> dict:
+        checked_out = idle = opened = requests = 0
+        for manager in list(self._managers):
+            for key in manager.pools.keys():
+                pool = manager.pools.get(key)
+                if pool is None or pool.pool is None:
+                    continue
+                # The queue starts with `maxsize` placeholders; a checkout takes one out
+                checked_out += pool.pool.maxsize - pool.pool.qsize()
+                idle += sum(1 for connection in list(pool.pool.queue) if connection is not None)
+                opened += pool.num_connections
+                requests += pool.num_requests
+        return {
+            "clients": len(self._managers),
+            "maxsize_per_host": self.maxsize,
+            "checked_out": checked_out,
+            "idle": idle,
+            "connections_opened": opened,
+            "requests": requests
+        }
+
+
+# Create singleton instance shared by every MediaStorageService
+storage_http_pools = StorageHttpPools()
@@ -1,14 +1,57 @@
+import asyncio
+import io
+import itertools
 import os
 import uuid
-from typing import BinaryIO, Any
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+from typing import BinaryIO, Any, AsyncIterator, Iterator, List
 from minio import Minio
+from minio.commonconfig import CopySource
+from minio.deleteobjects import DeleteObject
 from minio.error import S3Error
 import logging
 
-from src.utils.env import get_env_var
+from src.utils.env import get_env_var, get_optional_env_var
+from src.infrastructure.storage.storage_executor import storage_executor
+from src.infrastructure.storage.upload_pipe import UploadPipe, upload_executor, UPLOAD_PART_SIZE
+from src.infrastructure.storage.object_stream import ObjectStream
+from src.infrastructure.storage.http_pool import storage_http_pools
+from src.infrastructure.storage.multipart_client import MultipartClient
+from src.infrastructure.storage.deletion_jobs import DeletionProgress
+from src.infrastructure.cache.media_disk_cache import media_disk_cache
+from src.infrastructure.imaging.media_probe import MediaProbe
 
 logger = logging.getLogger(__name__)
 
+# Content-addressed originals shared by media items, and uploads waiting to be moved there
+BLOB_PREFIX = "blobs/"
+STAGING_PREFIX = "uploads/"
+# Most keys one multi-object delete request may carry
+DELETE_BATCH_SIZE = 1000
+
+@dataclass
+class FileInfo:
+    """Metadata of a stored object"""
+    content_type: str
+    size: int
+    etag: str | None
+    last_modified: datetime | None
+
+@dataclass
+class StoredFile:
+    """Result of an upload: where the object was stored and the ETag storage gave it"""
+    path: str
+    etag: str | None
+
+@dataclass
+class StoredObject:
+    """An entry of a bucket listing"""
+    path: str
+    size: int
+    last_modified: datetime | None
+
 class MediaStorageService:
     def __init__(self):
         self.endpoint = get_env_var("MINIO_ENDPOINT")
@@ -22,9 +65,30 @@ class MediaStorageService:
             self.endpoint,
             access_key=self.access_key,
             secret_key=self.secret_key,
-            secure=self.secure
+            secure=self.secure,
+            http_client=storage_http_pools.create()
+        )
+        # Uploads sent in separate parts, through the client's non-public multipart calls
+        self.multipart = MultipartClient(self.client)
+        
+        # Signs URLs clients use to reach storage directly, so it is addressed by the public
+        # endpoint. With the region given, presigning needs no request to storage.
+        self.external_endpoint = get_optional_env_var("MINIO_EXTERNAL_ENDPOINT", self.endpoint)
+        self.external_secure = get_optional_env_var("MINIO_EXTERNAL_SECURE", str(self.secure)).lower() == "true"
+        self.presign_client = Minio(
+            self.external_endpoint,
+            access_key=self.access_key,
+            secret_key=self.secret_key,
+            secure=self.external_secure,
+            region=get_optional_env_var("MINIO_REGION", "us-east-1")
         )
         
+        # Multi-object deletes in flight at once when deleting a prefix
+        self.delete_parallelism = int(get_optional_env_var("STORAGE_DELETE_PARALLELISM", "4"))
+        
+        # Repeatedly viewed objects are served from local disk
+        self.disk_cache = media_disk_cache
+        
         # Ensure bucket exists
         self._ensure_bucket_exists()
     
@@ -52,25 +116,43 @@ class MediaStorageService:
         structured_path = f"users/{user_id}/posts/{post_id}/{filename}"
         return structured_path
     
-    def upload_file(self, file_data: BinaryIO, file_name: str, content_type: str, 
-                    user_id: int | None = None, post_id: int | None = None) -> str:
+    def _object_name(self, file_name: str, user_id: int | None, post_id: int | None) -> str:
+        # Generate filename based on whether we have structure info
+        if user_id is not None and post_id is not None:
+            return self._generate_structured_path(user_id, post_id, file_name)
+        # Fallback to flat structure for backwards compatibility
+        file_extension = file_name.split('.')[-1] if '.' in file_name else ''
+        return f"{uuid.uuid4()}.{file_extension}" if file_extension else str(uuid.uuid4())
+    
+    def _extension(self, file_name: str) -> str:
+        return file_name.split('.')[-1].lower() if '.' in file_name else ''
+    
+    def blob_path(self, checksum: str, file_name: str) -> str:
+        """Content address of an original: blobs/{first two hex digits}/{sha256}.{ext}"""
+        extension = self._extension(file_name)
+        name = f"{checksum}.{extension}" if extension else checksum
+        return f"{BLOB_PREFIX}{checksum[:2]}/{name}"
+    
+    def staging_path(self, file_name: str) -> str:
+        """Temporary object an upload is streamed into until its checksum is known"""
+        extension = self._extension(file_name)
+        return f"{STAGING_PREFIX}{uuid.uuid4()}.{extension}" if extension else f"{STAGING_PREFIX}{uuid.uuid4()}"
+    
+    async def upload_file(self, file_data: BinaryIO, file_name: str, content_type: str, 
+                          user_id: int | None = None, post_id: int | None = None) -> str:
         """
         Upload a file to MinIO and return the file path.
+        The blocking upload runs in the storage thread pool.
         If user_id and post_id are provided, files are organized in a structured hierarchy:
         users/{user_id}/posts/{post_id}/{uuid}.{ext}
         Otherwise, files are stored in the root with just {uuid}.{ext}
         """
         try:
-            # Generate filename based on whether we have structure info
-            if user_id is not None and post_id is not None:
-                object_name = self._generate_structured_path(user_id, post_id, file_name)
-            else:
-                # Fallback to flat structure for backwards compatibility
-                file_extension = file_name.split('.')[-1] if '.' in file_name else ''
-                object_name = f"{uuid.uuid4()}.{file_extension}" if file_extension else str(uuid.uuid4())
+            object_name = self._object_name(file_name, user_id, post_id)
             
             # Upload file
-            self.client.put_object(
+            await storage_executor.run(
+                self.client.put_object,
                 bucket_name=self.bucket_name,
                 object_name=object_name,
                 data=file_data,
@@ -86,28 +168,220 @@ class MediaStorageService:
             logger.error(f"Error uploading file: {e}")
             raise
     
-    def get_file_stream(self, file_path: str) -> tuple[Any, str, int]:
-        """Get a file stream for direct serving"""
+    async def upload_stream(self, pipe: UploadPipe, object_name: str, content_type: str) -> StoredFile:
+        """
+        Upload a file from a pipe fed by the request body to `object_name`.
+        The data goes into a MinIO multipart upload one part at a time, so at most one
+        part is held in memory. If the pipe is closed with an error the multipart upload
+        is aborted and the error is raised here.
+        """
+        try:
+            result = await upload_executor.run(
+                self.client.put_object,
+                bucket_name=self.bucket_name,
+                object_name=object_name,
+                data=pipe,
+                content_type=content_type,
+                length=-1,
+                part_size=UPLOAD_PART_SIZE
+            )
+            logger.info(f"Uploaded file: {object_name}")
+            return StoredFile(object_name, result.etag)
+        
+        except BaseException as e:
+            # Unblock the request handler if it is waiting to write more data
+            pipe.close(e)
+            if isinstance(e, S3Error):
+                logger.error(f"Error uploading file: {e}")
+            raise
+    
+    def presigned_put_url(self, object_name: str, expires: timedelta) -> str:
+        """URL a client can PUT `object_name` to directly, valid for `expires`"""
+        return self.presign_client.presigned_put_object(self.bucket_name, object_name, expires=expires)
+    
+    async def create_multipart_upload(self, object_name: str, content_type: str) -> str:
+        """Start a multipart upload to `object_name` whose parts are sent separately; returns its id"""
+        upload_id = await storage_executor.run(
+            self.multipart.create, self.bucket_name, object_name, content_type
+        )
+        logger.info(f"Started multipart upload {upload_id} of {object_name}")
+        return upload_id
+    
+    async def upload_part(self, object_name: str, upload_id: str, part_number: int, data: bytes) -> str:
+        """Store one part of a multipart upload, replacing an earlier copy; returns its ETag"""
+        return await upload_executor.run(
+            self.multipart.upload_part, self.bucket_name, object_name, upload_id, part_number, data
+        )
+    
+    async def complete_multipart_upload(self, object_name: str, upload_id: str,
+                                        parts: List[tuple[int, str]]) -> StoredFile:
+        """
+        Assemble the object from its parts, given as (part number, ETag) in order. Completing
+        an upload that an earlier attempt already completed returns the stored object.
+        """
+        try:
+            etag = await storage_executor.run(self.multipart.complete, self.bucket_name, object_name, upload_id, parts)
+            logger.info(f"Completed multipart upload of {object_name} from {len(parts)} parts")
+            return StoredFile(object_name, etag)
+        except S3Error as e:
+            if e.code == "NoSuchUpload" and await self.file_exists(object_name):
+                return StoredFile(object_name, None)
+            raise
+    
+    async def abort_multipart_upload(self, object_name: str, upload_id: str) -> None:
+        """Drop a multipart upload and its stored parts; one that no longer exists is ignored"""
+        try:
+            await storage_executor.run(self.multipart.abort, self.bucket_name, object_name, upload_id)
+            logger.info(f"Aborted multipart upload {upload_id} of {object_name}")
+        except S3Error as e:
+            if e.code != "NoSuchUpload":
+                raise
+    
+    async def list_multipart_uploads(self, prefix: str) -> List[tuple[str, str, datetime | None]]:
+        """(object name, upload id, initiated) of the unfinished multipart uploads under `prefix`"""
+        return await storage_executor.run(self.multipart.list, self.bucket_name, prefix)
+    
+    async def copy_file(self, source_path: str, target_path: str, source_etag: str | None = None) -> str | None:
+        """
+        Copy an object within the bucket (server side) and return the copy's ETag.
+        With `source_etag` the copy fails if the source was replaced since it was read.
+        """
+        try:
+            result = await storage_executor.run(
+                self.client.copy_object,
+                self.bucket_name,
+                target_path,
+                CopySource(self.bucket_name, source_path, match_etag=source_etag)
+            )
+            logger.info(f"Copied file {source_path} to {target_path}")
+            return result.etag
+        except S3Error as e:
+            logger.error(f"Error copying file: {e}")
+            raise
+    
+    async def put_file_bytes(self, object_name: str, data: bytes, content_type: str) -> str:
+        """Store an in-memory file under an exact object name"""
+        self.disk_cache.discard(object_name)
+        try:
+            await storage_executor.run(
+                self.client.put_object,
+                bucket_name=self.bucket_name,
+                object_name=object_name,
+                data=io.BytesIO(data),
+                length=len(data),
+                content_type=content_type
+            )
+            logger.info(f"Uploaded file: {object_name}")
+            return object_name
+        except S3Error as e:
+            logger.error(f"Error uploading file: {e}")
+            raise
+    
+    async def get_file_bytes(self, file_path: str) -> bytes:
+        """Read a whole file into memory (for small files being processed)"""
+        return await storage_executor.run(self._get_file_bytes, file_path)
+    
+    def _get_file_bytes(self, file_path: str) -> bytes:
         try:
-            # Get file info
-            stat = self.client.stat_object(self.bucket_name, file_path)
-            content_type = stat.content_type or "application/octet-stream"
-            content_length = stat.size or 0
-            
-            # Get file stream
             response = self.client.get_object(self.bucket_name, file_path)
-            
-            logger.info(f"Streaming file {file_path} ({content_type}, {content_length} bytes)")
-            return response, content_type, content_length
-            
+            try:
+                return response.read()
+            finally:
+                response.close()
+                response.release_conn()
+        except S3Error as e:
+            logger.error(f"Error reading file: {e}")
+            raise
+    
+    async def get_file_stream(self, file_path: str, info: FileInfo | None = None) -> tuple[Any, str, int]:
+        """
+        Get a file stream for direct serving.
+        Objects in the local disk cache are returned as a CachedFile; others are
+        streamed from MinIO as an ObjectStream, which releases its connection when
+        read to the end or closed, and which fills the cache on the way when the
+        object is cacheable. Pass `info` when the object's metadata is already known
+        (from its media item); otherwise it is read from the headers of the GET, so
+        no separate stat request is made.
+        """
+        cached = self.disk_cache.open(file_path)
+        if cached is not None:
+            return cached, cached.content_type, cached.length
+        try:
+            response = await storage_executor.run(self.client.get_object, self.bucket_name, file_path)
         except S3Error as e:
             logger.error(f"Error streaming file: {e}")
             raise
+        if info is None:
+            info = self._info_from_headers(response.headers)
+        fill = self.disk_cache.begin_fill(file_path, info.size, info.content_type, info.etag, info.last_modified)
+        logger.info(f"Streaming file {file_path} ({info.content_type}, {info.size} bytes)")
+        return ObjectStream(response, fill=fill), info.content_type, info.size
+    
+    def _info_from_headers(self, headers: Any) -> FileInfo:
+        last_modified = headers.get("last-modified")
+        try:
+            parsed_last_modified = parsedate_to_datetime(last_modified) if last_modified else None
+        except (TypeError, ValueError):
+            parsed_last_modified = None
+        return FileInfo(
+            content_type=headers.get("content-type") or "application/octet-stream",
+            size=int(headers.get("content-length") or 0),
+            etag=(headers.get("etag") or "").strip('"') or None,
+            last_modified=parsed_last_modified
+        )
+    
+    async def probe_file(self, file_path: str) -> tuple[FileInfo, MediaProbe]:
+        """Read a stored file once to get its metadata, checksum and dimensions"""
+        return await storage_executor.run(self._probe_file, file_path)
     
-    def delete_file(self, file_path: str) -> bool:
+    def _probe_file(self, file_path: str) -> tuple[FileInfo, MediaProbe]:
+        response = self.client.get_object(self.bucket_name, file_path)
+        try:
+            info = self._info_from_headers(response.headers)
+            probe = MediaProbe(info.content_type)
+            for chunk in response.stream(256 * 1024):
+                probe.feed(chunk)
+            return info, probe
+        finally:
+            response.close()
+            response.release_conn()
+    
+    async def get_file_info(self, file_path: str) -> FileInfo:
+        """Get the size, content type and validators of a stored file"""
+        entry = self.disk_cache.peek(file_path)
+        if entry is not None:
+            return FileInfo(entry.content_type, entry.size, entry.etag, entry.last_modified)
+        try:
+            stat = await storage_executor.run(self.client.stat_object, self.bucket_name, file_path)
+            return FileInfo(
+                content_type=stat.content_type or "application/octet-stream",
+                size=stat.size or 0,
+                etag=stat.etag,
+                last_modified=stat.last_modified
+            )
+        except S3Error as e:
+            logger.error(f"Error reading file info: {e}")
+            raise
+    
+    async def get_file_range(self, file_path: str, offset: int, length: int) -> Any:
+        """Get a stream over `length` bytes of a file starting at `offset` (a CachedFile or an ObjectStream)"""
+        cached = self.disk_cache.open(file_path, offset, length)
+        if cached is not None:
+            return cached
+        try:
+            return ObjectStream(await storage_executor.run(
+                self.client.get_object, self.bucket_name, file_path, offset=offset, length=length
+            ))
+        except S3Error as e:
+            logger.error(f"Error streaming file range: {e}")
+            raise
+    
+    async def delete_file(self, file_path: str) -> bool:
         """Delete a file from storage"""
+        self.disk_cache.discard(file_path)
         try:
-            self.client.remove_object(
+            await storage_executor.run(
+                self.client.remove_object,
                 bucket_name=self.bucket_name,
                 object_name=file_path
             )
@@ -117,10 +391,11 @@ class MediaStorageService:
             logger.error(f"Error deleting file: {e}")
             return False
     
-    def file_exists(self, file_path: str) -> bool:
+    async def file_exists(self, file_path: str) -> bool:
         """Check if a file exists in storage"""
         try:
-            self.client.stat_object(
+            await storage_executor.run(
+                self.client.stat_object,
                 bucket_name=self.bucket_name,
                 object_name=file_path
             )
@@ -128,62 +403,112 @@ class MediaStorageService:
         except S3Error:
             return False
     
-    def delete_post_media(self, user_id: int, post_id: int) -> int:
-        """Delete all media files for a specific post. Returns count of deleted files."""
+    async def is_missing(self, file_path: str) -> bool:
+        """Whether storage reports that no object exists at `file_path`; other errors are raised"""
         try:
-            prefix = f"users/{user_id}/posts/{post_id}/"
-            objects = self.client.list_objects(
-                bucket_name=self.bucket_name,
-                prefix=prefix,
-                recursive=True
-            )
-            
-            deleted_count = 0
-            for obj in objects:
-                if obj.object_name:
-                    try:
-                        self.client.remove_object(
-                            bucket_name=self.bucket_name,
-                            object_name=obj.object_name
-                        )
-                        deleted_count += 1
-                        logger.info(f"Deleted file: {obj.object_name}")
-                    except S3Error as e:
-                        logger.error(f"Error deleting {obj.object_name}: {e}")
-            
-            logger.info(f"Deleted {deleted_count} files for post {post_id}")
-            return deleted_count
-            
+            await storage_executor.run(self.client.stat_object, self.bucket_name, file_path)
+            return False
         except S3Error as e:
-            logger.error(f"Error listing files for deletion: {e}")
-            return 0
+            if e.code in ("NoSuchKey", "NoSuchObject"):
+                return True
+            raise
+    
+    async def list_objects(self, start_after: str | None = None,
+                           page_size: int = DELETE_BATCH_SIZE) -> AsyncIterator[List[StoredObject]]:
+        """
+        Every object in the bucket after `start_after`, a page at a time, in the byte-wise
+        key order object storage lists in. Pages are fetched as they are consumed.
+        """
+        listing = iter(self.client.list_objects(
+            bucket_name=self.bucket_name, recursive=True, start_after=start_after
+        ))
+        while True:
+            page = await storage_executor.run(self._next_objects, listing, page_size)
+            if not page:
+                return
+            yield [stored for stored in page if stored.path]
     
-    def delete_user_media(self, user_id: int) -> int:
-        """Delete all media files for a specific user. Returns count of deleted files."""
+    def _next_objects(self, listing: Iterator[Any], count: int) -> List[StoredObject]:
+        return [
+            StoredObject(path=obj.object_name or "", size=obj.size or 0, last_modified=obj.last_modified)
+            for obj in itertools.islice(listing, count)
+        ]
+    
+    async def delete_files(self, file_paths: List[str], progress: DeletionProgress | None = None) -> DeletionProgress:
+        """Delete several files with multi-object deletes"""
+        progress = progress or DeletionProgress()
+        for file_path in file_paths:
+            self.disk_cache.discard(file_path)
+        progress.listed += len(file_paths)
+        await asyncio.gather(*[
+            self._delete_batch(file_paths[i:i + DELETE_BATCH_SIZE], progress)
+            for i in range(0, len(file_paths), DELETE_BATCH_SIZE)
+        ])
+        return progress
+    
+    async def delete_prefix(self, prefix: str, progress: DeletionProgress | None = None) -> DeletionProgress:
+        """
+        Delete every object under a prefix. Objects are listed a page at a time and
+        removed in multi-object deletes of up to DELETE_BATCH_SIZE keys, with at most
+        `delete_parallelism` batches in flight, so memory stays bounded however many
+        objects there are. Failures are counted in `progress`, not raised.
+        """
+        progress = progress or DeletionProgress()
+        self.disk_cache.discard_prefix(prefix)
+        listing = iter(self.client.list_objects(bucket_name=self.bucket_name, prefix=prefix, recursive=True))
+        in_flight: set[asyncio.Task] = set()
         try:
-            prefix = f"users/{user_id}/"
-            objects = self.client.list_objects(
-                bucket_name=self.bucket_name,
-                prefix=prefix,
-                recursive=True
-            )
-            
-            deleted_count = 0
-            for obj in objects:
-                if obj.object_name:
-                    try:
-                        self.client.remove_object(
-                            bucket_name=self.bucket_name,
-                            object_name=obj.object_name
-                        )
-                        deleted_count += 1
-                        logger.info(f"Deleted file: {obj.object_name}")
-                    except S3Error as e:
-                        logger.error(f"Error deleting {obj.object_name}: {e}")
-            
-            logger.info(f"Deleted {deleted_count} files for user {user_id}")
-            return deleted_count
-            
+            while True:
+                batch = await storage_executor.run(self._next_names, listing, DELETE_BATCH_SIZE)
+                if not batch:
+                    break
+                progress.listed += len(batch)
+                if len(in_flight) >= self.delete_parallelism:
+                    _, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                in_flight.add(asyncio.create_task(self._delete_batch(batch, progress)))
+        except S3Error as e:
+            logger.error(f"Error listing files under {prefix} for deletion: {e}")
+            raise
+        finally:
+            if in_flight:
+                await asyncio.gather(*in_flight, return_exceptions=True)
+        logger.info(f"Deleted {progress.deleted} files under {prefix} ({progress.failed} failed)")
+        return progress
+    
+    def _next_names(self, listing: Iterator[Any], count: int) -> List[str]:
+        return [obj.object_name for obj in itertools.islice(listing, count) if obj.object_name]
+    
+    async def _delete_batch(self, names: List[str], progress: DeletionProgress) -> None:
+        try:
+            errors = await storage_executor.run(self._remove_objects, names)
         except S3Error as e:
-            logger.error(f"Error listing files for deletion: {e}")
-            return 0
+            logger.error(f"Error deleting {len(names)} files: {e}")
+            progress.record(0, [(name, str(e)) for name in names])
+            return
+        progress.record(len(names) - len(errors), errors)
+    
+    def _remove_objects(self, names: List[str]) -> List[tuple[str, str]]:
+        # The result is lazy: the request is only sent while it is iterated
+        errors = self.client.remove_objects(self.bucket_name, [DeleteObject(name) for name in names])
+        return [(error.name or "", error.message or error.code or "") for error in errors]
+    
+    async def delete_post_media(self, user_id: int, post_id: int, progress: DeletionProgress | None = None) -> int:
+        """
+        Delete the files stored under a post's own prefix (uploads from before originals
+        were content-addressed, and their renditions). Shared blobs live elsewhere and
+        are only deleted when released by their last media item. Returns count of deleted files.
+        """
+        progress = progress or DeletionProgress()
+        deleted_before = progress.deleted
+        await self.delete_prefix(f"users/{user_id}/posts/{post_id}/", progress)
+        return progress.deleted - deleted_before
+    
+    async def delete_user_media(self, user_id: int, progress: DeletionProgress | None = None) -> int:
+        """
+        Delete the files stored under a user's own prefix. As with posts, shared blobs
+        are left to reference counting. Returns count of deleted files.
+        """
+        progress = progress or DeletionProgress()
+        deleted_before = progress.deleted
+        await self.delete_prefix(f"users/{user_id}/", progress)
+        return progress.deleted - deleted_before
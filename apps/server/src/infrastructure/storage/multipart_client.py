@@ -0,0 +1,50 @@
+from datetime import datetime
+from typing import List
+from minio import Minio
+from minio.datatypes import Part
+
+class MultipartClient:
+    """
+    The S3 multipart upload calls of a MinIO client, for uploads whose parts arrive in
+    separate requests.
+
+    The minio package only exposes multipart uploads through put_object, which needs the
+    whole stream in one call, so this uses its underscore methods. They are not part of
+    its public API and may change in any release: requirements.txt pins minio==7.2.16,
+    and these signatures must be checked against the new version before that pin is
+    changed. Nothing else should call them.
+    """
+
+    def __init__(self, client: Minio):
+        self.client = client
+
+    def create(self, bucket_name: str, object_name: str, content_type: str) -> str:
+        """Start a multipart upload and return its id"""
+        return self.client._create_multipart_upload(bucket_name, object_name, {"Content-Type": content_type})
+
+    def upload_part(self, bucket_name: str, object_name: str, upload_id: str, part_number: int, data: bytes) -> str:
+        """Store one part and return its ETag"""
+        return self.client._upload_part(bucket_name, object_name, data, None, upload_id, part_number)
+
+    def complete(self, bucket_name: str, object_name: str, upload_id: str, parts: List[tuple[int, str]]) -> str | None:
+        """Assemble the object from its (part number, ETag) parts and return the object's ETag"""
+        result = self.client._complete_multipart_upload(
+            bucket_name, object_name, upload_id, [Part(part_number, etag) for part_number, etag in parts]
+        )
+        return result.etag
+
+    def abort(self, bucket_name: str, object_name: str, upload_id: str) -> None:
+        self.client._abort_multipart_upload(bucket_name, object_name, upload_id)
+
+    def list(self, bucket_name: str, prefix: str) -> List[tuple[str, str, datetime | None]]:
+        """(object name, upload id, initiated) of the unfinished uploads under `prefix`, across all pages"""
+        uploads = []
+        key_marker = upload_id_marker = None
+        while True:
+            result = self.client._list_multipart_uploads(
+                bucket_name, prefix=prefix, key_marker=key_marker, upload_id_marker=upload_id_marker
+            )
+            uploads += [(upload.object_name, upload.upload_id, upload.initiated_time) for upload in result.uploads]
+            if not result.is_truncated:
+                return uploads
+            key_marker, upload_id_marker = result.next_key_marker, result.next_upload_id_marker
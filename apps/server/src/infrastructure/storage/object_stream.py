@@ -0,0 +1,128 @@
+import asyncio
+from typing import Any
+from src.utils.env import get_optional_env_var
+from src.infrastructure.storage.storage_executor import StorageExecutor
+from src.infrastructure.cache.media_disk_cache import CacheFill
+
+# Bytes read from storage per chunk when streaming an object to a client
+STREAM_CHUNK_SIZE = int(get_optional_env_var("MEDIA_STREAM_CHUNK_BYTES", str(64 * 1024)))
+
+class DownloadStats:
+    """Counters of object streams, changed on the event loop only"""
+
+    def __init__(self):
+        self.opened = 0
+        self.completed = 0
+        self.aborted = 0
+        self.bytes_sent = 0
+
+    def stats(self) -> dict:
+        return {
+            "chunk_size": STREAM_CHUNK_SIZE,
+            "open": self.opened - self.completed - self.aborted,
+            "completed": self.completed,
+            "aborted": self.aborted,
+            "bytes_sent": self.bytes_sent
+        }
+
+
+class ObjectStream:
+    """
+    Async iterator over a storage response that always gives its connection back.
+
+    Chunks are read in the download pool one ahead of the consumer: the next chunk is
+    fetched while the current one is sent, and nothing more is read until it is taken,
+    so a slow client slows the storage read instead of growing a buffer. The response
+    is released when it has been read to the end or when the stream is closed early
+    (`aclose`, e.g. on client disconnect); a read still running in a thread at that
+    point releases it when it returns, so the connection is never used concurrently.
+
+    With a `fill`, each chunk is also written to the disk cache by the thread that
+    read it; the entry is kept only if the object was read to the end.
+    """
+
+    def __init__(self, response: Any, chunk_size: int | None = None, fill: CacheFill | None = None):
+        self._response = response
+        self._chunks = response.stream(chunk_size or STREAM_CHUNK_SIZE)
+        self._fill = fill
+        self._next: asyncio.Future | None = None
+        self._closed = False
+        self._released = False
+        download_stats.opened += 1
+
+    def __aiter__(self) -> "ObjectStream":
+        return self
+
+    async def __anext__(self) -> bytes:
+        if self._closed:
+            raise StopAsyncIteration
+        read = self._next or self._read()
+        self._next = None
+        try:
+            # Shielded so a cancelled consumer leaves the read to finish before release
+            chunk = await asyncio.shield(read)
+        except BaseException:
+            self._next = read
+            await self.aclose()
+            raise
+        if chunk is None:
+            self._closed = True
+            self._release(completed=True)
+            raise StopAsyncIteration
+        self._next = self._read()
+        download_stats.bytes_sent += len(chunk)
+        return chunk
+
+    def _read(self) -> asyncio.Future:
+        return asyncio.ensure_future(download_executor.run(self._next_chunk))
+
+    def _next_chunk(self) -> bytes | None:
+        chunk = next(self._chunks, None)
+        if chunk is not None and self._fill is not None:
+            self._fill.write(chunk)
+        return chunk
+
+    async def aclose(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        read, self._next = self._next, None
+        if read is not None and not read.done():
+            read.add_done_callback(self._release_after_read)
+        else:
+            if read is not None and not read.cancelled():
+                read.exception()
+            self._release(completed=False)
+
+    def _release_after_read(self, read: asyncio.Future) -> None:
+        if not read.cancelled():
+            # Mark the exception of an abandoned read as retrieved
+            read.exception()
+        self._release(completed=False)
+
+    def _release(self, completed: bool) -> None:
+        if self._released:
+            return
+        self._released = True
+        if self._fill is not None:
+            if completed:
+                self._fill.commit()
+            else:
+                self._fill.abort()
+        if completed:
+            download_stats.completed += 1
+        else:
+            download_stats.aborted += 1
+            # A partly read body cannot be reused; drop the connection before returning it
+            self._response.close()
+        self._response.release_conn()
+
+
+# Create singleton instances shared by every object stream
+download_stats = DownloadStats()
+# Chunk reads are short but wait on the network, so they get their own pool and never
+# queue behind the storage calls of other requests
+download_executor = StorageExecutor(
+    max_workers=int(get_optional_env_var("DOWNLOAD_MAX_WORKERS", "16")),
+    max_pending=int(get_optional_env_var("DOWNLOAD_MAX_PENDING", "256"))
+)
@@ -0,0 +1,85 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+from src.utils.env import get_optional_env_var
+
+T = TypeVar("T")
+
+class StorageExecutor:
+    """
+    Dedicated, bounded thread pool for blocking object storage calls.
+
+    The minio client is synchronous; running its calls here keeps them off the
+    event loop and out of the default executor used by the rest of the app.
+    At most `max_pending` calls may be submitted at once, further callers wait
+    (backpressure) instead of growing an unbounded executor queue.
+    Counters touched by worker threads are guarded by a lock; the others are
+    only changed on the event loop.
+    """
+
+    def __init__(self, max_workers: int | None = None, max_pending: int | None = None):
+        self.max_workers = max_workers or int(get_optional_env_var("STORAGE_MAX_WORKERS", "8"))
+        self.max_pending = max_pending or int(get_optional_env_var("STORAGE_MAX_PENDING", "64"))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="storage")
+        self._slots = asyncio.Semaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.pending = 0
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.saturated_events = 0
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a blocking call in the storage pool and await its result"""
+        if self._slots.locked():
+            self.saturated_events += 1
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._call, fn, args, kwargs)
+        finally:
+            self.pending -= 1
+            self._slots.release()
+
+    def _call(self, fn: Callable[..., T], args: tuple, kwargs: dict) -> T:
+        with self._lock:
+            self.active += 1
+        try:
+            result = fn(*args, **kwargs)
+            with self._lock:
+                self.completed += 1
+            return result
+        except BaseException:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            active = self.active
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "active": active,
+            "queued": max(self.pending - active, 0),
+            "waiting_for_slot": self.waiting,
+            "saturated_events": self.saturated_events,
+            "completed": self.completed,
+            "failed": self.failed,
+            "utilization": active / self.max_workers
+        }
+
+
+# Create singleton instance shared by every MediaStorageService
+storage_executor = StorageExecutor()
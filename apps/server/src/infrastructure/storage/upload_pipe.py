@@ -0,0 +1,131 @@
+import asyncio
+import threading
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from src.utils.env import get_optional_env_var
+from src.infrastructure.storage.storage_executor import StorageExecutor
+
+# Smallest part size S3/MinIO accepts for multipart uploads; minio buffers one part per upload
+UPLOAD_PART_SIZE = 5 * 1024 * 1024
+# Bytes a pipe may hold between the request body and the storage thread
+UPLOAD_PIPE_BUFFER = 1024 * 1024
+# Memory one streaming upload may hold at once
+UPLOAD_MEMORY_PER_STREAM = UPLOAD_PART_SIZE + UPLOAD_PIPE_BUFFER
+
+
+class UploadPipe:
+    """
+    Bounded byte pipe from the event loop (request body) to a storage thread.
+
+    `write` is awaited on the event loop and waits while the buffer is full, so a
+    slow object store throttles how fast the request body is read. `read` is a
+    blocking file-like read used by the minio client in a worker thread.
+    """
+
+    def __init__(self, max_buffered: int = UPLOAD_PIPE_BUFFER):
+        self.max_buffered = max_buffered
+        self._loop = asyncio.get_running_loop()
+        self._chunks: deque[bytes] = deque()
+        self._buffered = 0
+        self._closed = False
+        self._error: BaseException | None = None
+        self._condition = threading.Condition()
+        self._space = asyncio.Event()
+        self._space.set()
+
+    async def write(self, data: bytes) -> None:
+        if not data:
+            return
+        while True:
+            with self._condition:
+                if self._error is not None:
+                    raise self._error
+                if self._buffered < self.max_buffered:
+                    self._chunks.append(data)
+                    self._buffered += len(data)
+                    self._condition.notify()
+                    return
+                self._space.clear()
+            await self._space.wait()
+
+    def close(self, error: BaseException | None = None) -> None:
+        """Signal end of data, or abort the reader with `error`"""
+        with self._condition:
+            self._closed = True
+            if error is not None:
+                self._error = error
+            self._condition.notify_all()
+        self._loop.call_soon_threadsafe(self._space.set)
+
+    def read(self, size: int = -1) -> bytes:
+        with self._condition:
+            while not self._chunks and not self._closed:
+                self._condition.wait()
+            if self._error is not None:
+                raise self._error
+            parts = []
+            taken = 0
+            while self._chunks and (size < 0 or taken < size):
+                chunk = self._chunks.popleft()
+                if size >= 0 and taken + len(chunk) > size:
+                    keep = size - taken
+                    self._chunks.appendleft(chunk[keep:])
+                    chunk = chunk[:keep]
+                parts.append(chunk)
+                taken += len(chunk)
+            self._buffered -= taken
+        self._loop.call_soon_threadsafe(self._space.set)
+        return b"".join(parts)
+
+
+class UploadMemoryBudget:
+    """
+    Global cap on memory held by in-flight streaming uploads.
+    Uploads reserve their share before reading the request body and wait when
+    the budget is exhausted, which pushes back on clients instead of exhausting RAM.
+    """
+
+    def __init__(self, total_bytes: int | None = None):
+        self.total_bytes = total_bytes or int(get_optional_env_var("UPLOAD_MEMORY_BUDGET_BYTES", str(48 * 1024 * 1024)))
+        self.reserved_bytes = 0
+        self.waiting = 0
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def reserve(self, size: int) -> AsyncIterator[None]:
+        size = min(size, self.total_bytes)
+        async with self._condition:
+            self.waiting += 1
+            try:
+                await self._condition.wait_for(lambda: self.reserved_bytes + size <= self.total_bytes)
+            finally:
+                self.waiting -= 1
+            self.reserved_bytes += size
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.reserved_bytes -= size
+                self._condition.notify_all()
+
+    @property
+    def max_concurrent_uploads(self) -> int:
+        return max(self.total_bytes // UPLOAD_MEMORY_PER_STREAM, 1)
+
+    def stats(self) -> dict:
+        return {
+            "total_bytes": self.total_bytes,
+            "reserved_bytes": self.reserved_bytes,
+            "waiting_uploads": self.waiting
+        }
+
+
+# Create singleton instances shared by every upload request
+upload_memory_budget = UploadMemoryBudget()
+# Streaming uploads hold a thread for as long as the client sends, so they get their
+# own pool sized by the budget and never starve the shared storage pool
+upload_executor = StorageExecutor(
+    max_workers=upload_memory_budget.max_concurrent_uploads,
+    max_pending=upload_memory_budget.max_concurrent_uploads
+)
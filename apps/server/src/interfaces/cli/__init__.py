@@ -0,0 +1 @@
+# Makes cli a package
@@ -0,0 +1,21 @@
+"""
+Record the BlurHash and dominant colour of photos uploaded before placeholders were
+computed with their renditions. Safe to re-run: only photos without a placeholder
+are read, from their thumbnail where one exists.
+
+Usage: python -m src.interfaces.cli.backfill_image_placeholders
+"""
+
+import asyncio
+from src.infrastructure.database import async_session
+from src.domain.services.media_derivative_service import MediaDerivativeService
+
+
+async def main() -> None:
+    async with async_session() as session:
+        count = await MediaDerivativeService().backfill_placeholders(session)
+    print(f"Backfilled image placeholders: {count} photos")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,21 @@
+"""
+Record size, content type, ETag, checksum, dimensions and duration of media items
+uploaded before this metadata was captured at ingest. Safe to re-run: only items
+without a recorded size are read.
+
+Usage: python -m src.interfaces.cli.backfill_media_metadata
+"""
+
+import asyncio
+from src.infrastructure.database import async_session
+from src.domain.services.media_item_service import MediaItemService
+
+
+async def main() -> None:
+    async with async_session() as session:
+        count = await MediaItemService().backfill_media_metadata(session)
+    print(f"Backfilled media metadata: {count} media items")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,19 @@
+"""
+Recompute the ContactFeedEntry read model from the audience link tables.
+
+Usage: python -m src.interfaces.cli.rebuild_contact_feed
+"""
+
+import asyncio
+from src.infrastructure.database import async_session
+from src.infrastructure.repositories.contact_feed_repository import ContactFeedRepository
+
+
+async def main() -> None:
+    async with async_session() as session:
+        count = await ContactFeedRepository().rebuild_all(session)
+    print(f"Rebuilt contact feeds: {count} entries")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
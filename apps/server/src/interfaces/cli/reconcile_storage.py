@@ -0,0 +1,38 @@
+"""
+Find objects in the bucket no database row refers to, and media items, renditions
+and blobs whose object is missing. Reports by default; --repair also deletes the
+orphaned objects and fixes the rows. Interrupted runs resume from --checkpoint.
+
+Usage: python -m src.interfaces.cli.reconcile_storage [--repair] [--checkpoint FILE]
+           [--rate OBJECTS_PER_SECOND] [--min-age-hours HOURS]
+"""
+
+import argparse
+import asyncio
+import json
+from dataclasses import asdict
+from datetime import timedelta
+from src.infrastructure.database import async_session
+from src.domain.services.storage_reconciliation_service import StorageReconciliationService
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Reconcile the media bucket with the database")
+    parser.add_argument("--repair", action="store_true", help="delete orphans and fix rows instead of only reporting")
+    parser.add_argument("--checkpoint", help="file to save progress to and resume from")
+    parser.add_argument("--rate", type=float, default=1000, help="most objects listed per second")
+    parser.add_argument("--min-age-hours", type=float, default=24, help="skip unreferenced objects newer than this")
+    args = parser.parse_args()
+
+    report = await StorageReconciliationService().reconcile(
+        async_session,
+        repair=args.repair,
+        checkpoint_path=args.checkpoint,
+        max_objects_per_second=args.rate,
+        min_age=timedelta(hours=args.min_age_hours)
+    )
+    print(json.dumps(asdict(report), indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
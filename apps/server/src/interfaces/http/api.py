@@ -1,16 +1,22 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse
 from contextlib import asynccontextmanager
 from sqlmodel import SQLModel
-from src.infrastructure.database import engine
+from src.infrastructure.database import engine, async_session, add_missing_columns, add_missing_indexes
+from src.domain.services.auth.authorization_service import AuthorizationService
+from src.infrastructure.repositories.contact_feed_repository import ContactFeedRepository
+from src.infrastructure.notifications.sms_client import sms_client
+from src.infrastructure.cache.media_disk_cache import media_disk_cache
 from src.utils.env import get_env_var
-from .posts import router as posts_router
+from .posts import router as posts_router, notification_dispatcher
 from .audiences import router as audiences_router
 from .contacts import router as contacts_router
-from .media_items import router as media_items_router
+from .media_items import router as media_items_router, upload_session_service
 from .auth import router as auth_router
 from .frontend import router as frontend_router
+from .metrics import router as metrics_router
 
 # Import all models to ensure they're included in metadata
 from src.domain.models.post import Post
@@ -18,14 +24,37 @@ from src.domain.models.user import User
 from src.domain.models.audience import Audience
 from src.domain.models.contact import Contact
 from src.domain.models.media_item import MediaItem
+from src.domain.models.media_blob import MediaBlob
+from src.domain.models.upload_session import UploadSession, UploadSessionPart
 from src.domain.models.links.audience_contact_link import AudienceContactLink
 from src.domain.models.links.post_audience_link import PostAudienceLink
+from src.domain.models.contact_feed_entry import ContactFeedEntry
+from src.domain.models.notification_job import NotificationJob
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     async with engine.begin() as conn:
         await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
+        await conn.run_sync(add_missing_indexes)
+    # Fill contact feeds for posts the feed table does not cover yet
+    async with async_session() as session:
+        await ContactFeedRepository().backfill_missing(session)
+    # Start the media cache, removing the files a previous run left
+    media_disk_cache.start()
+    # Warm the in-memory access index used by media streaming
+    async with async_session() as session:
+        await AuthorizationService().load_access_index(session)
+    # Abort resumable uploads that were abandoned
+    upload_session_collector = asyncio.create_task(upload_session_service.collect_periodically(async_session))
+    # Send queued notifications, including those left behind by a restart
+    notification_dispatch = asyncio.create_task(notification_dispatcher.run_periodically(async_session))
     yield
+    upload_session_collector.cancel()
+    notification_dispatch.cancel()
+    # Let both loops unwind before the SMS client they may be using is closed
+    await asyncio.gather(upload_session_collector, notification_dispatch, return_exceptions=True)
+    await sms_client.aclose()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -51,6 +80,7 @@ app.include_router(audiences_router)
 app.include_router(contacts_router)
 app.include_router(media_items_router)
 app.include_router(frontend_router)
+app.include_router(metrics_router)
 
 @app.get("/", response_class=HTMLResponse)
 async def home():
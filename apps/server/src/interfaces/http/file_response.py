@@ -0,0 +1,68 @@
+from typing import AsyncIterator, Mapping
+from starlette.background import BackgroundTask
+from starlette.concurrency import iterate_in_threadpool
+from starlette.responses import Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
+from src.infrastructure.cache.media_disk_cache import CachedFile
+
+# Read size when the server cannot send the file itself
+CACHED_FILE_CHUNK_SIZE = 256 * 1024
+
+class CachedFileResponse(Response):
+    """
+    Send (a range of) a locally cached file.
+    Uses the ASGI `http.response.zerocopy` extension (sendfile) when the server
+    offers it, otherwise reads the file in large chunks off the event loop.
+    The handle is already open, so eviction of the cache entry cannot break it.
+    """
+
+    def __init__(self, cached_file: CachedFile, status_code: int = 200,
+                 headers: Mapping[str, str] | None = None, media_type: str | None = None,
+                 background: BackgroundTask | None = None):
+        self.cached_file = cached_file
+        self.status_code = status_code
+        self.media_type = media_type or cached_file.content_type
+        self.background = background
+        self.body = b""
+        self.init_headers(headers)
+        self.headers["content-length"] = str(cached_file.length)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            if scope["method"].upper() == "HEAD":
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+            elif "http.response.zerocopy" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopy",
+                    "file": self.cached_file.file,
+                    "offset": self.cached_file.offset,
+                    "count": self.cached_file.length,
+                    "more_body": False
+                })
+            else:
+                async for chunk in iterate_in_threadpool(self.cached_file.stream(CACHED_FILE_CHUNK_SIZE)):
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            self.cached_file.close()
+        if self.background is not None:
+            await self.background()
+
+
+class ObjectStreamResponse(StreamingResponse):
+    """
+    Stream a body read from object storage. The body is closed however the response
+    ends, including when the client disconnects mid-stream, so the storage
+    connections behind it always return to their pool.
+    """
+
+    body_iterator: AsyncIterator[bytes]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            aclose = getattr(self.body_iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
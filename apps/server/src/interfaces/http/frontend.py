@@ -1,17 +1,28 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel.ext.asyncio.session import AsyncSession
-from src.domain.services.auth.view_service import ViewService
+from src.domain.services.auth.view_service import ViewService, DEFAULT_FEED_PAGE_SIZE
+from src.domain.errors.custom_errors import InvalidCursorError
+from src.domain.models.media_item import MediaSize
 from src.infrastructure.database import get_session
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 router = APIRouter(prefix="/frontend", tags=["frontend"])
 view_service = ViewService()
 
+MAX_FEED_PAGE_SIZE = 100
+
 class MediaItemResponse(BaseModel):
     id: int
     type: str
     url: str
+    # Display size recorded at upload, so clients can lay out media before it loads
+    width: Optional[int] = None
+    height: Optional[int] = None
+    duration_seconds: Optional[float] = None
+    # Placeholder painted until the photo arrives, so first paint needs no media request
+    blurhash: Optional[str] = None
+    dominant_color: Optional[str] = None
 
 class PostViewResponse(BaseModel):
     post_id: int
@@ -22,22 +33,37 @@ class PostViewResponse(BaseModel):
 
 class UserPostsResponse(BaseModel):
     posts: List[PostViewResponse]
+    # Pass as `cursor` to fetch the next (older) page; None on the last page
+    next_cursor: str | None = None
+    # Pass as `since` on a later visit to fetch only newer posts
+    latest_cursor: str | None = None
 
 @router.get("/view", response_model=PostViewResponse | UserPostsResponse)
 async def view_with_token(
     token: str = Query(...), 
     post_id: int | None = Query(None),
+    cursor: str | None = Query(None),
+    since: str | None = Query(None),
+    limit: int = Query(DEFAULT_FEED_PAGE_SIZE, ge=1, le=MAX_FEED_PAGE_SIZE),
+    size: MediaSize | None = Query(None),
     session: AsyncSession = Depends(get_session)
 ):
-    """View a specific post or all user posts using an authenticated token"""
+    """
+    View a specific post or a page of the contact's feed using an authenticated token.
+    `size` selects the photo rendition the media URLs point at.
+    """
     try:
-        result = await view_service.get_view_data_for_token(token, post_id, session)
+        result = await view_service.get_view_data_for_token(
+            token, post_id, session, cursor=cursor, since=since, limit=limit, size=size
+        )
         
         # Check if it's a single post or multiple posts
         if "post_id" in result:
             return PostViewResponse(**result)
         else:
             return UserPostsResponse(**result)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=401, detail=str(e))
     except PermissionError as e:
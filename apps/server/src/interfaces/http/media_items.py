@@ -1,19 +1,46 @@
-from fastapi import APIRouter, Depends, status, HTTPException, UploadFile, File, Form, Query
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, status, HTTPException, Query, Request
+from fastapi.responses import Response
+from starlette.concurrency import iterate_in_threadpool
 from sqlmodel.ext.asyncio.session import AsyncSession
 from pydantic import BaseModel
 from sqlalchemy.exc import IntegrityError
-from src.domain.models.media_item import MediaItem, MediaType
+from src.domain.models.media_item import MediaItem, MediaMetadata, MediaType, MediaSize
 from src.domain.models.user import User
+from src.domain.models.media_blob import MediaBlob
 from src.domain.services.media_item_service import MediaItemService
+from src.domain.services.media_derivative_service import MediaDerivativeService
+from src.domain.services.media_blob_service import MediaBlobService
+from src.domain.services.upload_session_service import UploadSessionService
 from src.domain.services.post_service import PostService
 from src.domain.services.auth.authorization_service import AuthorizationService
-from src.domain.errors.custom_errors import MediaItemNotFoundError, PostNotFoundError
-from src.infrastructure.database import get_session
-from src.infrastructure.storage.media_storage_service import MediaStorageService
+from src.domain.errors.custom_errors import (
+    MediaItemNotFoundError, PostNotFoundError, PostNotOwnedError, FileTooLargeError, RangeNotSatisfiableError,
+    UploadSessionNotFoundError, UploadIncompleteError, ChecksumMismatchError, BlobPathNotAllowedError
+)
+from src.domain.models.upload_session import UploadSession, UploadSessionPart
+from src.infrastructure.database import get_session, async_session
+from src.infrastructure.storage.media_storage_service import MediaStorageService, FileInfo
+from src.infrastructure.storage.upload_pipe import UploadPipe, upload_memory_budget, UPLOAD_MEMORY_PER_STREAM
+from src.infrastructure.auth.media_url_signer import MediaUrlSigner
+from src.infrastructure.cache.media_disk_cache import CachedFile
+from src.infrastructure.imaging.media_probe import MediaProbe
+from src.interfaces.http.file_response import CachedFileResponse, ObjectStreamResponse
+from src.infrastructure.storage.object_stream import STREAM_CHUNK_SIZE
+from src.infrastructure.storage.deletion_jobs import deletion_jobs
 from src.infrastructure.auth.dependencies import current_active_user, optional_current_user, get_user_from_view_token
-from typing import Sequence, List, Optional
+from src.interfaces.http.multipart_stream import MultipartStream, FormField, FileStart, FileChunk, FileEnd
+from src.utils.http_range import ByteRange, parse_range_header, if_range_matches
+from src.utils.content_negotiation import explicitly_accepted
+from src.utils.http_cache import immutable_cache_control, media_entity_tag, if_none_match_matches
+from src.infrastructure.imaging.derivatives import derivative_path
+from minio.error import S3Error
+from email.utils import format_datetime
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Sequence, List, Optional
+import asyncio
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -35,10 +62,36 @@ class MediaItemUpdateRequest(BaseModel):
     type: MediaType | None = None
     order: int | None = None
 
+class DirectUploadCreateRequest(BaseModel):
+    post_id: int
+    file_name: str
+    content_type: str
+    size_bytes: int
+    # Hex SHA-256 of the file, verified before the media item is created
+    sha256: str
+    order: int = 0
+
+class UploadSessionCreateRequest(BaseModel):
+    post_id: int
+    file_name: str
+    content_type: str
+    size_bytes: int
+    order: int = 0
+    # Hex SHA-256 of the whole file, verified when the session is completed
+    sha256: str | None = None
+
 media_item_service = MediaItemService()
 media_storage_service = MediaStorageService()
+media_derivative_service = MediaDerivativeService()
+media_blob_service = MediaBlobService(media_storage_service=media_storage_service)
+upload_session_service = UploadSessionService(
+    media_storage_service=media_storage_service,
+    media_item_service=media_item_service,
+    media_blob_service=media_blob_service
+)
 post_service = PostService()
 authorization_service = AuthorizationService()
+media_url_signer = MediaUrlSigner()
 
 @router.get("/", response_model=Sequence[MediaItem], dependencies=[Depends(current_active_user)])
 async def get_media_items(post_id: int | None = None, session: AsyncSession = Depends(get_session)):
@@ -49,6 +102,19 @@ async def get_media_items(post_id: int | None = None, session: AsyncSession = De
             raise HTTPException(status_code=404, detail=str(e))
     raise HTTPException(status_code=400, detail="post_id query parameter is required")
 
+@router.get("/deletions")
+async def get_deletion_jobs(user: User = Depends(current_active_user)):
+    """Progress of the current user's recent background media deletions"""
+    return [job.to_dict() for job in deletion_jobs.for_owner(user.id)]
+
+@router.get("/deletions/{job_id}")
+async def get_deletion_job(job_id: str, user: User = Depends(current_active_user)):
+    """Progress and failures of one background media deletion"""
+    job = deletion_jobs.get(job_id)
+    if not job or (job.owner_id != user.id and not user.is_superuser):
+        raise HTTPException(status_code=404, detail="Deletion job not found")
+    return job.to_dict()
+
 @router.get("/{media_item_id}", response_model=MediaItem, dependencies=[Depends(current_active_user)])
 async def get_media_item(media_item_id: int, session: AsyncSession = Depends(get_session)):
     media_item = await media_item_service.get_media_item_by_id(media_item_id, session)
@@ -59,7 +125,7 @@ async def get_media_item(media_item_id: int, session: AsyncSession = Depends(get
 @router.post("/", response_model=MediaItem, status_code=status.HTTP_201_CREATED, dependencies=[Depends(current_active_user)])
 async def create_media_item(media_item: MediaItemCreateRequest, session: AsyncSession = Depends(get_session)):
     try:
-        return await media_item_service.create_media_item(
+        return await media_item_service.create_media_item_for_path(
             media_item.post_id, 
             media_item.path, 
             media_item.type, 
@@ -68,6 +134,8 @@ async def create_media_item(media_item: MediaItemCreateRequest, session: AsyncSe
         )
     except PostNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except BlobPathNotAllowedError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except IntegrityError as e:
         raise HTTPException(status_code=400, detail="Database constraint violation. Please check your data.")
     except Exception as e:
@@ -85,6 +153,8 @@ async def update_media_item(media_item_id: int, media_item: MediaItemUpdateReque
         )
     except MediaItemNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except BlobPathNotAllowedError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.delete("/{media_item_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(current_active_user)])
 async def delete_media_item(media_item_id: int, session: AsyncSession = Depends(get_session)):
@@ -93,85 +163,378 @@ async def delete_media_item(media_item_id: int, session: AsyncSession = Depends(
     except MediaItemNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
-@router.post("/upload", response_model=MediaItem, status_code=status.HTTP_201_CREATED, dependencies=[Depends(current_active_user)])
-async def upload_media_file(
-    post_id: int = Form(...),
-    order: int = Form(0),
-    file: UploadFile = File(...),
-    session: AsyncSession = Depends(get_session)
-):
+# Uploads larger than this are rejected while streaming, as soon as the limit is crossed
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+
+UPLOAD_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        "multipart/form-data": {
+            "schema": {
+                "type": "object",
+                "required": ["post_id", "file"],
+                "properties": {
+                    "post_id": {"type": "integer"},
+                    "order": {"type": "integer", "default": 0},
+                    "sha256": {"type": "string", "description": "Hex SHA-256 of the file, lets known content skip the upload"},
+                    "file": {"type": "string", "format": "binary"}
+                }
+            }
+        }
+    }
+}
+
+@dataclass
+class ReceivedUpload:
+    post_id: int
+    order: int
+    media_type: MediaType
+    # Storage path of the content-addressed original
+    path: str
+    metadata: MediaMetadata
+
+@router.post("/upload", response_model=MediaItem, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(current_active_user)], openapi_extra={"requestBody": UPLOAD_REQUEST_BODY})
+async def upload_media_file(request: Request, background_tasks: BackgroundTasks,
+                            session: AsyncSession = Depends(get_session)):
     """
-    Upload a media file and create a media item record
+    Upload a media file and create a media item record.
+    The file is piped into object storage while the request body arrives, so it is never
+    held in memory as a whole; `post_id`, `order` and `sha256` must be sent before `file`.
+    Uploads wait for a share of the global upload memory budget before the body is read.
+    Size, checksum, dimensions and duration are recorded as the file passes through.
+    Originals are stored once per content: when `sha256` names content that is already
+    stored, the body is only verified and nothing is written to storage.
+    Photo renditions are generated after the response is sent.
     """
     try:
-        # Get the post to retrieve user_id for structured storage
-        post = await post_service.get_post_by_id(post_id, session)
-        if not post:
-            raise HTTPException(status_code=404, detail=f"Post with id {post_id} not found")
-        
-        # Validate file type
-        if not file.content_type:
-            raise HTTPException(status_code=400, detail="File content type is required")
-        
-        # Determine media type based on content type
-        if file.content_type.startswith('image/'):
-            media_type = MediaType.photo
-        elif file.content_type.startswith('video/'):
-            media_type = MediaType.video
-        else:
-            raise HTTPException(status_code=400, detail="Only image and video files are supported")
-        
-        # Validate file size (10MB limit)
-        file_size = 0
-        content = await file.read()
-        file_size = len(content)
-        
-        if file_size > 10 * 1024 * 1024:  # 10MB
-            raise HTTPException(status_code=400, detail="File size must be less than 10MB")
-        
-        # Reset file pointer
-        await file.seek(0)
-        
-        # Upload file to MinIO with structured path
-        file_path = media_storage_service.upload_file(
-            file_data=file.file,
-            file_name=file.filename or "unknown",
-            content_type=file.content_type,
-            user_id=post.user_id,
-            post_id=post_id
-        )
+        async with upload_memory_budget.reserve(UPLOAD_MEMORY_PER_STREAM):
+            upload = await _receive_upload(request, session)
         
         # Create media item record
-        media_item = await media_item_service.create_media_item(
-            post_id=post_id,
-            path=file_path,
-            media_type=media_type,
-            order=order,
-            session=session
-        )
+        try:
+            media_item = await media_item_service.create_media_item(
+                post_id=upload.post_id,
+                path=upload.path,
+                media_type=upload.media_type,
+                order=upload.order,
+                session=session,
+                metadata=upload.metadata
+            )
+        except BaseException:
+            await session.rollback()
+            await media_blob_service.release(upload.path, [], session)
+            raise
         
-        logger.info(f"Uploaded media file: {file_path} for post {post_id}")
+        if media_item.type == MediaType.photo and media_item.id is not None:
+            background_tasks.add_task(_generate_derivatives, media_item.id)
+        
+        logger.info(f"Uploaded media file: {upload.path} for post {upload.post_id}")
         return media_item
         
     except PostNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error uploading file: {e}")
         raise HTTPException(status_code=500, detail="Failed to upload file")
 
+def _upload_session_response(upload_session: UploadSession, parts: Sequence[UploadSessionPart]) -> dict:
+    return {
+        "id": upload_session.id,
+        "post_id": upload_session.post_id,
+        "order": upload_session.order,
+        "file_name": upload_session.file_name,
+        "content_type": upload_session.content_type,
+        "size_bytes": upload_session.size_bytes,
+        "part_size": upload_session.part_size,
+        "part_count": upload_session_service.part_count(upload_session),
+        "received_parts": [part.part_number for part in parts],
+        "received_bytes": sum(part.size_bytes for part in parts),
+        "updated_at": upload_session.updated_at
+    }
+
+@router.post("/upload-sessions", status_code=status.HTTP_201_CREATED)
+async def create_upload_session(request: UploadSessionCreateRequest, user: User = Depends(current_active_user),
+                                session: AsyncSession = Depends(get_session)):
+    """
+    Start a resumable upload of a large file. The client then sends each part with
+    PUT /upload-sessions/{id}/parts/{n} (`part_size` bytes, the last part the rest),
+    in any order and again if a request fails, and completes the session to create the
+    media item. After an interruption GET /upload-sessions/{id} lists the parts received.
+    """
+    _media_type_for(request.content_type)
+    try:
+        upload_session = await upload_session_service.create_session(
+            user.id, request.post_id, request.file_name, request.content_type, request.size_bytes, session,
+            order=request.order, sha256=request.sha256
+        )
+    except PostNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except PostNotOwnedError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except (FileTooLargeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _upload_session_response(upload_session, [])
+
+@router.post("/direct-uploads", status_code=status.HTTP_201_CREATED)
+async def create_direct_upload(request: DirectUploadCreateRequest, user: User = Depends(current_active_user),
+                               session: AsyncSession = Depends(get_session)):
+    """
+    Start an upload that goes straight to storage instead of through this server. The
+    client PUTs the file to `url` with the given headers, then completes it with
+    POST /upload-sessions/{id}/complete, which checks the stored file's size, content
+    type and sha256 before creating the media item.
+    """
+    _media_type_for(request.content_type)
+    try:
+        upload_session, url = await upload_session_service.create_direct_upload(
+            user.id, request.post_id, request.file_name, request.content_type, request.size_bytes,
+            request.sha256, session, order=request.order
+        )
+    except PostNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except PostNotOwnedError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except (FileTooLargeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        **_upload_session_response(upload_session, []),
+        "url": url,
+        "method": "PUT",
+        "headers": {"Content-Type": upload_session.content_type}
+    }
+
+@router.get("/upload-sessions/{session_id}")
+async def get_upload_session(session_id: str, user: User = Depends(current_active_user),
+                             session: AsyncSession = Depends(get_session)):
+    """State of an upload session, with the parts received so far"""
+    upload_session = await _get_upload_session(session_id, user, session)
+    return _upload_session_response(upload_session, await upload_session_service.get_parts(upload_session, session))
+
+@router.put("/upload-sessions/{session_id}/parts/{part_number}")
+async def upload_session_part(session_id: str, part_number: int, request: Request,
+                              user: User = Depends(current_active_user), session: AsyncSession = Depends(get_session)):
+    """
+    Store part `part_number` (from 1) of an upload session, sent as the raw request body.
+    Sending a part again replaces it. The part is held in memory until stored, within
+    the global upload memory budget.
+    """
+    upload_session = await _get_upload_session(session_id, user, session)
+    try:
+        length = upload_session_service.part_length(upload_session, part_number)
+        async with upload_memory_budget.reserve(length):
+            data = await _read_part(request, length)
+            part = await upload_session_service.upload_part(upload_session, part_number, data, session)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"part_number": part.part_number, "size_bytes": part.size_bytes, "etag": part.etag}
+
+@router.post("/upload-sessions/{session_id}/complete", response_model=MediaItem, status_code=status.HTTP_201_CREATED)
+async def complete_upload_session(session_id: str, background_tasks: BackgroundTasks,
+                                  user: User = Depends(current_active_user),
+                                  session: AsyncSession = Depends(get_session)):
+    """Create the media item of an upload session once its file is in storage"""
+    upload_session = await _get_upload_session(session_id, user, session)
+    try:
+        media_item = await upload_session_service.complete(
+            upload_session, _media_type_for(upload_session.content_type), session
+        )
+    except UploadIncompleteError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except (ChecksumMismatchError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except PostNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if media_item.type == MediaType.photo and media_item.id is not None:
+        background_tasks.add_task(_generate_derivatives, media_item.id)
+    return media_item
+
+@router.delete("/upload-sessions/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def abort_upload_session(session_id: str, user: User = Depends(current_active_user),
+                               session: AsyncSession = Depends(get_session)):
+    """Cancel an upload session and drop the parts stored so far"""
+    upload_session = await _get_upload_session(session_id, user, session)
+    await upload_session_service.abort(upload_session, session)
+
+async def _get_upload_session(session_id: str, user: User, session: AsyncSession) -> UploadSession:
+    try:
+        return await upload_session_service.get_session(session_id, user.id, session)
+    except UploadSessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+async def _read_part(request: Request, length: int) -> bytes:
+    """Read a request body that must be exactly `length` bytes, stopping as soon as it is longer"""
+    data = bytearray()
+    async for chunk in request.stream():
+        data += chunk
+        if len(data) > length:
+            raise ValueError(f"Part must be {length} bytes")
+    return bytes(data)
+
+async def _generate_derivatives(media_item_id: int) -> None:
+    """Produce the photo renditions of a new upload in its own session"""
+    try:
+        async with async_session() as session:
+            await media_derivative_service.generate_for_media_item(media_item_id, session)
+    except Exception as e:
+        # Missing renditions are generated lazily when first requested
+        logger.warning(f"Could not generate renditions of media item {media_item_id}: {e}")
+
+async def _receive_upload(request: Request, session: AsyncSession) -> ReceivedUpload:
+    """
+    Read the multipart body and stream its file part into storage, probing it on the way.
+    New content is staged and moved to its content address once its checksum is known;
+    content the client declared and that is already stored is only hashed to verify it.
+    A reference on the blob is held when this returns. On any error, including the
+    client going away, the pipe is closed with the error so the storage upload is aborted.
+    """
+    fields: dict[str, str] = {}
+    pipe: UploadPipe | None = None
+    upload_task: asyncio.Task | None = None
+    probe: MediaProbe | None = None
+    reserved: MediaBlob | None = None
+    media_type: MediaType | None = None
+    content_type = "application/octet-stream"
+    file_name = "unknown"
+    blob: MediaBlob | None = None
+    try:
+        try:
+            events = MultipartStream(request).events()
+            async for event in events:
+                if isinstance(event, FormField):
+                    fields[event.name] = event.value
+                elif isinstance(event, FileStart) and event.name == "file" and probe is None:
+                    post_id = _int_form_field(fields, "post_id")
+                    # Validate the post before accepting its file
+                    post = await post_service.get_post_by_id(post_id, session)
+                    if not post:
+                        raise HTTPException(status_code=404, detail=f"Post with id {post_id} not found")
+                    media_type = _media_type_for(event.content_type)
+                    content_type = event.content_type or content_type
+                    file_name = event.filename or file_name
+                    probe = MediaProbe(content_type)
+                    declared = fields.get("sha256", "").strip().lower()
+                    if declared:
+                        reserved = await media_blob_service.reserve(declared, session)
+                    if reserved is None:
+                        pipe = UploadPipe()
+                        upload_task = asyncio.create_task(media_storage_service.upload_stream(
+                            pipe, media_storage_service.staging_path(file_name), content_type
+                        ))
+                elif isinstance(event, FileChunk) and probe is not None and blob is None:
+                    probe.feed(event.data)
+                    if probe.size_bytes > MAX_UPLOAD_BYTES:
+                        raise FileTooLargeError(MAX_UPLOAD_BYTES)
+                    if pipe is not None:
+                        await pipe.write(event.data)
+                elif isinstance(event, FileEnd) and probe is not None and blob is None:
+                    if reserved is not None:
+                        if probe.checksum != reserved.checksum:
+                            raise HTTPException(status_code=400, detail="File does not match its sha256")
+                        blob, reserved = reserved, None
+                    elif pipe is not None and upload_task is not None:
+                        pipe.close()
+                        staged = await upload_task
+                        pipe = upload_task = None
+                        blob, _ = await media_blob_service.store_staged(
+                            staged.path, probe.checksum, file_name, probe.size_bytes, content_type, session
+                        )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        if pipe is not None or reserved is not None:
+            raise HTTPException(status_code=400, detail="Incomplete file upload")
+        if blob is None or media_type is None or probe is None:
+            raise HTTPException(status_code=422, detail="A file is required")
+        metadata = MediaMetadata(
+            size_bytes=probe.size_bytes,
+            content_type=content_type,
+            etag=blob.etag,
+            checksum=probe.checksum,
+            width=probe.width,
+            height=probe.height,
+            duration_seconds=probe.duration_seconds
+        )
+        return ReceivedUpload(
+            _int_form_field(fields, "post_id"), _int_form_field(fields, "order", 0), media_type, blob.path, metadata
+        )
+    
+    except BaseException as e:
+        if pipe is not None and upload_task is not None:
+            pipe.close(e)
+            await asyncio.gather(upload_task, return_exceptions=True)
+        held = reserved or blob
+        if held is not None:
+            await session.rollback()
+            await media_blob_service.release(held.path, [], session)
+        raise
+
+def _int_form_field(fields: dict[str, str], name: str, default: int | None = None) -> int:
+    value = fields.get(name)
+    if value is None and default is not None:
+        return default
+    try:
+        return int(value or "")
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"Form field '{name}' must be an integer sent before the file")
+
+def _media_type_for(content_type: str | None) -> MediaType:
+    # Validate file type
+    if not content_type:
+        raise HTTPException(status_code=400, detail="File content type is required")
+    
+    # Determine media type based on content type
+    if content_type.startswith('image/'):
+        return MediaType.photo
+    if content_type.startswith('video/'):
+        return MediaType.video
+    raise HTTPException(status_code=400, detail="Only image and video files are supported")
+
 @router.get("/{media_item_id}/stream")
 async def get_media_file_stream(
     media_item_id: int,
+    request: Request,
     token: Optional[str] = Query(None),
+    path: Optional[str] = Query(None),
+    viewer: Optional[str] = Query(None),
+    expires: Optional[int] = Query(None),
+    kid: Optional[str] = Query(None),
+    sig: Optional[str] = Query(None),
+    size: Optional[MediaSize] = Query(None),
     session: AsyncSession = Depends(get_session),
     auth_user: Optional[User] = Depends(optional_current_user),
     view_token_user: Optional[User] = Depends(get_user_from_view_token)
 ):
     """
     Stream a media file directly.
-    Supports both authenticated users (via JWT) and view token access (via query param or header).
+    Supports signed URLs from feed responses (verified without any database work),
+    authenticated users (via JWT) and view token access (via query param or header).
+    `Range` requests (including multi-range) are answered with 206 Partial Content.
+    `size` selects a photo rendition, generating it on first request; renditions are
+    sent as AVIF or WebP when the `Accept` header names them.
+    Objects never change at their path, so they are cached as immutable and a matching
+    `If-None-Match` is answered with 304 without reading storage.
     """
     try:
+        # Signed URLs carry the object path and are authorized by their signature alone
+        if sig:
+            if not (path and viewer and expires and kid and
+                    media_url_signer.verify(media_item_id, path, viewer, expires, kid, sig)):
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Invalid or expired media URL"
+                )
+            if size:
+                not_modified = _rendition_not_modified(path, size, request, None, shared=True)
+                if not_modified:
+                    return not_modified
+                path = await media_derivative_service.resolve_path(path, size, media_item_id, session)
+            return await _serve_media(media_item_id, path, request, shared=True)
+        
         # Check authentication - accept either regular auth or view token
         user = auth_user or view_token_user
         payload = None
@@ -221,20 +584,180 @@ async def get_media_file_stream(
                 detail="You do not have permission to access this media"
             )
         
-        # Get file stream from domain service
-        file_stream, content_type, content_length = media_item_service.get_media_item_stream(media_item.path)
-        
-        logger.info(f"Streaming media item {media_item_id}: {content_type}, {content_length} bytes")
-        
-        return StreamingResponse(
-            file_stream,
-            media_type=content_type,
-            headers={
-                "Content-Length": str(content_length),
-                "Cache-Control": "public, max-age=3600"  # Cache for 1 hour
-            }
-        )
+        file_path = media_item.path
+        if size:
+            not_modified = _rendition_not_modified(media_item.path, size, request, media_item, shared=False)
+            if not_modified:
+                return not_modified
+            file_path = await media_derivative_service.resolve_path(
+                media_item.path, size, media_item_id, session, media_item=media_item
+            )
+        return await _serve_media(media_item_id, file_path, request, media_item)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error streaming file: {e}")
         raise HTTPException(status_code=500, detail="Failed to stream file")
+
+async def _serve_media(media_item_id: int, file_path: str, request: Request,
+                       media_item: MediaItem | None = None, shared: bool = False) -> Response:
+    """
+    Serve a media object; photo renditions are sent in the smallest format the client accepts.
+    An original whose metadata was recorded on its media item is served without a stat.
+    `shared` marks responses that proxies may cache (signed URLs).
+    """
+    accepted = explicitly_accepted(request.headers.get("accept"))
+    variant, negotiated = media_derivative_service.select_variant(file_path, accepted, media_item)
+    try:
+        return await _conditional_response(media_item_id, variant, request, media_item, shared, negotiated)
+    except S3Error as e:
+        # Renditions made before a format was supported only exist as JPEG
+        if variant == file_path or e.code != "NoSuchKey":
+            raise
+        return await _conditional_response(media_item_id, file_path, request, media_item, shared, negotiated)
+
+def _cache_headers(file_path: str, media_item: MediaItem | None, shared: bool, negotiated: bool) -> tuple[str, dict]:
+    """Entity tag of the object at `file_path` and the caching headers sent with it"""
+    checksum = media_item.checksum if media_item is not None and file_path == media_item.path else None
+    etag = media_entity_tag(file_path, checksum)
+    headers = {
+        "ETag": f'"{etag}"',
+        "Cache-Control": immutable_cache_control(shared)
+    }
+    if negotiated:
+        headers["Vary"] = "Accept"
+    return etag, headers
+
+def _not_modified(request: Request, etag: str, headers: dict) -> Response | None:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and if_none_match_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return None
+
+def _rendition_not_modified(path: str, size: MediaSize, request: Request, media_item: MediaItem | None,
+                            shared: bool) -> Response | None:
+    """
+    Answer a conditional request for a rendition before resolving it. A client can only
+    hold the entity tag of a rendition that existed, and stored objects never change.
+    """
+    if not request.headers.get("if-none-match"):
+        return None
+    accepted = explicitly_accepted(request.headers.get("accept"))
+    variant, negotiated = media_derivative_service.select_variant(derivative_path(path, size.value), accepted, media_item)
+    etag, headers = _cache_headers(variant, media_item, shared, negotiated)
+    return _not_modified(request, etag, headers)
+
+async def _conditional_response(media_item_id: int, file_path: str, request: Request, media_item: MediaItem | None,
+                                shared: bool, negotiated: bool) -> Response:
+    """Answer `If-None-Match` from the entity tag alone, otherwise stream the object"""
+    etag, headers = _cache_headers(file_path, media_item, shared, negotiated)
+    not_modified = _not_modified(request, etag, headers)
+    if not_modified:
+        return not_modified
+    info = None
+    if media_item is not None and file_path == media_item.path:
+        info = media_item_service.get_stored_info(media_item)
+    return await _stream_response(media_item_id, file_path, request, etag, headers, info)
+
+async def _stream_response(media_item_id: int, file_path: str, request: Request, etag: str, headers: dict,
+                           info: FileInfo | None = None) -> Response:
+    """Stream a stored media object, honoring `Range` and `If-Range` request headers"""
+    range_header = request.headers.get("range")
+    if range_header:
+        return await _range_response(
+            media_item_id, file_path, range_header, request.headers.get("if-range"), etag, headers, info
+        )
+    
+    # Get file stream from domain service
+    file_stream, content_type, content_length = await media_item_service.get_media_item_stream(file_path, info)
+    
+    logger.info(f"Streaming media item {media_item_id}: {content_type}, {content_length} bytes")
+    
+    headers = {
+        **headers,
+        "Content-Length": str(content_length),
+        "Accept-Ranges": "bytes"
+    }
+    if isinstance(file_stream, CachedFile):
+        return CachedFileResponse(file_stream, media_type=content_type, headers=headers)
+    return ObjectStreamResponse(file_stream, media_type=content_type, headers=headers)
+
+async def _range_response(media_item_id: int, file_path: str, range_header: str, if_range: str | None,
+                          etag: str, headers: dict, info: FileInfo | None = None) -> Response:
+    """Serve the requested byte ranges of a media object as 206 Partial Content"""
+    info = info or await media_item_service.get_media_item_info(file_path)
+    headers = {**headers, "Accept-Ranges": "bytes"}
+    if info.last_modified:
+        headers["Last-Modified"] = format_datetime(info.last_modified, usegmt=True)
+    
+    try:
+        ranges = parse_range_header(range_header, info.size)
+    except RangeNotSatisfiableError:
+        headers["Content-Range"] = f"bytes */{info.size}"
+        return Response(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, headers=headers)
+    
+    # A stale If-Range validator or an unusable Range header means the whole object is sent
+    if ranges is None or (if_range and not if_range_matches(if_range, etag, info.last_modified)):
+        ranges = [ByteRange(0, info.size - 1)] if info.size else []
+        if not ranges:
+            return Response(status_code=status.HTTP_200_OK, media_type=info.content_type, headers=headers)
+        full = await media_item_service.get_media_item_range(file_path, 0, info.size)
+        headers["Content-Length"] = str(info.size)
+        return _object_response(full, status.HTTP_200_OK, info.content_type, headers)
+    
+    logger.info(f"Streaming media item {media_item_id}: {len(ranges)} range(s) of {info.size} bytes")
+    
+    if len(ranges) == 1:
+        byte_range = ranges[0]
+        response = await media_item_service.get_media_item_range(file_path, byte_range.start, byte_range.length)
+        headers["Content-Range"] = byte_range.content_range(info.size)
+        headers["Content-Length"] = str(byte_range.length)
+        return _object_response(response, status.HTTP_206_PARTIAL_CONTENT, info.content_type, headers)
+    
+    boundary = uuid.uuid4().hex
+    part_headers = [
+        (f"--{boundary}\r\nContent-Type: {info.content_type}\r\n"
+         f"Content-Range: {byte_range.content_range(info.size)}\r\n\r\n").encode()
+        for byte_range in ranges
+    ]
+    closing = f"--{boundary}--\r\n".encode()
+    headers["Content-Length"] = str(
+        sum(len(part) + byte_range.length + 2 for part, byte_range in zip(part_headers, ranges)) + len(closing)
+    )
+    
+    async def multipart_body() -> AsyncIterator[bytes]:
+        for part, byte_range in zip(part_headers, ranges):
+            yield part
+            response = await media_item_service.get_media_item_range(file_path, byte_range.start, byte_range.length)
+            async with aclosing(_iter_object(response)) as chunks:
+                async for chunk in chunks:
+                    yield chunk
+            yield b"\r\n"
+        yield closing
+    
+    return ObjectStreamResponse(
+        multipart_body(),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=f"multipart/byteranges; boundary={boundary}",
+        headers=headers
+    )
+
+def _object_response(response: Any, status_code: int, media_type: str, headers: dict) -> Response:
+    """Send a storage response, using the file response for objects in the local disk cache"""
+    if isinstance(response, CachedFile):
+        return CachedFileResponse(response, status_code=status_code, media_type=media_type, headers=headers)
+    return ObjectStreamResponse(response, status_code=status_code, media_type=media_type, headers=headers)
+
+async def _iter_object(response: Any) -> AsyncIterator[bytes]:
+    """Read a storage response (cached file or object stream) and close it when done or abandoned"""
+    if isinstance(response, CachedFile):
+        try:
+            async for chunk in iterate_in_threadpool(response.stream(STREAM_CHUNK_SIZE)):
+                yield chunk
+        finally:
+            response.close()
+        return
+    async with aclosing(response) as chunks:
+        async for chunk in chunks:
+            yield chunk
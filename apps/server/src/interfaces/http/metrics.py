@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends
+from src.infrastructure.auth.fastapi_users_config import current_superuser
+from src.infrastructure.cache.feed_cache import feed_cache
+from src.infrastructure.cache.access_index import access_index
+from src.infrastructure.cache.media_disk_cache import media_disk_cache
+from src.infrastructure.storage.storage_executor import storage_executor
+from src.infrastructure.storage.upload_pipe import upload_memory_budget, upload_executor
+from src.infrastructure.storage.object_stream import download_stats, download_executor
+from src.infrastructure.storage.http_pool import storage_http_pools
+from src.infrastructure.storage.deletion_jobs import deletion_jobs
+from src.infrastructure.imaging.derivatives import image_processor
+from src.infrastructure.notifications.sms_client import sms_client
+
+# Operational counters, restricted to superusers
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+    dependencies=[Depends(current_superuser)]
+)
+
+@router.get("/")
+async def get_metrics():
+    """Get in-process cache and pool counters"""
+    return {
+        "feed_cache": feed_cache.stats(),
+        "access_index": access_index.stats(),
+        "media_disk_cache": media_disk_cache.stats(),
+        "storage_pool": storage_executor.stats(),
+        "upload_pool": upload_executor.stats(),
+        "download_pool": download_executor.stats(),
+        "downloads": download_stats.stats(),
+        "minio_connections": storage_http_pools.stats(),
+        "deletion_jobs": deletion_jobs.stats(),
+        "upload_memory": upload_memory_budget.stats(),
+        "image_processor": image_processor.stats(),
+        "sms": sms_client.stats()
+    }
@@ -0,0 +1,126 @@
+from dataclasses import dataclass
+from typing import AsyncIterator, List
+from fastapi import Request
+import multipart
+from multipart.multipart import parse_options_header
+
+# Largest form field value, and largest part header, held in memory; file parts are not limited here
+MAX_FORM_FIELD_BYTES = 64 * 1024
+MAX_PART_HEADER_BYTES = 16 * 1024
+
+@dataclass
+class FormField:
+    name: str
+    value: str
+
+
+@dataclass
+class FileStart:
+    name: str
+    filename: str
+    content_type: str | None
+
+
+@dataclass
+class FileChunk:
+    data: bytes
+
+
+@dataclass
+class FileEnd:
+    pass
+
+
+class MultipartStream:
+    """
+    Incremental multipart/form-data parser over the raw request body.
+
+    Unlike `request.form()` nothing is spooled: file parts are yielded as
+    FileStart / FileChunk / FileEnd events as the bytes arrive, so the caller
+    decides where they go and how much is held in memory. Form fields must be
+    sent before the file they describe to be available when it starts. Form field
+    values and part headers are buffered, so they are limited in size; exceeding a
+    limit raises ValueError.
+    """
+
+    def __init__(self, request: Request):
+        self.request = request
+        self._events: List[FormField | FileStart | FileChunk | FileEnd] = []
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: dict[bytes, bytes] = {}
+        self._field_name: str | None = None
+        self._field_data = bytearray()
+        self._is_file = False
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+        self._field_name = None
+        self._field_data = bytearray()
+        self._is_file = False
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+        self._check_header_size()
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+        self._check_header_size()
+
+    def _check_header_size(self) -> None:
+        if len(self._header_field) + len(self._header_value) > MAX_PART_HEADER_BYTES:
+            raise ValueError("Multipart part header is too large")
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._field_name = options.get(b"name", b"").decode("latin-1")
+        if b"filename" in options:
+            self._is_file = True
+            content_type = self._headers.get(b"content-type")
+            self._events.append(FileStart(
+                name=self._field_name,
+                filename=options[b"filename"].decode("utf-8", errors="replace"),
+                content_type=content_type.decode("latin-1") if content_type else None
+            ))
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._is_file:
+            self._events.append(FileChunk(data=bytes(data[start:end])))
+        else:
+            self._field_data += data[start:end]
+            if len(self._field_data) > MAX_FORM_FIELD_BYTES:
+                raise ValueError(f"Form field '{self._field_name}' must be at most {MAX_FORM_FIELD_BYTES // 1024}KB")
+
+    def _on_part_end(self) -> None:
+        if self._is_file:
+            self._events.append(FileEnd())
+        elif self._field_name is not None:
+            self._events.append(FormField(name=self._field_name, value=self._field_data.decode("utf-8", errors="replace")))
+
+    async def events(self) -> AsyncIterator[FormField | FileStart | FileChunk | FileEnd]:
+        content_type, params = parse_options_header(self.request.headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise ValueError("Expected a multipart/form-data request body")
+
+        parser = multipart.MultipartParser(params[b"boundary"], {
+            "on_part_begin": self._on_part_begin,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+        })
+        async for chunk in self.request.stream():
+            parser.write(chunk)
+            events, self._events = self._events, []
+            for event in events:
+                yield event
+        parser.finalize()
+        for event in self._events:
+            yield event
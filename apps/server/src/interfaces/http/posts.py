@@ -1,16 +1,28 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, status, HTTPException, Request
 from sqlmodel.ext.asyncio.session import AsyncSession
 from pydantic import BaseModel
 from src.domain.models.post import Post
 from src.domain.models.audience import Audience
 from src.domain.models.user import User
 from src.domain.models.media_item import MediaItem
+from src.domain.models.notification_job import NotificationReport
 from src.domain.services.post_service import PostService
-from src.domain.services.notifications.notification_service import NotificationService
-from src.domain.errors.custom_errors import PostNotFoundError, AudienceNotFoundError, UserNotFoundError
-from src.infrastructure.database import get_session
+from src.domain.services.media_item_service import MediaItemService
+from src.domain.services.notifications.notification_dispatcher import NotificationDispatcher
+from src.domain.models.media_item import MediaType
+from src.domain.errors.custom_errors import PostNotFoundError, AudienceNotFoundError, UserNotFoundError, FileTooLargeError
+from src.infrastructure.database import get_session, async_session
+from src.infrastructure.storage.deletion_jobs import deletion_jobs, DeletionProgress
 from src.infrastructure.auth.dependencies import current_active_user
+from src.interfaces.http.multipart_stream import MultipartStream, FormField, FileStart, FileChunk, FileEnd
+from src.interfaces.http.upload_batch import UploadBatch
+from src.interfaces.http.media_items import (
+    media_storage_service, media_blob_service, MAX_UPLOAD_BYTES, _media_type_for, _generate_derivatives
+)
 from typing import Sequence, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
 
 # Protect ALL routes in this router with authentication
 router = APIRouter(
@@ -43,7 +55,8 @@ class PostUpdateRequest(BaseModel):
     audience_ids: List[int] | None = None
 
 post_service = PostService()
-notification_service = NotificationService()
+media_item_service = MediaItemService()
+notification_dispatcher = NotificationDispatcher()
 
 @router.get("/", response_model=Sequence[Post])
 async def get_posts(
@@ -85,6 +98,24 @@ async def get_post(
     except PostNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
+@router.get("/{post_id}/notifications", response_model=NotificationReport)
+async def get_post_notifications(
+    post_id: int,
+    current_user: User = Depends(current_active_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """How many contacts were texted about a post, and what it cost (only the owner can view)"""
+    if not current_user.id:
+        raise HTTPException(status_code=500, detail="User ID not found")
+    
+    try:
+        post = await post_service.get_post_by_id(post_id, session)
+        if post and post.user_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Not authorized to view this post")
+        return await post_service.get_notification_report(post_id, session)
+    except PostNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
 @router.post("/", response_model=Post, status_code=status.HTTP_201_CREATED)
 async def create_post(
     post: PostCreateRequest,
@@ -95,19 +126,7 @@ async def create_post(
     if not current_user.id:
         raise HTTPException(status_code=500, detail="User ID not found")
     
-    # Filter audience_ids to only include those owned by the current user
-    filtered_audience_ids = None
-    if post.audience_ids:
-        user_audiences = await post_service.get_audiences_by_user(current_user.id, session)
-        user_audience_ids = {audience.id for audience in user_audiences if audience.id is not None}
-        filtered_audience_ids = [audience_id for audience_id in post.audience_ids if audience_id in user_audience_ids]
-        
-        # If user provided audience_ids but none are valid (owned by user), reject the request
-        if not filtered_audience_ids:
-            raise HTTPException(
-                status_code=400, 
-                detail="Invalid audience IDs provided"
-            )
+    filtered_audience_ids = await _filter_audience_ids(post.audience_ids, current_user.id, session)
     
     try:
         created_post = await post_service.create_post(
@@ -117,18 +136,120 @@ async def create_post(
             filtered_audience_ids
         )
         
-        # Send notifications through domain service
-        await notification_service.notify_audiences_of_new_post(
-            created_post.id or 0, 
-            filtered_audience_ids, 
-            session
-        )
+        # Notifications were queued with the post; the dispatcher sends them
+        notification_dispatcher.wake()
         return created_post
     except UserNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except AudienceNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
+# Files a post can be created with in one request
+MAX_POST_FILES = 20
+
+POST_WITH_MEDIA_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        "multipart/form-data": {
+            "schema": {
+                "type": "object",
+                "required": ["description"],
+                "properties": {
+                    "description": {"type": "string"},
+                    "audience_ids": {"type": "array", "items": {"type": "integer"}},
+                    "files": {"type": "array", "items": {"type": "string", "format": "binary"}}
+                }
+            }
+        }
+    }
+}
+
+@router.post("/with-media", response_model=PostWithUserAndAudiences, status_code=status.HTTP_201_CREATED,
+             openapi_extra={"requestBody": POST_WITH_MEDIA_REQUEST_BODY})
+async def create_post_with_media(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(current_active_user),
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Create a post with its photos and videos in one request.
+    `description` and `audience_ids` (repeated) must be sent before the `files`, which
+    become the post's media items in the order sent. Files are stored concurrently while
+    the body is read; the post, its audiences and all its media items are then created
+    in one transaction, so the post never shows up with part of its media. Contacts are
+    notified only after that. Photo renditions are generated after the response is sent.
+    """
+    if not current_user.id:
+        raise HTTPException(status_code=500, detail="User ID not found")
+    
+    fields: dict[str, str] = {}
+    requested_audience_ids: List[int] = []
+    filtered_audience_ids: List[int] | None = None
+    batch = UploadBatch(media_storage_service, media_blob_service, async_session, MAX_UPLOAD_BYTES)
+    try:
+        try:
+            async for event in MultipartStream(request).events():
+                if isinstance(event, FormField):
+                    if event.name == "audience_ids":
+                        requested_audience_ids.append(int(event.value))
+                    else:
+                        fields[event.name] = event.value
+                elif isinstance(event, FileStart) and event.name == "files":
+                    if batch.file_count == 0:
+                        # Validate the post before accepting its files
+                        filtered_audience_ids = await _filter_audience_ids(requested_audience_ids, current_user.id, session)
+                    if batch.file_count >= MAX_POST_FILES:
+                        raise HTTPException(status_code=400, detail=f"A post can have at most {MAX_POST_FILES} files")
+                    await batch.start_file(
+                        event.filename or "unknown", event.content_type or "", _media_type_for(event.content_type)
+                    )
+                elif isinstance(event, FileChunk) and batch.receiving:
+                    await batch.write(event.data)
+                elif isinstance(event, FileEnd) and batch.receiving:
+                    batch.end_file()
+            stored = await batch.finish()
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        if "description" not in fields:
+            raise HTTPException(status_code=422, detail="Form field 'description' must be sent before the files")
+        if batch.file_count == 0:
+            filtered_audience_ids = await _filter_audience_ids(requested_audience_ids, current_user.id, session)
+        
+        media_items = [upload.to_media_item() for upload in stored]
+        created_post = await post_service.create_post_with_media(
+            fields["description"], current_user.id, session, filtered_audience_ids, media_items
+        )
+    except BaseException as e:
+        await session.rollback()
+        await batch.abort(e, session)
+        if isinstance(e, (UserNotFoundError, AudienceNotFoundError)):
+            raise HTTPException(status_code=404, detail=str(e))
+        if isinstance(e, FileTooLargeError):
+            raise HTTPException(status_code=400, detail=str(e))
+        if isinstance(e, Exception) and not isinstance(e, HTTPException):
+            logger.error(f"Error creating post with media: {e}")
+            raise HTTPException(status_code=500, detail="Failed to create post")
+        raise
+    
+    for media_item in media_items:
+        if media_item.type == MediaType.photo and media_item.id is not None:
+            background_tasks.add_task(_generate_derivatives, media_item.id)
+    
+    # Notifications were queued with the post and its media, so contacts never open a post still missing media
+    notification_dispatcher.wake()
+    
+    logger.info(f"Created post {created_post.id} with {len(media_items)} media items")
+    return PostWithUserAndAudiences(
+        id=created_post.id or 0,
+        description=created_post.description,
+        created_at=str(created_post.created_at),
+        user=current_user,
+        audiences=list(await post_service.repository.get_audiences_for_post(created_post.id or 0, session)),
+        media_items=media_items
+    )
+
 @router.put("/{post_id}", response_model=Post)
 async def update_post(
     post_id: int, 
@@ -140,19 +261,7 @@ async def update_post(
     if not current_user.id:
         raise HTTPException(status_code=500, detail="User ID not found")
     
-    # Filter audience_ids to only include those owned by the current user
-    filtered_audience_ids = None
-    if post.audience_ids:
-        user_audiences = await post_service.get_audiences_by_user(current_user.id, session)
-        user_audience_ids = {audience.id for audience in user_audiences if audience.id is not None}
-        filtered_audience_ids = [audience_id for audience_id in post.audience_ids if audience_id in user_audience_ids]
-        
-        # If user provided audience_ids but none are valid (owned by user), reject the request
-        if not filtered_audience_ids:
-            raise HTTPException(
-                status_code=400, 
-                detail="Invalid audience IDs provided"
-            )
+    filtered_audience_ids = await _filter_audience_ids(post.audience_ids, current_user.id, session)
     
     try:
         # Check if current_user owns this post
@@ -172,7 +281,10 @@ async def delete_post(
     current_user: User = Depends(current_active_user),
     session: AsyncSession = Depends(get_session)
 ):
-    """Delete a post (only the owner can delete)"""
+    """
+    Delete a post (only the owner can delete).
+    Its media files are removed by a background deletion job, listed at /media-items/deletions.
+    """
     if not current_user.id:
         raise HTTPException(status_code=500, detail="User ID not found")
     
@@ -182,6 +294,36 @@ async def delete_post(
         if existing_post.user_id != current_user.id:
             raise HTTPException(status_code=403, detail="Not authorized to delete this post")
         
-        await post_service.delete_post(post_id, session)
+        # Media rows go with the post, in its transaction; their files are deleted in the background
+        media_items = await post_service.delete_post(post_id, session)
+        deletion_jobs.start(
+            f"Media of post {post_id}",
+            current_user.id,
+            lambda progress: _delete_post_files(media_items, existing_post.user_id, post_id, progress)
+        )
     except PostNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
+
+async def _filter_audience_ids(audience_ids: List[int] | None, user_id: int, session: AsyncSession) -> List[int] | None:
+    """
+    Keep only the audiences owned by the user. Rejects the request when audiences were
+    given but none of them are the user's.
+    """
+    if not audience_ids:
+        return None
+    user_audiences = await post_service.get_audiences_by_user(user_id, session)
+    user_audience_ids = {audience.id for audience in user_audiences if audience.id is not None}
+    filtered_audience_ids = [audience_id for audience_id in audience_ids if audience_id in user_audience_ids]
+    if not filtered_audience_ids:
+        raise HTTPException(
+            status_code=400, 
+            detail="Invalid audience IDs provided"
+        )
+    return filtered_audience_ids
+
+async def _delete_post_files(media_items: Sequence[MediaItem], user_id: int, post_id: int,
+                             progress: DeletionProgress) -> None:
+    """Remove the stored files of a deleted post, in its own session"""
+    async with async_session() as session:
+        await media_item_service.delete_detached_media_files(media_items, session, progress)
+    await media_item_service.media_storage_service.delete_post_media(user_id, post_id, progress)
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Callable, List
+from sqlmodel.ext.asyncio.session import AsyncSession
+from src.domain.models.media_blob import MediaBlob
+from src.domain.models.media_item import MediaItem, MediaMetadata, MediaType
+from src.domain.services.media_blob_service import MediaBlobService
+from src.domain.errors.custom_errors import FileTooLargeError
+from src.infrastructure.storage.media_storage_service import MediaStorageService
+from src.infrastructure.storage.upload_pipe import UploadPipe, upload_memory_budget, UPLOAD_MEMORY_PER_STREAM
+from src.infrastructure.imaging.media_probe import MediaProbe
+from src.utils.env import get_optional_env_var
+
+logger = logging.getLogger(__name__)
+
+# Files of one request being stored at the same time
+UPLOAD_BATCH_PARALLELISM = int(get_optional_env_var("UPLOAD_BATCH_PARALLELISM", "4"))
+
+@dataclass
+class _BatchFile:
+    order: int
+    media_type: MediaType
+    file_name: str
+    content_type: str
+    probe: MediaProbe
+    pipe: UploadPipe
+    task: asyncio.Task | None = None
+
+
+@dataclass
+class StoredUpload:
+    """A file of the batch stored under its content address, with a reference on its blob"""
+    order: int
+    media_type: MediaType
+    blob: MediaBlob
+    metadata: MediaMetadata
+
+    def to_media_item(self) -> MediaItem:
+        """The media item row for this file; its post is set when it is inserted"""
+        return MediaItem(path=self.blob.path, type=self.media_type, order=self.order, **self.metadata.model_dump())
+
+
+class UploadBatch:
+    """
+    The files of one multipart request, stored concurrently.
+
+    Each file is piped into storage as its bytes arrive, as a single upload is. Once
+    its last byte is read the next file is read while the earlier ones are still being
+    written, moved to their content address and given a blob reference, each in its
+    own session since they run side by side. At most `parallelism` files are in flight,
+    each within the global upload memory budget; the body is not read further until a
+    slot is free. Files are numbered in the order they arrive.
+    """
+
+    def __init__(self,
+                 media_storage_service: MediaStorageService,
+                 media_blob_service: MediaBlobService,
+                 session_factory: Callable[[], AsyncSession],
+                 max_file_bytes: int,
+                 parallelism: int = UPLOAD_BATCH_PARALLELISM):
+        self.media_storage_service = media_storage_service
+        self.media_blob_service = media_blob_service
+        self.session_factory = session_factory
+        self.max_file_bytes = max_file_bytes
+        self._slots = asyncio.Semaphore(max(parallelism, 1))
+        self._files: List[_BatchFile] = []
+        self._current: _BatchFile | None = None
+        self._released = False
+
+    @property
+    def file_count(self) -> int:
+        return len(self._files)
+
+    @property
+    def receiving(self) -> bool:
+        """Whether a file has started and not ended yet"""
+        return self._current is not None
+
+    async def start_file(self, file_name: str, content_type: str, media_type: MediaType) -> None:
+        await self._slots.acquire()
+        try:
+            batch_file = _BatchFile(
+                order=len(self._files), media_type=media_type, file_name=file_name, content_type=content_type,
+                probe=MediaProbe(content_type), pipe=UploadPipe()
+            )
+            batch_file.task = asyncio.create_task(self._store(batch_file))
+        except BaseException:
+            self._slots.release()
+            raise
+        self._files.append(batch_file)
+        self._current = batch_file
+
+    async def write(self, data: bytes) -> None:
+        if self._current is None:
+            return
+        self._current.probe.feed(data)
+        if self._current.probe.size_bytes > self.max_file_bytes:
+            raise FileTooLargeError(self.max_file_bytes)
+        await self._current.pipe.write(data)
+
+    def end_file(self) -> None:
+        """The current file is complete; its storage finishes in the background"""
+        if self._current is not None:
+            self._current.pipe.close()
+            self._current = None
+
+    async def _store(self, batch_file: _BatchFile) -> MediaBlob:
+        try:
+            async with upload_memory_budget.reserve(UPLOAD_MEMORY_PER_STREAM):
+                staged = await self.media_storage_service.upload_stream(
+                    batch_file.pipe, self.media_storage_service.staging_path(batch_file.file_name),
+                    batch_file.content_type
+                )
+            # The pipe is only closed cleanly after the last byte, so the probe is complete
+            async with self.session_factory() as session:
+                blob, _ = await self.media_blob_service.store_staged(
+                    staged.path, batch_file.probe.checksum, batch_file.file_name, batch_file.probe.size_bytes,
+                    batch_file.content_type, session
+                )
+            return blob
+        finally:
+            self._slots.release()
+
+    async def finish(self) -> List[StoredUpload]:
+        """Wait until every file is stored. Raises the first failure; the caller then aborts the batch."""
+        if self._current is not None:
+            raise ValueError("Incomplete file upload")
+        blobs = await asyncio.gather(*[batch_file.task for batch_file in self._files if batch_file.task])
+        return [
+            StoredUpload(
+                order=batch_file.order,
+                media_type=batch_file.media_type,
+                blob=blob,
+                metadata=MediaMetadata(
+                    size_bytes=batch_file.probe.size_bytes,
+                    content_type=batch_file.content_type,
+                    etag=blob.etag,
+                    checksum=batch_file.probe.checksum,
+                    width=batch_file.probe.width,
+                    height=batch_file.probe.height,
+                    duration_seconds=batch_file.probe.duration_seconds
+                )
+            )
+            for batch_file, blob in zip(self._files, blobs)
+        ]
+
+    async def abort(self, error: BaseException, session: AsyncSession) -> None:
+        """
+        Stop the files still arriving and drop the references of those already stored,
+        after the request failed or its rows could not be created
+        """
+        if self._current is not None:
+            self._current.pipe.close(error)
+            self._current = None
+        results = await asyncio.gather(
+            *[batch_file.task for batch_file in self._files if batch_file.task], return_exceptions=True
+        )
+        if self._released:
+            return
+        self._released = True
+        for result in results:
+            if isinstance(result, MediaBlob):
+                try:
+                    await self.media_blob_service.release(result.path, [], session)
+                except Exception as e:
+                    logger.error(f"Could not release blob {result.path} of an aborted upload: {e}")
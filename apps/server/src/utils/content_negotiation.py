@@ -0,0 +1,26 @@
+from typing import Set
+
+
+def explicitly_accepted(accept_header: str | None) -> Set[str]:
+    """
+    Media types listed by name with a non-zero quality in an `Accept` header.
+    Wildcards are ignored on purpose: browsers send `image/*` or `*/*` without
+    being able to decode every image format, so newer formats are only served
+    to clients that name them.
+    """
+    accepted: Set[str] = set()
+    for item in (accept_header or "").split(","):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        if not media_type or "*" in media_type:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(media_type.lower())
+    return accepted
@@ -0,0 +1,24 @@
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from src.domain.errors.custom_errors import InvalidCursorError
+
+@dataclass(frozen=True)
+class FeedCursor:
+    """Opaque keyset position in a feed ordered by (created_at, id)"""
+    created_at: datetime
+    post_id: int
+
+    def encode(self) -> str:
+        payload = json.dumps({"t": self.created_at.isoformat(), "id": self.post_id}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, cursor: str) -> "FeedCursor":
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            return cls(created_at=datetime.fromisoformat(payload["t"]), post_id=int(payload["id"]))
+        except (ValueError, KeyError, TypeError):
+            raise InvalidCursorError(cursor)
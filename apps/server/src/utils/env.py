@@ -4,4 +4,9 @@ def get_env_var(name: str) -> str:
     value = os.getenv(name)
     if value is None:
         raise RuntimeError(f"{name} environment variable is not set")
-    return value
\ No newline at end of file
+    return value
+
+
+def get_optional_env_var(name: str, default: str) -> str:
+    # Empty values come from unset variables passed through docker compose
+    return os.getenv(name) or default
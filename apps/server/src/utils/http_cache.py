@@ -0,0 +1,36 @@
+import hashlib
+
+# Media objects live at UUID paths and are never rewritten, so a response for a
+# path stays valid for good
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def immutable_cache_control(shared: bool) -> str:
+    """`Cache-Control` for content-addressed media; `shared` allows proxies and CDNs to keep it"""
+    return f"{'public' if shared else 'private'}, max-age={IMMUTABLE_MAX_AGE}, immutable"
+
+
+def media_entity_tag(path: str, checksum: str | None = None) -> str:
+    """
+    Strong entity tag (unquoted) of a stored media object: its SHA-256 checksum when
+    known, otherwise a digest of its immutable storage path.
+    """
+    if checksum:
+        return checksum
+    return "p-" + hashlib.sha256(path.encode()).hexdigest()[:32]
+
+
+def if_none_match_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Evaluate an `If-None-Match` precondition against an entity tag. Comparison is
+    weak, as the spec requires for this header, so `W/` prefixes are ignored.
+    """
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == f'"{etag}"':
+            return True
+    return False
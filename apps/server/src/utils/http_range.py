@@ -0,0 +1,84 @@
+from dataclasses import dataclass
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import List
+from src.domain.errors.custom_errors import RangeNotSatisfiableError
+
+# More ranges than this in one request are ignored and the whole object is served
+MAX_RANGES = 16
+
+@dataclass(frozen=True)
+class ByteRange:
+    """Inclusive byte range of an object"""
+    start: int
+    end: int
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start + 1
+
+    def content_range(self, size: int) -> str:
+        return f"bytes {self.start}-{self.end}/{size}"
+
+
+def parse_range_header(header: str, size: int) -> List[ByteRange] | None:
+    """
+    Resolve a `Range` header against an object of `size` bytes.
+    Returns the requested ranges sorted with overlapping or adjacent ones merged, or
+    None when the header should be ignored (not a bytes range, malformed, too many
+    ranges or an empty object). Raises RangeNotSatisfiableError if no range overlaps
+    the object.
+    """
+    unit, _, specs = header.partition("=")
+    if unit.strip().lower() != "bytes" or not specs or size <= 0:
+        return None
+
+    ranges: List[ByteRange] = []
+    for spec in specs.split(","):
+        first, dash, last = spec.strip().partition("-")
+        if not dash:
+            return None
+        try:
+            if first:
+                start = int(first)
+                end = int(last) if last else max(start, size - 1)
+                if end < start:
+                    return None
+            else:
+                suffix = int(last)
+                start, end = max(size - suffix, 0), size - 1
+                if suffix == 0:
+                    continue
+        except ValueError:
+            return None
+        if start < 0:
+            return None
+        if start < size:
+            ranges.append(ByteRange(start, min(end, size - 1)))
+
+    if not ranges:
+        raise RangeNotSatisfiableError(header, size)
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    merged: List[ByteRange] = []
+    for byte_range in sorted(ranges, key=lambda r: r.start):
+        if merged and byte_range.start <= merged[-1].end + 1:
+            merged[-1] = ByteRange(merged[-1].start, max(merged[-1].end, byte_range.end))
+        else:
+            merged.append(byte_range)
+    return merged
+
+
+def if_range_matches(if_range: str, etag: str | None, last_modified: datetime | None) -> bool:
+    """
+    Evaluate an `If-Range` precondition: an entity tag must match strongly, a date must
+    equal the object's Last-Modified. When it does not match the whole object is served.
+    """
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return etag is not None and if_range == f'"{etag}"'
+    try:
+        return last_modified is not None and parsedate_to_datetime(if_range) == last_modified.replace(microsecond=0)
+    except (TypeError, ValueError):
+        return False
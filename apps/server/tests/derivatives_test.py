@@ -0,0 +1,47 @@
+from io import BytesIO
+from PIL import Image
+from src.infrastructure.imaging.derivatives import (
+    DERIVATIVE_SIZES, DERIVATIVE_FORMATS, derivative_path, variant_path, render_derivatives
+)
+from src.utils.content_negotiation import explicitly_accepted
+
+def _png(width: int, height: int) -> bytes:
+    output = BytesIO()
+    Image.new("RGBA", (width, height), (200, 10, 10, 128)).save(output, "PNG")
+    return output.getvalue()
+
+def test_renditions_are_downscaled_jpegs():
+    rendered = render_derivatives(_png(3000, 1500), list(DERIVATIVE_SIZES), ["jpeg"]).renditions
+    assert set(rendered) == set(DERIVATIVE_SIZES)
+    for size, encodings in rendered.items():
+        with Image.open(BytesIO(encodings["jpeg"])) as image:
+            assert image.format == "JPEG"
+            assert image.size == (DERIVATIVE_SIZES[size], DERIVATIVE_SIZES[size] // 2)
+
+def test_small_originals_are_not_upscaled():
+    with Image.open(BytesIO(render_derivatives(_png(200, 100), ["large"], ["jpeg"]).renditions["large"]["jpeg"])) as image:
+        assert image.size == (200, 100)
+
+def test_placeholder_is_computed_with_the_renditions():
+    placeholder = render_derivatives(_png(300, 200), ["thumb"], ["jpeg"]).placeholder
+    # Transparent pixels are flattened onto white
+    assert placeholder.dominant_color == "#e38484"
+    assert len(placeholder.blurhash) == 6 + 2 * (4 * 3 - 1)
+
+def test_renditions_live_next_to_the_original():
+    assert derivative_path("users/1/posts/2/abc.png", "thumb") == "users/1/posts/2/abc.thumb.jpg"
+    assert derivative_path("abc", "large") == "abc.large.jpg"
+
+def test_modern_formats_are_encoded():
+    formats = [image_format.name for image_format in DERIVATIVE_FORMATS]
+    encodings = render_derivatives(_png(1200, 900), ["medium"], formats).renditions["medium"]
+    for image_format in DERIVATIVE_FORMATS:
+        with Image.open(BytesIO(encodings[image_format.name])) as image:
+            assert image.format == image_format.name.upper()
+    assert variant_path("users/1/posts/2/abc.medium.jpg", DERIVATIVE_FORMATS[0]) == \
+        f"users/1/posts/2/abc.medium.{DERIVATIVE_FORMATS[0].extension}"
+    assert variant_path("users/1/posts/2/abc.jpg", DERIVATIVE_FORMATS[0]) is None
+
+def test_only_named_types_are_accepted():
+    assert explicitly_accepted("image/avif,image/webp,image/apng,*/*;q=0.8") == {"image/avif", "image/webp", "image/apng"}
+    assert explicitly_accepted("image/webp;q=0, image/*") == set()
@@ -0,0 +1,58 @@
+import asyncio
+from src.infrastructure.cache.feed_cache import FeedCache
+
+def test_concurrent_misses_share_one_computation():
+    cache = FeedCache(max_entries=10, ttl_seconds=60)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"posts": []}
+
+    async def run():
+        return await asyncio.gather(*[cache.get_or_compute(1, "feed", compute) for _ in range(5)])
+
+    results = asyncio.run(run())
+    assert calls == 1
+    assert all(r == {"posts": []} for r in results)
+    assert cache.misses == 1 and cache.coalesced == 4
+
+def test_invalidation_and_lru_eviction():
+    cache = FeedCache(max_entries=2, ttl_seconds=60)
+
+    async def run():
+        await cache.get_or_compute(1, "feed", lambda: asyncio.sleep(0, "old"))
+        assert await cache.get_or_compute(1, "feed", lambda: asyncio.sleep(0, "new")) == "old"
+        cache.invalidate_contacts([1])
+        assert await cache.get_or_compute(1, "feed", lambda: asyncio.sleep(0, "new")) == "new"
+        await cache.get_or_compute(2, "feed", lambda: asyncio.sleep(0, "other"))
+
+    asyncio.run(run())
+    assert cache.hits == 1
+    assert cache.evictions == 1
+
+def test_cancelled_computation_is_taken_over_by_a_waiter():
+    cache = FeedCache(max_entries=10, ttl_seconds=60)
+    calls = []
+
+    def compute(name):
+        async def run():
+            calls.append(name)
+            await asyncio.sleep(0.05)
+            return name
+        return run
+
+    async def run():
+        leader = asyncio.create_task(cache.get_or_compute(1, "feed", compute("leader")))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(cache.get_or_compute(1, "feed", compute(f"waiter{i}"))) for i in range(3)]
+        await asyncio.sleep(0.01)
+        # The client of the computing request disconnects
+        leader.cancel()
+        return await asyncio.gather(*waiters)
+
+    results = asyncio.run(run())
+    assert calls == ["leader", "waiter0"]
+    assert results == ["waiter0"] * 3
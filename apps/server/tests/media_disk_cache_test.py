@@ -0,0 +1,79 @@
+import os
+from src.infrastructure.cache.media_disk_cache import MediaDiskCache
+
+def _fill(cache: MediaDiskCache, key: str, data: bytes, commit: bool = True) -> bool:
+    fill = cache.begin_fill(key, len(data), "image/jpeg", "etag", None)
+    if fill is None:
+        return False
+    fill.write(data)
+    if commit:
+        fill.commit()
+    else:
+        fill.abort()
+    return True
+
+def test_objects_are_cached_once_streamed_to_the_end(tmp_path):
+    cache = MediaDiskCache(directory=str(tmp_path), max_bytes=1000)
+    cache.start()
+
+    fill = cache.begin_fill("a.jpg", 10, "image/jpeg", "etag", None)
+    # Other misses meanwhile stream from the origin without filling, and nothing is served half written
+    assert cache.begin_fill("a.jpg", 10, "image/jpeg", "etag", None) is None
+    assert cache.open("a.jpg") is None
+    fill.write(b"01234")
+    fill.write(b"56789")
+    fill.commit()
+
+    cached = cache.open("a.jpg")
+    assert b"".join(cached.stream()) == b"0123456789"
+    ranged = cache.open("a.jpg", offset=2, length=3)
+    assert b"".join(ranged.stream()) == b"234"
+    assert cache.begin_fill("a.jpg", 10, "image/jpeg", "etag", None) is None
+    assert cache.misses == 2 and cache.hits == 2
+    assert cache.stats()["hit_ratio"] == 0.5
+    for f in [cached, ranged]:
+        f.close()
+
+def test_lru_eviction_and_abandoned_fills(tmp_path):
+    cache = MediaDiskCache(directory=str(tmp_path), max_bytes=800)
+    cache.start()
+
+    for key in ["a", "b", "c", "d", "e", "f", "g", "h"]:
+        assert _fill(cache, key, b"x" * 100)
+    cache.open("a").close()
+    _fill(cache, "i", b"x" * 100)
+    # A client that disconnects mid-stream leaves nothing behind
+    assert _fill(cache, "j", b"x" * 50, commit=False)
+    # Objects that would flush most of the cache are not cached
+    assert not _fill(cache, "k", b"x" * 101)
+
+    assert cache.peek("a") is not None and cache.peek("b") is None and cache.peek("j") is None
+    assert cache.evictions == 1 and cache.fills_abandoned == 1
+    assert cache.total_bytes == 800
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".part")]
+
+def test_discarded_keys_drop_their_running_fill(tmp_path):
+    cache = MediaDiskCache(directory=str(tmp_path), max_bytes=1000)
+    cache.start()
+    fill = cache.begin_fill("a.jpg", 3, "image/jpeg", None, None)
+    fill.write(b"old")
+    cache.discard("a.jpg")
+    fill.commit()
+    assert cache.open("a.jpg") is None
+    assert os.listdir(tmp_path) == []
+
+def test_only_the_cache_files_are_cleared_when_started(tmp_path):
+    unrelated = tmp_path / "notes.txt"
+    unrelated.write_bytes(b"not ours")
+    leftover = tmp_path / ("0" * 64)
+    leftover.write_bytes(b"from a previous run")
+    partial = tmp_path / "media-cache-abc.part"
+    partial.write_bytes(b"half")
+    cache = MediaDiskCache(directory=str(tmp_path), max_bytes=1000)
+
+    assert not _fill(cache, "a.jpg", b"0123456789")
+    assert leftover.exists()
+    cache.start()
+    assert not leftover.exists() and not partial.exists()
+    assert unrelated.read_bytes() == b"not ours"
+    assert _fill(cache, "a.jpg", b"0123456789")
@@ -0,0 +1,45 @@
+import hashlib
+import struct
+from io import BytesIO
+from PIL import Image
+from src.infrastructure.imaging.media_probe import MediaProbe
+
+def _box(box_type: bytes, body: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(body), box_type) + body
+
+def _mp4(width: int, height: int, seconds: int, rotated: bool = False) -> bytes:
+    mvhd = bytes(4) + struct.pack(">IIII", 0, 0, 1000, seconds * 1000) + bytes(80)
+    matrix = (0, 1 << 16, 0, -(1 << 16), 0, 0, 0, 0, 1 << 30) if rotated else (1 << 16, 0, 0, 0, 1 << 16, 0, 0, 0, 1 << 30)
+    tkhd = bytes(4) + bytes(20) + bytes(16) + struct.pack(">9i", *matrix) + struct.pack(">II", width << 16, height << 16)
+    moov = _box(b"moov", _box(b"mvhd", mvhd) + _box(b"trak", _box(b"tkhd", tkhd)))
+    return _box(b"ftyp", b"isom" + bytes(4)) + _box(b"mdat", bytes(5000)) + moov
+
+def _feed(probe: MediaProbe, data: bytes, chunk_size: int) -> MediaProbe:
+    for offset in range(0, len(data), chunk_size):
+        probe.feed(data[offset:offset + chunk_size])
+    return probe
+
+def test_video_duration_and_size_at_any_chunking():
+    data = _mp4(1920, 1080, 12)
+    for chunk_size in (1, 7, 4096):
+        probe = _feed(MediaProbe("video/mp4"), data, chunk_size)
+        assert (probe.width, probe.height, probe.duration_seconds) == (1920, 1080, 12.0)
+        assert probe.size_bytes == len(data)
+        assert probe.checksum == hashlib.sha256(data).hexdigest()
+
+def test_rotated_video_reports_display_size():
+    probe = _feed(MediaProbe("video/quicktime"), _mp4(1920, 1080, 3, rotated=True), 1024)
+    assert (probe.width, probe.height) == (1080, 1920)
+
+def test_photo_dimensions_follow_exif_orientation():
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    output = BytesIO()
+    Image.new("RGB", (640, 480)).save(output, "JPEG", exif=exif)
+    probe = _feed(MediaProbe("image/jpeg"), output.getvalue(), 512)
+    assert (probe.width, probe.height) == (480, 640)
+
+def test_unreadable_media_keeps_unknown_values():
+    probe = _feed(MediaProbe("image/heic"), b"\x00" * 10000, 100)
+    assert probe.width is None and probe.duration_seconds is None
+    assert probe.size_bytes == 10000
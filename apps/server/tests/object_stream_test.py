@@ -0,0 +1,79 @@
+import asyncio
+import threading
+from unittest.mock import MagicMock
+from src.infrastructure.storage.object_stream import ObjectStream
+
+def _response(chunks):
+    response = MagicMock()
+    response.stream.return_value = iter(chunks)
+    return response
+
+def test_fully_read_stream_returns_connection_to_pool():
+    response = _response([b"ab", b"cd"])
+
+    async def run():
+        return [chunk async for chunk in ObjectStream(response)]
+
+    assert asyncio.run(run()) == [b"ab", b"cd"]
+    response.release_conn.assert_called_once()
+    response.close.assert_not_called()
+
+def test_abandoned_stream_is_closed_and_released():
+    response = _response([b"ab", b"cd", b"ef"])
+
+    async def run():
+        stream = ObjectStream(response)
+        first = await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0.05)
+        return first
+
+    assert asyncio.run(run()) == b"ab"
+    response.close.assert_called_once()
+    response.release_conn.assert_called_once()
+
+def test_release_waits_for_a_read_in_progress():
+    gate = threading.Event()
+
+    def slow_chunks():
+        gate.wait(5)
+        yield b"late"
+
+    response = MagicMock()
+    response.stream.return_value = slow_chunks()
+
+    async def run():
+        stream = ObjectStream(response)
+        consumer = asyncio.create_task(stream.__anext__())
+        await asyncio.sleep(0.05)
+        # The client went away while a chunk was being read
+        consumer.cancel()
+        await asyncio.gather(consumer, return_exceptions=True)
+        released_early = response.release_conn.called
+        gate.set()
+        await asyncio.sleep(0.1)
+        return released_early
+
+    assert asyncio.run(run()) is False
+    response.close.assert_called_once()
+    response.release_conn.assert_called_once()
+
+def test_stream_fills_the_cache_only_when_read_to_the_end(tmp_path):
+    from src.infrastructure.cache.media_disk_cache import MediaDiskCache
+    cache = MediaDiskCache(directory=str(tmp_path), max_bytes=1000)
+    cache.start()
+
+    async def run():
+        filled = ObjectStream(_response([b"ab", b"cd"]), fill=cache.begin_fill("a", 4, "image/jpeg", None, None))
+        chunks = [chunk async for chunk in filled]
+        abandoned = ObjectStream(_response([b"ab", b"cd"]), fill=cache.begin_fill("b", 4, "image/jpeg", None, None))
+        await abandoned.__anext__()
+        await abandoned.aclose()
+        await asyncio.sleep(0.05)
+        return chunks
+
+    assert asyncio.run(run()) == [b"ab", b"cd"]
+    cached = cache.open("a")
+    assert b"".join(cached.stream()) == b"abcd"
+    cached.close()
+    assert cache.open("b") is None and cache.fills_abandoned == 1
@@ -0,0 +1,43 @@
+import numpy as np
+from io import BytesIO
+from PIL import Image
+from src.infrastructure.imaging.placeholder import (
+    BASE83, encode_blurhash, dominant_color, compute_placeholder, render_placeholder
+)
+
+def _decode_base83(text: str) -> int:
+    value = 0
+    for character in text:
+        value = value * 83 + BASE83.index(character)
+    return value
+
+def test_blurhash_of_a_solid_image_encodes_its_colour():
+    pixels = np.full((20, 30, 3), (10, 120, 240), dtype=np.float64)
+    blurhash = encode_blurhash(pixels)
+    # 4x3 components for a landscape image; the average colour survives the linear-light round trip
+    assert blurhash[0] == BASE83[3 + 2 * 9]
+    assert _decode_base83(blurhash[2:6]) == (10 << 16) + (120 << 8) + 240
+    assert len(blurhash) == 6 + 2 * 11
+
+def test_portrait_images_get_more_vertical_components():
+    pixels = np.random.default_rng(0).integers(0, 256, (30, 20, 3)).astype(np.float64)
+    blurhash = encode_blurhash(pixels)
+    assert blurhash[0] == BASE83[2 + 3 * 9]
+    assert len(blurhash) == 6 + 2 * 11
+
+def test_dominant_color_is_the_largest_group_of_similar_pixels():
+    pixels = np.zeros((10, 10, 3))
+    pixels[:6] = (200, 40, 40)
+    pixels[6:] = (20, 20, 220)
+    pixels[0, 0] = (204, 44, 44)
+    assert dominant_color(pixels) == "#c82828"
+
+def test_placeholder_is_computed_from_a_reduced_copy():
+    image = Image.new("RGB", (4000, 3000), (0, 128, 0))
+    placeholder = compute_placeholder(image)
+    assert placeholder.dominant_color == "#008000"
+    assert image.size == (4000, 3000)
+
+    output = BytesIO()
+    image.save(output, "JPEG")
+    assert render_placeholder(output.getvalue()).blurhash[0] == placeholder.blurhash[0]
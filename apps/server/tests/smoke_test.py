@@ -1,4 +1,5 @@
 import os
+import hashlib
 import pytest
 import asyncio
 from unittest.mock import patch, MagicMock
@@ -26,6 +27,7 @@ os.environ.update({
 with patch('src.infrastructure.storage.media_storage_service.Minio') as mock_minio:
     mock_client = MagicMock()
     mock_client.bucket_exists.return_value = True
+    mock_client.copy_object.return_value = MagicMock(etag="copied-etag")
     mock_minio.return_value = mock_client
     
     # Now safe to import the app
@@ -134,3 +136,930 @@ def test_invalid_endpoints():
     """Test that invalid endpoints return 404"""
     response = client.get("/nonexistent")
     assert response.status_code == 404
+
+def _register_and_login(name: str, email: str) -> dict:
+    """Register a user and return auth headers for it"""
+    client.post("/auth/register", json={
+        "name": name,
+        "email": email,
+        "phone_number": "+1234567892",
+        "password": "testpassword123"
+    })
+    login_response = client.post("/auth/jwt/login", data={"username": email, "password": "testpassword123"})
+    return {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+def test_contact_feed():
+    """Test that a contact sees posts shared with their audiences, newest first"""
+    from src.infrastructure.auth.jwt_provider import JwtProvider
+
+    headers = _register_and_login("Feed Owner", "feedowner@example.com")
+    contact = client.post("/contacts/", json={"name": "Grandma", "phone_number": "+1987654321"}, headers=headers).json()
+    outsider = client.post("/contacts/", json={"name": "Stranger", "phone_number": "+1987654322"}, headers=headers).json()
+    family = client.post("/audiences/", json={"name": "Family", "contact_ids": [contact["id"]]}, headers=headers).json()
+    friends = client.post("/audiences/", json={"name": "Friends", "contact_ids": [contact["id"], outsider["id"]]}, headers=headers).json()
+
+    with patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification'):
+        first = client.post("/posts/", json={"description": "First", "audience_ids": [family["id"], friends["id"]]}, headers=headers).json()
+        second = client.post("/posts/", json={"description": "Second", "audience_ids": [family["id"]]}, headers=headers).json()
+    client.post("/posts/", json={"description": "Private"}, headers=headers)
+
+    token = JwtProvider().create_contact_view_token(contact["id"])
+    response = client.get("/frontend/view", params={"token": token})
+    assert response.status_code == 200
+    posts = response.json()["posts"]
+    assert [p["post_id"] for p in posts] == [second["id"], first["id"]]
+    assert posts[0]["creator_name"] == "Feed Owner"
+
+    outsider_token = JwtProvider().create_contact_view_token(outsider["id"])
+    response = client.get("/frontend/view", params={"token": outsider_token})
+    assert [p["post_id"] for p in response.json()["posts"]] == [first["id"]]
+
+def test_contact_feed_pagination():
+    """Test cursor pagination and `since` deltas on the contact feed"""
+    from src.infrastructure.auth.jwt_provider import JwtProvider
+
+    headers = _register_and_login("Pager", "pager@example.com")
+    contact = client.post("/contacts/", json={"name": "Uncle", "phone_number": "+1987654323"}, headers=headers).json()
+    audience = client.post("/audiences/", json={"name": "Relatives", "contact_ids": [contact["id"]]}, headers=headers).json()
+    token = JwtProvider().create_contact_view_token(contact["id"])
+
+    with patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification'):
+        post_ids = [
+            client.post("/posts/", json={"description": f"Post {i}", "audience_ids": [audience["id"]]}, headers=headers).json()["id"]
+            for i in range(3)
+        ]
+
+    first_page = client.get("/frontend/view", params={"token": token, "limit": 2}).json()
+    assert [p["post_id"] for p in first_page["posts"]] == [post_ids[2], post_ids[1]]
+    assert first_page["next_cursor"]
+
+    second_page = client.get("/frontend/view", params={"token": token, "limit": 2, "cursor": first_page["next_cursor"]}).json()
+    assert [p["post_id"] for p in second_page["posts"]] == [post_ids[0]]
+    assert second_page["next_cursor"] is None
+
+    with patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification'):
+        newest = client.post("/posts/", json={"description": "Newest", "audience_ids": [audience["id"]]}, headers=headers).json()
+    delta = client.get("/frontend/view", params={"token": token, "since": first_page["latest_cursor"]}).json()
+    assert [p["post_id"] for p in delta["posts"]] == [newest["id"]]
+
+    response = client.get("/frontend/view", params={"token": token, "cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+def test_contact_feed_follows_audience_membership():
+    """Test that the materialized feed tracks membership changes and can be rebuilt"""
+    from src.infrastructure.auth.jwt_provider import JwtProvider
+    from src.infrastructure.database import async_session
+    from src.infrastructure.repositories.contact_feed_repository import ContactFeedRepository
+
+    headers = _register_and_login("Fan Out", "fanout@example.com")
+    contact = client.post("/contacts/", json={"name": "Cousin", "phone_number": "+1987654324"}, headers=headers).json()
+    audience = client.post("/audiences/", json={"name": "Cousins", "contact_ids": []}, headers=headers).json()
+    with patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification'):
+        post = client.post("/posts/", json={"description": "Hello", "audience_ids": [audience["id"]]}, headers=headers).json()
+
+    token = JwtProvider().create_contact_view_token(contact["id"])
+    assert client.get("/frontend/view", params={"token": token}).json()["posts"] == []
+
+    client.put(f"/audiences/{audience['id']}", json={"contact_ids": [contact["id"]]}, headers=headers)
+    assert [p["post_id"] for p in client.get("/frontend/view", params={"token": token}).json()["posts"]] == [post["id"]]
+
+    async def rebuild():
+        async with async_session() as session:
+            return await ContactFeedRepository().rebuild_all(session)
+    assert asyncio.run(rebuild()) > 0
+    assert [p["post_id"] for p in client.get("/frontend/view", params={"token": token}).json()["posts"]] == [post["id"]]
+
+    client.delete(f"/posts/{post['id']}", headers=headers)
+    assert client.get("/frontend/view", params={"token": token}).json()["posts"] == []
+
+def test_contact_feed_backfilled_at_startup():
+    """Test that posts created before the feed table existed reach contact feeds when the app starts"""
+    from sqlalchemy import delete
+    from src.infrastructure.auth.jwt_provider import JwtProvider
+    from src.infrastructure.database import async_session
+    from src.domain.models.contact_feed_entry import ContactFeedEntry
+
+    headers = _register_and_login("Old Timer", "oldtimer@example.com")
+    contact = client.post("/contacts/", json={"name": "Uncle", "phone_number": "+1987654325"}, headers=headers).json()
+    audience = client.post("/audiences/", json={"name": "Uncles", "contact_ids": [contact["id"]]}, headers=headers).json()
+    with patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification'):
+        post = client.post("/posts/", json={"description": "Before", "audience_ids": [audience["id"]]}, headers=headers).json()
+
+    async def empty_feed_table():
+        async with async_session() as session:
+            await session.execute(delete(ContactFeedEntry))
+            await session.commit()
+    asyncio.run(empty_feed_table())
+
+    token = JwtProvider().create_contact_view_token(contact["id"])
+    with TestClient(app) as started_client, \
+         patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification'):
+        posts = started_client.get("/frontend/view", params={"token": token}).json()["posts"]
+    assert [p["post_id"] for p in posts] == [post["id"]]
+
+def test_contact_post_access():
+    """Test single-post access checks with the access index cold and warm"""
+    from src.infrastructure.auth.jwt_provider import JwtProvider
+    from src.infrastructure.cache.access_index import access_index
+    from src.infrastructure.database import async_session
+    from src.domain.services.auth.authorization_service import AuthorizationService
+
+    headers = _register_and_login("Gatekeeper", "gatekeeper@example.com")
+    member = client.post("/contacts/", json={"name": "Member", "phone_number": "+1987654325"}, headers=headers).json()
+    other = client.post("/contacts/", json={"name": "Other", "phone_number": "+1987654326"}, headers=headers).json()
+    audience = client.post("/audiences/", json={"name": "Inner", "contact_ids": [member["id"]]}, headers=headers).json()
+    with patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification'):
+        post = client.post("/posts/", json={"description": "Secret", "audience_ids": [audience["id"]]}, headers=headers).json()
+
+    member_token = JwtProvider().create_contact_view_token(member["id"])
+    other_token = JwtProvider().create_contact_view_token(other["id"])
+
+    async def warm():
+        async with async_session() as session:
+            await AuthorizationService().load_access_index(session)
+
+    for warm_index in (False, True):
+        if warm_index:
+            asyncio.run(warm())
+        assert client.get("/frontend/view", params={"token": member_token, "post_id": post["id"]}).status_code == 200
+        assert client.get("/frontend/view", params={"token": other_token, "post_id": post["id"]}).status_code == 403
+
+    # Membership changes are applied to the warm index incrementally
+    client.put(f"/audiences/{audience['id']}", json={"contact_ids": [other["id"]]}, headers=headers)
+    assert access_index.can_access(other["id"], post["id"]) is True
+    assert access_index.can_access(member["id"], post["id"]) is False
+    access_index.reset()
+
+def test_signed_media_urls():
+    """Test that feed media URLs are signed and stream without a token"""
+    from src.infrastructure.auth.jwt_provider import JwtProvider
+
+    headers = _register_and_login("Photographer", "photographer@example.com")
+    contact = client.post("/contacts/", json={"name": "Aunt", "phone_number": "+1987654327"}, headers=headers).json()
+    audience = client.post("/audiences/", json={"name": "Aunts", "contact_ids": [contact["id"]]}, headers=headers).json()
+    with patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification'):
+        post = client.post("/posts/", json={"description": "Photos", "audience_ids": [audience["id"]]}, headers=headers).json()
+    client.post("/media-items/", json={"post_id": post["id"], "path": "users/1/posts/1/a.jpg", "type": "photo", "order": 0}, headers=headers)
+
+    token = JwtProvider().create_contact_view_token(contact["id"])
+    media_url = client.get("/frontend/view", params={"token": token}).json()["posts"][0]["media_items"][0]["url"]
+    assert "sig=" in media_url and "token=" not in media_url
+
+    with patch('src.interfaces.http.media_items.media_item_service.get_media_item_stream',
+               return_value=(iter([b"jpeg"]), "image/jpeg", 4)):
+        response = client.get(media_url)
+        assert response.status_code == 200
+        assert response.content == b"jpeg"
+
+        tampered = media_url.replace("a.jpg", "b.jpg")
+        assert client.get(tampered).status_code == 403
+
+    # URLs stay identical across feed loads for a whole expiry window, so they stay cached
+    from urllib.parse import parse_qs, urlparse
+    from src.infrastructure.auth.media_url_signer import MediaUrlSigner
+    expires = int(parse_qs(urlparse(media_url).query)["expires"][0])
+    assert expires % MediaUrlSigner().expiry_granularity == 0
+    assert MediaUrlSigner().expiry_granularity >= 86400
+
+def test_streaming_upload():
+    """Test that uploads are piped into storage and the size limit is enforced while streaming"""
+    headers = _register_and_login("Uploader", "uploader@example.com")
+    with patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification'):
+        post = client.post("/posts/", json={"description": "Upload"}, headers=headers).json()
+
+    received = []
+    def put_object(bucket_name, object_name, data, content_type, length, part_size):
+        while chunk := data.read(part_size):
+            received.append(chunk)
+        return MagicMock(etag="uploaded-etag")
+
+    with patch.object(mock_client, "put_object", side_effect=put_object):
+        response = client.post(
+            "/media-items/upload",
+            data={"post_id": str(post["id"]), "order": "2"},
+            files={"file": ("photo.jpg", b"x" * 4096, "image/jpeg")},
+            headers=headers
+        )
+        assert response.status_code == 201
+        assert response.json()["order"] == 2
+        checksum = hashlib.sha256(b"x" * 4096).hexdigest()
+        assert response.json()["path"] == f"blobs/{checksum[:2]}/{checksum}.jpg"
+        assert b"".join(received) == b"x" * 4096
+        assert response.json()["size_bytes"] == 4096
+        assert response.json()["etag"] == "copied-etag"
+        assert response.json()["checksum"] == checksum
+
+        # The recorded metadata replaces the stat when the item is streamed
+        with patch('src.interfaces.http.media_items.media_item_service.get_media_item_stream',
+                   return_value=(iter([b"x"]), "image/jpeg", 1)) as get_stream:
+            client.get(f"/media-items/{response.json()['id']}/stream", headers=headers)
+            assert get_stream.call_args.args[1].size == 4096
+
+        with patch('src.interfaces.http.media_items.MAX_UPLOAD_BYTES', 1024):
+            response = client.post(
+                "/media-items/upload",
+                data={"post_id": str(post["id"])},
+                files={"file": ("big.jpg", b"x" * 4096, "image/jpeg")},
+                headers=headers
+            )
+        assert response.status_code == 400
+
+        # Form fields are buffered, so their size is limited
+        response = client.post(
+            "/media-items/upload",
+            data={"post_id": str(post["id"]), "sha256": "x" * (65 * 1024)},
+            files={"file": ("photo.jpg", b"x", "image/jpeg")},
+            headers=headers
+        )
+        assert response.status_code == 400
+
+        response = client.post(
+            "/media-items/upload",
+            data={"post_id": str(post["id"])},
+            files={"file": ("notes.txt", b"text", "text/plain")},
+            headers=headers
+        )
+        assert response.status_code == 400
+
+def test_media_range_requests():
+    """Test single, multi and unsatisfiable Range requests on the stream endpoint"""
+    from datetime import datetime, timezone
+    from src.infrastructure.storage.media_storage_service import FileInfo
+    from src.infrastructure.storage.object_stream import ObjectStream
+    from src.infrastructure.auth.media_url_signer import MediaUrlSigner
+
+    content = bytes(range(100))
+    info = FileInfo(content_type="video/mp4", size=len(content), etag="abc", last_modified=datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+    def object_range(file_path, offset, length):
+        response = MagicMock()
+        response.stream.return_value = iter([content[offset:offset + length]])
+        return ObjectStream(response)
+
+    url = MediaUrlSigner().signed_stream_url(1, "users/1/posts/1/v.mp4", "contact:1")
+    with patch('src.interfaces.http.media_items.media_item_service.get_media_item_info', return_value=info), \
+         patch('src.interfaces.http.media_items.media_item_service.get_media_item_range', side_effect=object_range):
+        response = client.get(url, headers={"Range": "bytes=10-19"})
+        assert response.status_code == 206
+        assert response.headers["content-range"] == "bytes 10-19/100"
+        assert response.headers["accept-ranges"] == "bytes"
+        assert response.content == content[10:20]
+
+        response = client.get(url, headers={"Range": "bytes=-5"})
+        assert response.content == content[95:]
+
+        response = client.get(url, headers={"Range": "bytes=0-1, 50-51"})
+        assert response.status_code == 206
+        assert response.headers["content-type"].startswith("multipart/byteranges")
+        assert int(response.headers["content-length"]) == len(response.content)
+        assert b"Content-Range: bytes 50-51/100\r\n\r\n" + content[50:52] in response.content
+
+        assert client.get(url, headers={"Range": "bytes=200-"}).status_code == 416
+
+        response = client.get(url, headers={"Range": "bytes=10-19", "If-Range": '"stale"'})
+        assert response.status_code == 200
+        assert response.content == content
+        etag = response.headers["etag"]
+        assert client.get(url, headers={"Range": "bytes=10-19", "If-Range": etag}).status_code == 206
+
+def test_media_conditional_requests():
+    """Test immutable caching headers and 304 responses that skip storage"""
+    from src.infrastructure.auth.media_url_signer import MediaUrlSigner
+
+    headers = _register_and_login("Revalidator", "revalidator@example.com")
+    with patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification'):
+        post = client.post("/posts/", json={"description": "Cached"}, headers=headers).json()
+    with patch.object(mock_client, "put_object", return_value=MagicMock(etag="e")):
+        media = client.post(
+            "/media-items/upload",
+            data={"post_id": str(post["id"])},
+            files={"file": ("clip.mp4", b"video", "video/mp4")},
+            headers=headers
+        ).json()
+
+    stream_url = f"/media-items/{media['id']}/stream"
+    signed_url = MediaUrlSigner().signed_stream_url(media["id"], media["path"], "contact:1")
+    with patch('src.interfaces.http.media_items.media_item_service.get_media_item_stream',
+               side_effect=lambda *args: (iter([b"video"]), "video/mp4", 5)) as get_stream:
+        response = client.get(stream_url, headers=headers)
+        assert response.headers["etag"] == f'"{media["checksum"]}"'
+        assert response.headers["cache-control"] == "private, max-age=31536000, immutable"
+        assert client.get(signed_url).headers["cache-control"].startswith("public")
+        assert get_stream.call_count == 2
+
+        response = client.get(stream_url, headers={**headers, "If-None-Match": f'W/"x", "{media["checksum"]}"'})
+        assert response.status_code == 304
+        assert response.headers["etag"] == f'"{media["checksum"]}"'
+        signed_etag = client.get(signed_url).headers["etag"]
+        assert client.get(signed_url, headers={"If-None-Match": signed_etag}).status_code == 304
+        assert client.get(signed_url + "&size=thumb", headers={"If-None-Match": '"other"'}).status_code == 200
+        assert get_stream.call_count == 4
+
+def test_photo_renditions():
+    """Test that uploads produce renditions and feeds select them with `size`"""
+    from io import BytesIO
+    from PIL import Image
+    from src.infrastructure.auth.jwt_provider import JwtProvider
+
+    headers = _register_and_login("Resizer", "resizer@example.com")
+    contact = client.post("/contacts/", json={"name": "Nephew", "phone_number": "+1987654328"}, headers=headers).json()
+    audience = client.post("/audiences/", json={"name": "Nephews", "contact_ids": [contact["id"]]}, headers=headers).json()
+    with patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification'):
+        post = client.post("/posts/", json={"description": "Big photo", "audience_ids": [audience["id"]]}, headers=headers).json()
+
+    photo = BytesIO()
+    Image.new("RGB", (1600, 1200), (10, 120, 200)).save(photo, "JPEG")
+    stored = {}
+    def put_object(bucket_name, object_name, data, content_type, length, part_size=None):
+        stored[object_name] = data.read()
+        return MagicMock(etag="e")
+
+    with patch.object(mock_client, "put_object", side_effect=put_object), \
+         patch.object(mock_client, "get_object") as get_object:
+        get_object.return_value.read.return_value = photo.getvalue()
+        response = client.post(
+            "/media-items/upload",
+            data={"post_id": str(post["id"])},
+            files={"file": ("photo.jpg", photo.getvalue(), "image/jpeg")},
+            headers=headers
+        )
+    assert response.status_code == 201
+    assert (response.json()["width"], response.json()["height"]) == (1600, 1200)
+    original = response.json()["path"]
+    thumb_path = original.rsplit(".", 1)[0] + ".thumb.jpg"
+    with Image.open(BytesIO(stored[thumb_path])) as thumb:
+        assert max(thumb.size) == 320
+
+    token = JwtProvider().create_contact_view_token(contact["id"])
+    media = client.get("/frontend/view", params={"token": token, "size": "thumb"}).json()["posts"][0]["media_items"][0]
+    assert "thumb.jpg" in media["url"] and "size=" not in media["url"]
+    assert (media["width"], media["height"]) == (1600, 1200)
+    assert thumb_path.replace(".jpg", ".webp") in stored
+    # The placeholder is computed with the renditions and sent inline
+    assert len(media["blurhash"]) == 28 and media["dominant_color"].startswith("#")
+    detail = client.get(f"/posts/{post['id']}", headers=headers).json()
+    assert detail["media_items"][0]["blurhash"] == media["blurhash"]
+
+    with patch('src.interfaces.http.media_items.media_item_service.get_media_item_stream',
+               return_value=(iter([b"img"]), "image/webp", 3)) as get_stream:
+        response = client.get(media["url"], headers={"Accept": "image/webp,*/*"})
+        assert response.headers["vary"] == "Accept"
+        assert get_stream.call_args.args[0] == thumb_path.replace(".jpg", ".webp")
+        client.get(media["url"], headers={"Accept": "*/*"})
+        assert get_stream.call_args.args[0] == thumb_path
+    assert client.get("/frontend/view", params={"token": token, "size": "huge"}).status_code == 422
+
+def test_signed_renditions_of_videos_are_not_rendered():
+    """Test that `size` on a signed URL does not load an original that cannot be rendered"""
+    from src.infrastructure.auth.jwt_provider import JwtProvider
+    from src.infrastructure.storage.media_storage_service import FileInfo
+    from src.interfaces.http.media_items import media_derivative_service
+
+    headers = _register_and_login("Filmmaker", "filmmaker@example.com")
+    contact = client.post("/contacts/", json={"name": "Cousin", "phone_number": "+1987654330"}, headers=headers).json()
+    audience = client.post("/audiences/", json={"name": "Cousins", "contact_ids": [contact["id"]]}, headers=headers).json()
+    with patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification'):
+        post = client.post("/posts/", json={"description": "Film", "audience_ids": [audience["id"]]}, headers=headers).json()
+    client.post("/media-items/", json={"post_id": post["id"], "path": "users/1/posts/1/film.mp4", "type": "video", "order": 0}, headers=headers)
+    token = JwtProvider().create_contact_view_token(contact["id"])
+    media_url = client.get("/frontend/view", params={"token": token}).json()["posts"][0]["media_items"][0]["url"]
+
+    storage = media_derivative_service.media_storage_service
+    for info in [FileInfo("video/mp4", 10, None, None), FileInfo("image/jpeg", 2 * 1024 ** 3, None, None)]:
+        with patch.object(storage, "file_exists", return_value=False), \
+             patch.object(storage, "get_file_info", return_value=info), \
+             patch.object(media_derivative_service, "_generate") as generate, \
+             patch('src.interfaces.http.media_items.media_item_service.get_media_item_stream',
+                   return_value=(iter([b"mp4"]), "video/mp4", 3)) as get_stream:
+            response = client.get(f"{media_url}&size=large")
+            assert response.status_code == 200
+            assert generate.call_count == 0
+            assert get_stream.call_args.args[0] == "users/1/posts/1/film.mp4"
+
+def test_media_disk_cache():
+    """Test that repeated media views are served from the local disk cache"""
+    from src.infrastructure.auth.media_url_signer import MediaUrlSigner
+    from src.infrastructure.cache.media_disk_cache import media_disk_cache
+    # Started by the app lifespan, which the module-level client does not run
+    media_disk_cache.start()
+
+    body = MagicMock(headers={"content-type": "image/jpeg", "content-length": "6", "etag": '"e1"'})
+    body.stream.return_value = iter([b"cached"])
+    url = MediaUrlSigner().signed_stream_url(7, "users/9/posts/9/cached.jpg", "contact:1")
+    with patch.object(mock_client, "stat_object") as stat_object, \
+         patch.object(mock_client, "get_object", return_value=body) as get_object:
+        for _ in range(3):
+            response = client.get(url)
+            assert response.status_code == 200
+            assert response.content == b"cached"
+        assert get_object.call_count == 1
+        assert client.get(url, headers={"Range": "bytes=1-3"}).content == b"ach"
+        assert stat_object.call_count == 0
+    assert media_disk_cache.stats()["bytes_saved"] >= 15
+    media_disk_cache.discard("users/9/posts/9/cached.jpg")
+
+def test_content_addressed_dedup():
+    """Test that identical uploads share one blob that is deleted with its last reference"""
+    headers = _register_and_login("Deduper", "deduper@example.com")
+    with patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification'):
+        posts = [client.post("/posts/", json={"description": f"Dup {i}"}, headers=headers).json() for i in range(2)]
+    content = b"same clip"
+    checksum = hashlib.sha256(content).hexdigest()
+
+    def upload(post, sha256=None, body=content):
+        data = {"post_id": str(post["id"])}
+        if sha256:
+            data["sha256"] = sha256
+        return client.post("/media-items/upload", data=data, files={"file": ("clip.mp4", body, "video/mp4")}, headers=headers)
+
+    with patch.object(mock_client, "put_object", return_value=MagicMock(etag="e")) as put_object, \
+         patch.object(mock_client, "copy_object", return_value=MagicMock(etag="blob-etag")) as copy_object, \
+         patch.object(mock_client, "remove_object") as remove_object, \
+         patch.object(mock_client, "remove_objects", return_value=iter([])) as remove_objects:
+        first, second = upload(posts[0]).json(), upload(posts[1]).json()
+        assert first["path"] == second["path"] == f"blobs/{checksum[:2]}/{checksum}.mp4"
+        assert copy_object.call_count == 1
+        # Both staged copies are dropped
+        assert remove_object.call_count == 2
+
+        # Declared known content is verified without being stored again
+        puts = put_object.call_count
+        third = upload(posts[1], sha256=checksum).json()
+        assert third["path"] == first["path"] and third["etag"] == "blob-etag"
+        assert put_object.call_count == puts
+        assert upload(posts[1], sha256=checksum, body=b"other").status_code == 400
+
+        # Blob references are only taken by uploads, so the generic endpoints refuse blob paths
+        assert client.post("/media-items/", json={
+            "post_id": posts[1]["id"], "path": first["path"], "type": "video", "order": 5
+        }, headers=headers).status_code == 400
+        assert client.put(f"/media-items/{first['id']}", json={"path": "users/elsewhere.mp4"}, headers=headers).status_code == 400
+        assert client.put(f"/media-items/{first['id']}", json={"order": 2}, headers=headers).status_code == 200
+
+        for media in (first, second):
+            assert client.delete(f"/media-items/{media['id']}", headers=headers).status_code == 204
+        assert remove_objects.call_count == 0
+        assert client.delete(f"/media-items/{third['id']}", headers=headers).status_code == 204
+        assert [obj._name for obj in remove_objects.call_args.args[1]] == [first["path"]]
+
+def test_post_media_deleted_in_background():
+    """Test that deleting a post removes its files with batched deletes in a background job"""
+    import time
+    from fastapi.testclient import TestClient
+    headers = _register_and_login("Cleaner", "cleaner@example.com")
+    with patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification'):
+        post = client.post("/posts/", json={"description": "Going away"}, headers=headers).json()
+    with patch.object(mock_client, "put_object", return_value=MagicMock(etag="e")):
+        media = client.post(
+            "/media-items/upload",
+            data={"post_id": str(post["id"])},
+            files={"file": ("clip.mp4", b"clip to delete", "video/mp4")},
+            headers=headers
+        ).json()
+
+    # A delete that fails keeps the post and its media rows together
+    with patch('src.infrastructure.repositories.contact_feed_repository.ContactFeedRepository.delete_for_post',
+               side_effect=RuntimeError("database unavailable")), pytest.raises(RuntimeError):
+        client.delete(f"/posts/{post['id']}", headers=headers)
+    assert client.get(f"/media-items/{media['id']}", headers=headers).status_code == 200
+
+    legacy = [MagicMock(object_name=f"users/{post['user_id']}/posts/{post['id']}/{i}.jpg") for i in range(2500)]
+    batches = []
+    def remove_objects(bucket_name, delete_object_list):
+        batches.append([obj._name for obj in delete_object_list])
+        return iter([MagicMock(name="e", message="denied", code="AccessDenied")] if len(batches) == 1 else [])
+
+    # One event loop for all requests (as in the server), so the job outlives the request
+    with TestClient(app) as persistent_client, \
+         patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification'), \
+         patch.object(mock_client, "list_objects", return_value=iter(legacy)), \
+         patch.object(mock_client, "remove_objects", side_effect=remove_objects):
+        assert persistent_client.delete(f"/posts/{post['id']}", headers=headers).status_code == 204
+        for _ in range(50):
+            jobs = persistent_client.get("/media-items/deletions", headers=headers).json()
+            if jobs and jobs[0]["finished_at"]:
+                break
+            time.sleep(0.02)
+    job = jobs[0]
+    assert job["status"] == "completed_with_errors"
+    assert (job["listed"], job["deleted"], job["failed"]) == (2501, 2500, 1)
+    assert [media["path"]] in batches
+    assert sorted(len(batch) for batch in batches) == [1, 500, 1000, 1000]
+    assert client.get(f"/media-items/deletions/{job['id']}", headers=headers).json()["id"] == job["id"]
+    assert client.get(f"/media-items/{media['id']}", headers=headers).status_code == 404
+
+def test_post_delete_drops_blob_references():
+    """Test that blob references go with the post, so a lost deletion job leaves only objects to collect"""
+    from sqlmodel import select
+    from src.domain.models.media_blob import MediaBlob
+    from src.infrastructure.database import async_session
+    from src.interfaces.http.media_items import media_storage_service
+    from src.domain.services.storage_reconciliation_service import StorageReconciliationService
+    headers = _register_and_login("Sharer", "sharer@example.com")
+    with patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification'):
+        posts = [client.post("/posts/", json={"description": f"Shared {i}"}, headers=headers).json() for i in range(2)]
+    with patch.object(mock_client, "put_object", return_value=MagicMock(etag="e")):
+        media = [client.post(
+            "/media-items/upload",
+            data={"post_id": str(post["id"])},
+            files={"file": ("clip.mp4", b"shared clip", "video/mp4")},
+            headers=headers
+        ).json() for post in posts]
+
+    async def ref_count():
+        async with async_session() as session:
+            blob = (await session.exec(select(MediaBlob).where(MediaBlob.path == media[0]["path"]))).first()
+            return blob.ref_count if blob else None
+
+    assert asyncio.run(ref_count()) == 2
+    # The server restarts before the deletion jobs run
+    with patch('src.interfaces.http.posts.deletion_jobs.start') as start:
+        for post in posts:
+            assert client.delete(f"/posts/{post['id']}", headers=headers).status_code == 204
+            assert start.call_count == 1
+            start.reset_mock()
+    assert asyncio.run(ref_count()) == 0
+
+    service = StorageReconciliationService(media_storage_service=media_storage_service)
+    with patch.object(mock_client, "list_objects", return_value=iter([])), \
+         patch.object(mock_client, "remove_objects", return_value=iter([])) as remove_objects:
+        report = asyncio.run(service.reconcile(async_session, repair=True))
+    assert media[0]["path"] in report.samples["unreferenced_blobs"]
+    assert [media[0]["path"]] in [[obj._name for obj in call.args[1]] for call in remove_objects.call_args_list]
+    assert asyncio.run(ref_count()) is None
+
+def test_storage_reconciliation(tmp_path):
+    """Test that the reconciler finds orphaned objects and missing files, and repairs them"""
+    import json
+    from datetime import datetime, timezone
+    from minio.error import S3Error
+    from src.infrastructure.database import async_session
+    from src.infrastructure.imaging.derivatives import derivative_path
+    from src.interfaces.http.media_items import media_storage_service
+    from src.domain.services.storage_reconciliation_service import StorageReconciliationService
+    headers = _register_and_login("Reconciler", "reconciler@example.com")
+    with patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification'):
+        post = client.post("/posts/", json={"description": "Reconcile"}, headers=headers).json()
+
+    def upload(content):
+        with patch.object(mock_client, "put_object", return_value=MagicMock(etag="e")):
+            return client.post(
+                "/media-items/upload",
+                data={"post_id": str(post["id"])},
+                files={"file": ("clip.mp4", content, "video/mp4")},
+                headers=headers
+            ).json()
+    kept, lost = upload(b"kept clip"), upload(b"lost clip")
+
+    old, now = datetime(2020, 1, 1, tzinfo=timezone.utc), datetime.now(timezone.utc)
+    orphans = ["blobs/00/gone.large.jpg", "users/0/posts/0/stray.jpg"]
+    listing = sorted([
+        (kept["path"], old),
+        # A rendition of a referenced original, recorded or not, is kept
+        (derivative_path(kept["path"], "thumb"), old),
+        (orphans[0], old),
+        (orphans[1], old),
+        ("uploads/in-progress.mp4", now)
+    ])
+    def list_objects(**kwargs):
+        return iter([MagicMock(object_name=path, size=10, last_modified=modified) for path, modified in listing])
+    def stat_object(bucket_name, object_name):
+        if object_name == lost["path"]:
+            raise S3Error("NoSuchKey", "missing", object_name, "r", "h", MagicMock())
+        return MagicMock()
+
+    service = StorageReconciliationService(media_storage_service=media_storage_service)
+    checkpoint = tmp_path / "reconcile.json"
+    with patch.object(mock_client, "list_objects", side_effect=list_objects) as listed, \
+         patch.object(mock_client, "stat_object", side_effect=stat_object), \
+         patch.object(mock_client, "remove_objects", return_value=iter([])) as remove_objects:
+        report = asyncio.run(service.reconcile(async_session, checkpoint_path=str(checkpoint)))
+        assert (report.objects_scanned, report.orphaned_objects, report.recent_objects_skipped) == (5, 2, 1)
+        assert report.samples["orphaned_objects"] == orphans
+        assert (report.missing_media_items, report.missing_blobs) == (1, 1)
+        assert report.samples["missing_media_items"] == [f"{lost['id']}: {lost['path']}"]
+        assert remove_objects.call_count == 0
+        assert not checkpoint.exists()
+
+        report = asyncio.run(service.reconcile(async_session, repair=True))
+        removed = [[obj._name for obj in call.args[1]] for call in remove_objects.call_args_list]
+        assert orphans in removed and [lost["path"]] in removed
+        assert client.get(f"/media-items/{lost['id']}", headers=headers).status_code == 404
+        assert client.get(f"/media-items/{kept['id']}", headers=headers).status_code == 200
+
+        # An interrupted run resumes after the last listed key with the counts so far
+        checkpoint.write_text(json.dumps({"after": orphans[1], "report": {"objects_scanned": 4}}))
+        listing = listing[4:]
+        report = asyncio.run(service.reconcile(async_session, checkpoint_path=str(checkpoint)))
+        assert listed.call_args.kwargs["start_after"] == orphans[1]
+        assert report.objects_scanned == 5 and report.missing_media_items == 0
+
+def test_resumable_upload_session():
+    """Test that a file sent in parts survives a failed part and is completed into a media item"""
+    headers = _register_and_login("Resumer", "resumer@example.com")
+    with patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification'):
+        post = client.post("/posts/", json={"description": "Long video"}, headers=headers).json()
+    content = b"0123456789"
+    checksum = hashlib.sha256(content).hexdigest()
+    # Only the author of a post can upload to it
+    intruder = _register_and_login("Intruder", "intruder@example.com")
+    assert client.post("/media-items/upload-sessions", json={
+        "post_id": post["id"], "file_name": "clip.mp4", "content_type": "video/mp4",
+        "size_bytes": len(content), "sha256": checksum
+    }, headers=intruder).status_code == 403
+    assembled = MagicMock(headers={"content-type": "video/mp4", "content-length": "10"})
+    assembled.stream.return_value = iter([content])
+    sent = {}
+    def upload_part(bucket_name, object_name, data, headers, upload_id, part_number):
+        if part_number == 2 and 2 not in sent:
+            sent[2] = None
+            raise ConnectionError("connection dropped")
+        sent[part_number] = data
+        return f"etag-{part_number}"
+
+    with patch('src.domain.services.upload_session_service.UPLOAD_PART_SIZE', 4), \
+         patch.object(mock_client, "_create_multipart_upload", return_value="upload-1"), \
+         patch.object(mock_client, "_upload_part", side_effect=upload_part), \
+         patch.object(mock_client, "_complete_multipart_upload", return_value=MagicMock(etag="e")) as complete, \
+         patch.object(mock_client, "get_object", return_value=assembled), \
+         patch.object(mock_client, "copy_object", return_value=MagicMock(etag="blob-etag")):
+        upload = client.post("/media-items/upload-sessions", json={
+            "post_id": post["id"], "file_name": "clip.mp4", "content_type": "video/mp4",
+            "size_bytes": len(content), "sha256": checksum
+        }, headers=headers).json()
+        assert (upload["part_size"], upload["part_count"]) == (4, 3)
+        url = f"/media-items/upload-sessions/{upload['id']}"
+
+        assert client.put(f"{url}/parts/1", content=content[:4], headers=headers).status_code == 200
+        with pytest.raises(ConnectionError):
+            client.put(f"{url}/parts/2", content=content[4:8], headers=headers)
+        assert client.put(f"{url}/parts/3", content=content[8:], headers=headers).status_code == 200
+        # Parts must have their exact size, and completion waits for all of them
+        assert client.put(f"{url}/parts/3", content=content[7:], headers=headers).status_code == 400
+        assert client.post(f"{url}/complete", headers=headers).status_code == 409
+
+        # After the interruption the client resumes with the missing part only
+        assert client.get(url, headers=headers).json()["received_parts"] == [1, 3]
+        assert client.put(f"{url}/parts/2", content=content[4:8], headers=headers).status_code == 200
+        other = _register_and_login("Intruder", "intruder@example.com")
+        assert client.post(f"{url}/complete", headers=other).status_code == 404
+        response = client.post(f"{url}/complete", headers=headers)
+        assert response.status_code == 201
+        media = response.json()
+        assert [(part.part_number, part.etag) for part in complete.call_args.args[3]] == \
+            [(1, "etag-1"), (2, "etag-2"), (3, "etag-3")]
+        assert media["path"] == f"blobs/{checksum[:2]}/{checksum}.mp4"
+        assert (media["size_bytes"], media["checksum"], media["type"]) == (10, checksum, "video")
+        assert client.get(url, headers=headers).status_code == 404
+
+    with patch.object(mock_client, "_create_multipart_upload", return_value="upload-2"), \
+         patch.object(mock_client, "_abort_multipart_upload") as abort:
+        upload = client.post("/media-items/upload-sessions", json={
+            "post_id": post["id"], "file_name": "clip.mp4", "content_type": "video/mp4", "size_bytes": 10
+        }, headers=headers).json()
+        assert client.delete(f"/media-items/upload-sessions/{upload['id']}", headers=headers).status_code == 204
+        assert abort.call_args.args[2] == "upload-2"
+
+    # Idle sessions, and multipart uploads no session tracks, are garbage-collected
+    from datetime import datetime, timedelta, timezone
+    from src.infrastructure.database import async_session
+    from src.interfaces.http.media_items import upload_session_service
+    untracked = MagicMock(object_name="uploads/lost.mp4", upload_id="upload-lost",
+                          initiated_time=datetime.now(timezone.utc) - timedelta(days=2))
+    with patch.object(mock_client, "_create_multipart_upload", return_value="upload-3"), \
+         patch.object(mock_client, "_list_multipart_uploads",
+                      return_value=MagicMock(uploads=[untracked], is_truncated=False)), \
+         patch.object(mock_client, "_abort_multipart_upload") as abort:
+        upload = client.post("/media-items/upload-sessions", json={
+            "post_id": post["id"], "file_name": "clip.mp4", "content_type": "video/mp4", "size_bytes": 10
+        }, headers=headers).json()
+
+        async def collect():
+            async with async_session() as session:
+                return await upload_session_service.collect_stale_sessions(session)
+        assert asyncio.run(collect()) == 1
+        with patch('src.domain.services.upload_session_service.UPLOAD_SESSION_TTL', timedelta(0)):
+            assert asyncio.run(collect()) == 2
+        assert sorted(call.args[2] for call in abort.call_args_list) == ["upload-3", "upload-lost", "upload-lost"]
+        assert client.get(f"/media-items/upload-sessions/{upload['id']}", headers=headers).status_code == 404
+
+def test_direct_upload():
+    """Test that a file PUT straight to storage is verified before its media item is created"""
+    from minio.error import S3Error
+    headers = _register_and_login("Direct", "direct@example.com")
+    with patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification'):
+        post = client.post("/posts/", json={"description": "Direct"}, headers=headers).json()
+    content = b"direct video bytes"
+    checksum = hashlib.sha256(content).hexdigest()
+    declared = {"post_id": post["id"], "file_name": "clip.mp4", "content_type": "video/mp4",
+                "size_bytes": len(content), "sha256": checksum}
+    stored = MagicMock(headers={"content-type": "video/mp4", "content-length": str(len(content)), "etag": '"put-etag"'})
+    stored.stream.return_value = iter([content])
+    uploaded = set()
+    def stat_object(bucket_name, object_name):
+        if object_name not in uploaded:
+            raise S3Error("NoSuchKey", "missing", object_name, "r", "h", MagicMock())
+        return MagicMock(size=len(content) if len(uploaded) == 1 else 1, content_type="video/mp4", etag="put-etag")
+
+    with patch.object(mock_client, "presigned_put_object", return_value="https://storage.example/put?X-Amz-Signature=s") as presign, \
+         patch.object(mock_client, "stat_object", side_effect=stat_object), \
+         patch.object(mock_client, "get_object", return_value=stored), \
+         patch.object(mock_client, "copy_object", return_value=MagicMock(etag="blob-etag")) as copy_object, \
+         patch.object(mock_client, "remove_object") as remove_object:
+        assert client.post("/media-items/direct-uploads", json={**declared, "sha256": "nope"}, headers=headers).status_code == 400
+        upload = client.post("/media-items/direct-uploads", json=declared, headers=headers).json()
+        assert upload["url"] == "https://storage.example/put?X-Amz-Signature=s"
+        assert (upload["method"], upload["headers"]) == ("PUT", {"Content-Type": "video/mp4"})
+        object_name = presign.call_args.args[1]
+        assert object_name.startswith("uploads/")
+        url = f"/media-items/upload-sessions/{upload['id']}"
+        assert client.put(f"{url}/parts/1", content=content, headers=headers).status_code == 400
+
+        # Completing before the client's PUT reached storage is refused
+        assert client.post(f"{url}/complete", headers=headers).status_code == 409
+        uploaded.add(object_name)
+        response = client.post(f"{url}/complete", headers=headers)
+        assert response.status_code == 201
+        assert response.json()["path"] == f"blobs/{checksum[:2]}/{checksum}.mp4"
+        assert response.json()["checksum"] == checksum
+        # Only the version whose checksum was verified is stored
+        assert copy_object.call_args.args[2]._match_etag == "put-etag"
+
+        # A stored file that differs from what was declared is discarded
+        upload = client.post("/media-items/direct-uploads", json=declared, headers=headers).json()
+        uploaded.add(presign.call_args.args[1])
+        response = client.post(f"/media-items/upload-sessions/{upload['id']}/complete", headers=headers)
+        assert response.status_code == 400
+        assert remove_object.call_args.kwargs["object_name"] == presign.call_args.args[1]
+        assert client.get(f"/media-items/upload-sessions/{upload['id']}", headers=headers).status_code == 404
+
+def test_create_post_with_media():
+    """Test that a post and all its files are created together, with files stored concurrently"""
+    import threading
+    import time
+    from src.infrastructure.database import async_session
+    from src.interfaces.http.posts import notification_dispatcher
+    headers = _register_and_login("Batcher", "batcher@example.com")
+    contact = client.post("/contacts/", json={"name": "Aunt", "phone_number": "+1987654330"}, headers=headers).json()
+    audience = client.post("/audiences/", json={"name": "Batch", "contact_ids": [contact["id"]]}, headers=headers).json()
+    files = [("files", (f"clip{i}.mp4", f"clip {i}".encode(), "video/mp4")) for i in range(5)]
+
+    active, peak = [0], [0]
+    lock = threading.Lock()
+    def put_object(bucket_name, object_name, data, content_type, length, part_size):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        while data.read(part_size):
+            pass
+        time.sleep(0.1)
+        with lock:
+            active[0] -= 1
+        return MagicMock(etag="e")
+
+    with patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification') as send, \
+         patch.object(mock_client, "put_object", side_effect=put_object):
+        response = client.post(
+            "/posts/with-media",
+            data={"description": "Trip", "audience_ids": [str(audience["id"])]},
+            files=files,
+            headers=headers
+        )
+        assert response.status_code == 201
+        post = response.json()
+        assert [media["order"] for media in post["media_items"]] == [0, 1, 2, 3, 4]
+        assert post["media_items"][3]["checksum"] == hashlib.sha256(b"clip 3").hexdigest()
+        assert [a["id"] for a in post["audiences"]] == [audience["id"]]
+        assert 1 < peak[0] <= 4
+        # Notifications are queued with the post and sent by the dispatcher
+        assert send.call_count == 0
+        asyncio.run(notification_dispatcher.dispatch_pending(async_session))
+        urls = [c.args[3] for c in send.call_args_list if c.args[0] == contact["phone_number"]]
+        assert len(urls) == 1 and urls[0].endswith(f"&post_id={post['id']}")
+    assert len(client.get(f"/media-items/?post_id={post['id']}", headers=headers).json()) == 5
+
+    # One failed file fails the whole post: nothing is created and nobody is notified
+    def failing_put(bucket_name, object_name, data, content_type, length, part_size):
+        while chunk := data.read(part_size):
+            if b"bad" in chunk:
+                raise RuntimeError("storage unavailable")
+        return MagicMock(etag="e")
+
+    posts_before = len(client.get("/posts/", headers=headers).json())
+    with patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification') as send, \
+         patch.object(mock_client, "put_object", side_effect=failing_put):
+        response = client.post(
+            "/posts/with-media",
+            data={"description": "Broken", "audience_ids": [str(audience["id"])]},
+            files=[("files", ("ok.mp4", b"fine clip", "video/mp4")), ("files", ("bad.mp4", b"bad clip", "video/mp4"))],
+            headers=headers
+        )
+        assert response.status_code == 500
+        asyncio.run(notification_dispatcher.dispatch_pending(async_session))
+        assert send.call_count == 0
+    assert len(client.get("/posts/", headers=headers).json()) == posts_before
+
+    response = client.post(
+        "/posts/with-media",
+        data={"description": "Text"},
+        files=[("files", ("notes.txt", b"text", "text/plain"))],
+        headers=headers
+    )
+    assert response.status_code == 400
+
+def test_notification_outbox():
+    """Test that notifications are queued with the post, retried with backoff and dead-lettered"""
+    from datetime import datetime, timedelta, timezone
+    from sqlmodel import select
+    from src.infrastructure.database import async_session
+    from src.domain.models.notification_job import NotificationJob
+    from src.domain.services.notifications.notification_dispatcher import NotificationDispatcher
+    headers = _register_and_login("Outboxer", "outboxer@example.com")
+    contact = client.post("/contacts/", json={"name": "Cousin", "phone_number": "+1987654340"}, headers=headers).json()
+    audience = client.post("/audiences/", json={"name": "Outbox", "contact_ids": [contact["id"]]}, headers=headers).json()
+    dispatcher = NotificationDispatcher(max_attempts=2)
+
+    async def jobs(post_id):
+        async with async_session() as session:
+            return (await session.exec(select(NotificationJob).where(NotificationJob.post_id == post_id))).all()
+
+    async def make_due(post_id):
+        async with async_session() as session:
+            for job in (await session.exec(select(NotificationJob).where(NotificationJob.post_id == post_id))).all():
+                job.next_attempt_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+                session.add(job)
+            await session.commit()
+
+    # Drain what earlier tests queued so only this post's job is due
+    with patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification'):
+        asyncio.run(dispatcher.dispatch_pending(async_session))
+
+    with patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification',
+               side_effect=Exception("Failed to send SMS: 500")) as send:
+        post = client.post("/posts/", json={"description": "Queued", "audience_ids": [audience["id"]]}, headers=headers).json()
+        assert send.call_count == 0
+        [job] = asyncio.run(jobs(post["id"]))
+        assert (job.status, job.attempts, job.contact_id) == ("pending", 0, contact["id"])
+
+        assert asyncio.run(dispatcher.dispatch_pending(async_session)) == 0
+        [job] = asyncio.run(jobs(post["id"]))
+        assert (job.status, job.attempts) == ("pending", 1)
+        assert job.last_error == "Failed to send SMS: 500"
+        assert job.next_attempt_at.replace(tzinfo=timezone.utc) > datetime.now(timezone.utc) + timedelta(seconds=20)
+        # Not due yet: nothing is sent
+        asyncio.run(dispatcher.dispatch_pending(async_session))
+        assert send.call_count == 1
+
+        asyncio.run(make_due(post["id"]))
+        asyncio.run(dispatcher.dispatch_pending(async_session))
+        [job] = asyncio.run(jobs(post["id"]))
+        assert (job.status, job.attempts) == ("dead", 2)
+        assert send.call_count == 2
+
+    # A message the provider refused for good is dead-lettered without waiting for retries
+    from src.infrastructure.notifications.sms_provider import SmsDeliveryError
+    with patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification',
+               side_effect=SmsDeliveryError("Failed to send SMS: status 3", retryable=False)):
+        post = client.post("/posts/", json={"description": "Invalid", "audience_ids": [audience["id"]]}, headers=headers).json()
+        asyncio.run(dispatcher.dispatch_pending(async_session))
+        [job] = asyncio.run(jobs(post["id"]))
+        assert (job.status, job.attempts) == ("dead", 1)
+
+    # A contact in several of the post's audiences is texted once; what it cost is reported
+    family = client.post("/audiences/", json={"name": "Family", "contact_ids": [contact["id"]]}, headers=headers).json()
+    vonage_response = {"messages": [{"status": "0", "message-price": "0.0333"}, {"status": "0", "message-price": "0.0333"}]}
+    with patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification',
+               return_value=vonage_response) as send:
+        post = client.post(
+            "/posts/", json={"description": "Everyone", "audience_ids": [audience["id"], family["id"]]}, headers=headers
+        ).json()
+        assert len(asyncio.run(jobs(post["id"]))) == 1
+        assert asyncio.run(dispatcher.dispatch_pending(async_session)) == 1
+        assert send.call_count == 1
+    report = client.get(f"/posts/{post['id']}/notifications", headers=headers).json()
+    assert (report["recipients"], report["sent"], report["pending"], report["dead"]) == (1, 1, 0, 0)
+    assert report["messages"] == 2 and report["cost"] == pytest.approx(0.0666)
+    other = _register_and_login("Snoop", "snoop@example.com")
+    assert client.get(f"/posts/{post['id']}/notifications", headers=other).status_code == 403
+
+    # The unique index is added at startup to an outbox table created without it
+    from sqlalchemy import inspect, text
+    from src.infrastructure.database import engine
+
+    async def outbox_indexes(drop=False):
+        async with engine.begin() as conn:
+            if drop:
+                await conn.execute(text("DROP INDEX ux_notificationjob_post_contact"))
+            return await conn.run_sync(lambda c: {i["name"] for i in inspect(c).get_indexes("notificationjob")})
+    assert "ux_notificationjob_post_contact" not in asyncio.run(outbox_indexes(drop=True))
+    with TestClient(app), patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification'):
+        pass
+    assert "ux_notificationjob_post_contact" in asyncio.run(outbox_indexes())
+
+    # A job queued for a contact who was deleted is dropped without sending
+    with patch('src.infrastructure.notifications.sms_provider.SmsProvider.send_post_notification') as send:
+        post = client.post("/posts/", json={"description": "Orphan", "audience_ids": [audience["id"]]}, headers=headers).json()
+        assert client.delete(f"/contacts/{contact['id']}", headers=headers).status_code == 204
+        asyncio.run(dispatcher.dispatch_pending(async_session))
+        assert send.call_count == 0
+        assert asyncio.run(jobs(post["id"])) == []
@@ -0,0 +1,84 @@
+import asyncio
+import os
+import time
+import httpx
+from urllib.parse import parse_qs
+from unittest.mock import patch
+from src.infrastructure.notifications.rate_limiter import RateLimiter
+from src.infrastructure.notifications.sms_client import SmsClient
+from src.infrastructure.notifications.sms_provider import SmsProvider, SmsDeliveryError, sms_cost
+
+def _provider(handler, **options) -> SmsProvider:
+    with patch.dict(os.environ, {'VONAGE_API_KEY': 'test', 'VONAGE_API_SECRET': 'test', 'SMS_FROM_NUMBER': '+1234567890'}):
+        return SmsProvider(SmsClient(transport=httpx.MockTransport(handler), **options))
+
+def test_sends_are_bounded_by_parallelism():
+    active, peak = [0], [0]
+
+    async def handler(request):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.02)
+        active[0] -= 1
+        return httpx.Response(200, json={"messages": [{"status": "0"}]})
+
+    async def run():
+        provider = _provider(handler, parallelism=3, max_per_second=1000)
+        await asyncio.gather(*[provider.send_post_notification(f"+1{i}", "To", "From", "url") for i in range(10)])
+        await provider.client.aclose()
+        return provider.client.stats()
+
+    stats = asyncio.run(run())
+    assert peak[0] == 3
+    assert stats["requests"] == 10 and stats["active"] == 0
+
+def test_throttled_messages_are_retried():
+    statuses = iter(["1", "0"])
+
+    def handler(request):
+        return httpx.Response(200, json={"messages": [{"status": next(statuses)}]})
+
+    async def run():
+        provider = _provider(handler, max_per_second=1000)
+        with patch('src.infrastructure.notifications.sms_provider.SMS_RETRY_DELAY_SECONDS', 0):
+            return await provider.send_post_notification("+1", "To", "From", "url")
+
+    assert asyncio.run(run())["messages"][0]["status"] == "0"
+
+def test_refused_messages_raise():
+    def handler(request):
+        status = {"+1": "3", "+2": "5"}[parse_qs(request.content.decode())["to"][0]]
+        return httpx.Response(200, json={"messages": [{"status": status, "error-text": "refused"}]})
+
+    async def run(number):
+        provider = _provider(handler, max_per_second=1000)
+        try:
+            await provider.send_post_notification(number, "To", "From", "url")
+        except SmsDeliveryError as e:
+            return e
+        finally:
+            await provider.client.aclose()
+
+    # An invalid number is permanent; an internal error at the provider is worth retrying
+    invalid, internal = asyncio.run(run("+1")), asyncio.run(run("+2"))
+    assert isinstance(invalid, SmsDeliveryError) and not invalid.retryable
+    assert isinstance(internal, SmsDeliveryError) and internal.retryable
+
+def test_cost_of_a_split_message():
+    result = {"message-count": "2", "messages": [{"status": "0", "message-price": "0.0333"},
+                                                 {"status": "0", "message-price": "0.0333"}]}
+    messages, cost = sms_cost(result)
+    assert messages == 2
+    assert abs(cost - 0.0666) < 1e-9
+    assert sms_cost({"messages": [{"status": "0"}]}) == (1, 0)
+
+def test_rate_limiter_spaces_out_calls():
+    async def run():
+        limiter = RateLimiter(rate=100)
+        started = time.monotonic()
+        await asyncio.gather(*[limiter.acquire() for _ in range(11)])
+        return time.monotonic() - started, limiter
+
+    elapsed, limiter = asyncio.run(run())
+    assert elapsed >= 0.09
+    assert limiter.stats()["delayed"] == 10